@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_add_leaderboard_hidden'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userprofile',
+            name='userprofile_balance_desc',
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['leaderboard_hidden', '-balance', 'user'], name='userprofile_leaderboard'),
+        ),
+    ]
@@ -20,8 +20,12 @@ class UserProfile(models.Model):
 
     class Meta:
         indexes = [
-            # Descending index for leaderboard ORDER BY balance DESC queries.
-            models.Index(fields=['-balance'], name='userprofile_balance_desc'),
+            # Leaderboard: the top-N page is a range scan over visible users in
+            # balance order, and a viewer's rank counts the entries above them.
+            models.Index(
+                fields=['leaderboard_hidden', '-balance', 'user'],
+                name='userprofile_leaderboard',
+            ),
         ]
 
     def __str__(self):
@@ -4,6 +4,7 @@ from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.utils.http import url_has_allowed_host_and_scheme
 
+from apps.economy.balances import get_balance
 from apps.economy.models import Transaction
 from apps.coinflip.models import CoinFlipChallenge
 
@@ -129,5 +130,4 @@ def user_search_json(request):
 @rate_limit('balance_check', max_requests=60, window=60)
 def balance_check(request):
     """HTMX endpoint for real-time balance updates in the nav bar."""
-    balance = request.user.profile.balance
-    return HttpResponse(f'{balance} LC')
+    return HttpResponse(f'{get_balance(request.user)} LC')
@@ -6,9 +6,12 @@ from typing import TYPE_CHECKING
 from django.db import transaction
 from django.utils import timezone
 
-from apps.accounts.models import UserProfile
+from apps.economy.balances import publish_balances
+from apps.economy.ledger import record_ledger
 from apps.economy.models import Transaction
-from apps.economy.services import mint_coins, poker_payout
+from apps.economy.services import lock_profiles, mint_coins, poker_payout
+from apps.leaderboard.services import record_transactions
+from apps.notifications.activity import invalidate_activity
 
 if TYPE_CHECKING:
     from django.contrib.auth.models import User
@@ -27,10 +30,11 @@ def admin_deduct_coins(
         raise ValueError('Amount must be positive.')
 
     with transaction.atomic():
-        profile = UserProfile.objects.select_for_update().get(user=target_user)
+        profile = lock_profiles(target_user)[target_user.pk]
         actual = min(amount, profile.balance)
         profile.balance -= actual
         profile.save(update_fields=['balance'])
+        publish_balances([profile])
 
         tx = Transaction.objects.create(
             sender=target_user,
@@ -39,6 +43,8 @@ def admin_deduct_coins(
             tx_type='mint',
             note=note or f'Admin deduction by {admin_user.username}',
         )
+        record_ledger([tx], {target_user.pk: profile.balance})
+        record_transactions([tx])
 
         logger.info(
             'Admin deduction: admin=%s target=%s requested=%d actual=%d',
@@ -55,6 +61,7 @@ def admin_cancel_coinflip(admin_user, challenge_id):
         challenge = CoinFlipChallenge.objects.select_for_update().get(pk=challenge_id)
         challenge.status = 'cancelled'
         challenge.save(update_fields=['status'])
+        invalidate_activity(challenge.challenger_id, challenge.opponent_id)
 
         logger.info(
             'Admin cancel coinflip: admin=%s challenge=%d',
@@ -73,6 +80,7 @@ def admin_cancel_chess(admin_user, game_id):
         game.end_reason = 'cancelled'
         game.ended_at = timezone.now()
         game.save(update_fields=['status', 'end_reason', 'ended_at'])
+        invalidate_activity(game.creator_id, game.opponent_id)
 
         logger.info(
             'Admin cancel chess: admin=%s game=%d',
@@ -96,6 +104,7 @@ def admin_cancel_poker(admin_user, table_id):
         table.status = 'cancelled'
         table.ended_at = timezone.now()
         table.save(update_fields=['status', 'ended_at'])
+        invalidate_activity(*table.players.values_list('user_id', flat=True))
 
         logger.info(
             'Admin cancel poker: admin=%s table=%d refunded=%d players',
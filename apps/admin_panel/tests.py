@@ -1,11 +1,17 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
 from django.contrib.auth.models import User
 from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from apps.accounts.models import UserProfile
 from apps.chess.models import ChessGame
 from apps.coinflip.models import CoinFlipChallenge
 from apps.economy.models import Transaction
+from apps.notifications.activity import activity_summary
 from apps.poker.models import PokerPlayer, PokerTable
 
 from .services import admin_cancel_chess, admin_cancel_coinflip, admin_deduct_coins
@@ -254,6 +260,73 @@ class EconomyTest(AdminPanelTestCase):
         self.assertContains(resp, 'Coins in Circulation')
 
 
+class TransactionExportTest(AdminPanelTestCase):
+    def setUp(self):
+        super().setUp()
+        # Several rows share a timestamp so page boundaries fall inside ties.
+        base = timezone.now() - timedelta(days=3)
+        for i in range(12):
+            tx = Transaction.objects.create(
+                sender=self.admin if i % 3 else None, receiver=self.user,
+                amount=i + 1, tx_type='trade' if i % 3 else 'mint',
+            )
+            Transaction.objects.filter(pk=tx.pk).update(
+                created_at=base + timedelta(hours=i // 4),
+            )
+
+    def _newest_first(self, txs):
+        return list(txs.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def test_keyset_pages_cover_every_row_once(self):
+        self.client.login(username='admin', password='pass')
+        seen = []
+        params = {}
+        with mock.patch('apps.admin_panel.views.TRANSACTIONS_PER_PAGE', 5):
+            while True:
+                resp = self.client.get(reverse('admin_transactions'), params)
+                self.assertEqual(resp.status_code, 200)
+                seen.extend(tx.pk for tx in resp.context['txs'])
+                if not resp.context['next_cursor']:
+                    break
+                params = {'cursor': resp.context['next_cursor']}
+        self.assertEqual(seen, self._newest_first(Transaction.objects.all()))
+
+    def test_invalid_cursor_and_dates_show_first_page(self):
+        self.client.login(username='admin', password='pass')
+        resp = self.client.get(reverse('admin_transactions'), {
+            'cursor': 'bogus', 'date_from': 'not-a-date',
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context['txs']), 12)
+
+    def test_csv_export_streams_filtered_rows(self):
+        self.client.login(username='admin', password='pass')
+        with mock.patch('apps.admin_panel.exports.EXPORT_PAGE_SIZE', 3):
+            resp = self.client.get(reverse('admin_transactions_export'), {'type': 'trade'})
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        lines = b''.join(resp.streaming_content).decode().strip().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['ID', 'Date', 'Type'])
+        ids = [int(line.split(',')[0]) for line in lines[1:]]
+        self.assertEqual(ids, self._newest_first(Transaction.objects.filter(tx_type='trade')))
+
+    def test_jsonl_export_filters_by_date(self):
+        self.client.login(username='admin', password='pass')
+        Transaction.objects.create(receiver=self.user, amount=7, tx_type='mint')
+        today = timezone.now().date().isoformat()
+        resp = self.client.get(reverse('admin_transactions_export'), {
+            'format': 'jsonl', 'date_from': today, 'date_to': today,
+        })
+        rows = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['amount'], 7)
+        self.assertIsNone(rows[0]['sender'])
+
+    def test_export_requires_admin(self):
+        self.client.login(username='user1', password='pass')
+        resp = self.client.get(reverse('admin_transactions_export'))
+        self.assertEqual(resp.status_code, 403)
+
+
 class ServiceTest(AdminPanelTestCase):
     def test_admin_deduct_coins(self):
         tx = admin_deduct_coins(self.admin, self.user, 200, 'Test deduct')
@@ -284,3 +357,14 @@ class ServiceTest(AdminPanelTestCase):
         self.assertEqual(result.status, 'cancelled')
         self.assertEqual(result.end_reason, 'cancelled')
         self.assertIsNotNone(result.ended_at)
+
+    def test_admin_cancel_drops_players_activity(self):
+        game = ChessGame.objects.create(
+            creator=self.admin, opponent=self.user,
+            stake=200, status='active',
+        )
+        self.assertEqual(activity_summary(self.user)['chess'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            admin_cancel_chess(self.admin, game.pk)
+        self.assertEqual(activity_summary(self.user)['chess'], 0)
+        self.assertEqual(activity_summary(self.admin)['chess'], 0)
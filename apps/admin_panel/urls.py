@@ -19,5 +19,6 @@ urlpatterns = [
     path('games/<str:game_type>/<int:game_id>/refund/', views.refund_game_view, name='admin_refund_game'),
     # Economy
     path('economy/', views.transaction_list_view, name='admin_transactions'),
+    path('economy/export/', views.transaction_export_view, name='admin_transactions_export'),
     path('economy/stats/', views.economy_stats_view, name='admin_economy_stats'),
 ]
@@ -4,10 +4,10 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
 from django.db.models import Avg, Count, Q, Sum
-from django.db.models.functions import TruncDate
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.http import urlencode
 from django.views.decorators.http import require_POST
 
 from apps.accounts.decorators import rate_limit
@@ -15,9 +15,12 @@ from apps.chess.models import ChessGame
 from apps.coinflip.models import CoinFlipChallenge
 from apps.economy.models import Transaction
 from apps.economy.services import InvalidTrade, mint_coins
+from apps.economy.snapshots import daily_volume, economy_totals
+from apps.pagination import keyset_page
 from apps.poker.models import PokerPlayer, PokerTable
 
 from .decorators import admin_required
+from .exports import csv_lines, filter_transactions, iter_export_rows, jsonl_lines
 from .forms import BalanceAdjustmentForm, RefundForm
 from .services import (
     admin_cancel_chess,
@@ -27,6 +30,8 @@ from .services import (
     admin_refund_game,
 )
 
+TRANSACTIONS_PER_PAGE = 50
+
 
 # ---------------------------------------------------------------------------
 # Dashboard
@@ -72,13 +77,7 @@ def dashboard_view(request):
     )
 
     # Economy stats
-    from apps.accounts.models import UserProfile
-    total_circulation = UserProfile.objects.aggregate(total=Sum('balance'))['total'] or 0
-    tx_sums = Transaction.objects.aggregate(
-        total_minted=Sum('amount', filter=Q(tx_type='mint')),
-        total_traded=Sum('amount', filter=Q(tx_type='trade')),
-        total_wagered=Sum('amount', filter=Q(tx_type__in=['game', 'game_win', 'game_loss'])),
-    )
+    economy = economy_totals()
 
     return render(request, 'admin_panel/dashboard.html', {
         'total_users': total_users,
@@ -88,10 +87,10 @@ def dashboard_view(request):
         'coinflip_stats': coinflip_stats,
         'chess_stats': chess_stats,
         'poker_stats': poker_stats,
-        'total_circulation': total_circulation,
-        'total_minted': tx_sums['total_minted'] or 0,
-        'total_traded': tx_sums['total_traded'] or 0,
-        'total_wagered': tx_sums['total_wagered'] or 0,
+        'total_circulation': economy['circulation'],
+        'total_minted': economy['minted'],
+        'total_traded': economy['traded'],
+        'total_wagered': economy['game_volume'],
     })
 
 
@@ -442,63 +441,44 @@ def refund_game_view(request, game_type, game_id):
 
 @admin_required
 def transaction_list_view(request):
-    txs = Transaction.objects.select_related('sender', 'receiver').order_by('-created_at')
-
-    tx_type = request.GET.get('type', '')
-    if tx_type:
-        txs = txs.filter(tx_type=tx_type)
-
-    user_q = request.GET.get('user', '').strip()
-    if user_q:
-        txs = txs.filter(
-            Q(sender__username__icontains=user_q) | Q(receiver__username__icontains=user_q)
-        )
-
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    if date_from:
-        txs = txs.filter(created_at__date__gte=date_from)
-    if date_to:
-        txs = txs.filter(created_at__date__lte=date_to)
-
-    paginator = Paginator(txs, 50)
-    page = paginator.get_page(request.GET.get('page'))
-
+    txs, filters = filter_transactions(request.GET)
+    cursor = request.GET.get('cursor', '')
+    rows, next_cursor = keyset_page(txs.select_related('sender', 'receiver'), cursor, TRANSACTIONS_PER_PAGE)
+
+    context = {
+        'txs': rows,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'filter_query': urlencode(filters),
+        'tx_type': filters['type'],
+        'user_q': filters['user'],
+        'date_from': filters['date_from'],
+        'date_to': filters['date_to'],
+    }
     if request.htmx:
-        return render(request, 'admin_panel/partials/transaction_rows.html', {
-            'page': page, 'tx_type': tx_type, 'user_q': user_q,
-            'date_from': date_from, 'date_to': date_to,
-        })
+        return render(request, 'admin_panel/partials/transaction_rows.html', context)
+    return render(request, 'admin_panel/economy/transactions.html', context)
 
-    return render(request, 'admin_panel/economy/transactions.html', {
-        'page': page, 'tx_type': tx_type, 'user_q': user_q,
-        'date_from': date_from, 'date_to': date_to,
-    })
+
+@admin_required
+def transaction_export_view(request):
+    """Stream every transaction matching the list filters as CSV or JSONL."""
+    txs, _ = filter_transactions(request.GET)
+    rows = iter_export_rows(txs)
+
+    if request.GET.get('format') == 'jsonl':
+        response = StreamingHttpResponse(jsonl_lines(rows), content_type='application/x-ndjson')
+        filename = 'ledger.jsonl'
+    else:
+        response = StreamingHttpResponse(csv_lines(rows), content_type='text/csv')
+        filename = 'ledger.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @admin_required
 def economy_stats_view(request):
-    from apps.accounts.models import UserProfile
-
-    total_circulation = UserProfile.objects.aggregate(total=Sum('balance'))['total'] or 0
-    total_minted = Transaction.objects.filter(tx_type='mint').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-
-    # Daily volume for last 30 days
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    daily_volume = (
-        Transaction.objects.filter(created_at__gte=thirty_days_ago)
-        .annotate(date=TruncDate('created_at'))
-        .values('date')
-        .annotate(
-            mint_volume=Sum('amount', filter=Q(tx_type='mint')),
-            trade_volume=Sum('amount', filter=Q(tx_type='trade')),
-            game_volume=Sum('amount', filter=Q(tx_type__in=['game', 'game_win', 'game_loss'])),
-            tx_count=Count('id'),
-        )
-        .order_by('-date')
-    )
+    economy = economy_totals()
 
     # Top 10 holders
     top_holders = User.objects.select_related('profile').order_by(
@@ -506,8 +486,8 @@ def economy_stats_view(request):
     )[:10]
 
     return render(request, 'admin_panel/economy/stats.html', {
-        'total_circulation': total_circulation,
-        'total_minted': total_minted,
-        'daily_volume': daily_volume,
+        'total_circulation': economy['circulation'],
+        'total_minted': economy['minted'],
+        'daily_volume': daily_volume(days=30),
         'top_holders': top_holders,
     })
@@ -0,0 +1,88 @@
+"""Live chess games kept in memory by the consumer process.
+
+Each active game that has seen a move is cached as its ``ChessGame`` row
+plus a python-chess ``Board`` that carries the full move stack. Moves are
+validated and applied against the cached board, so the hot path needs no
+DB read and no FEN parse, and repetition rules (which need the stack) work.
+
+On a miss the board is replayed from the game's ``ChessMove`` rows and
+checked against the stored FEN; if they disagree the stored FEN wins and the game continues
+without history. The least recently used games are dropped beyond
+``MAX_LIVE_GAMES``, and a game is discarded as soon as it ends.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+import chess
+
+logger = logging.getLogger(__name__)
+
+MAX_LIVE_GAMES = 1000
+
+
+def build_board(moves_uci, fen):
+    """Replay ``moves_uci`` from the start position, checked against ``fen``."""
+    board = chess.Board()
+    try:
+        for uci in moves_uci.split():
+            board.push_uci(uci)
+    except ValueError:
+        board = None
+    if board is None or board.fen() != fen:
+        logger.warning('Chess move list does not reach the stored FEN: %s', fen)
+        board = chess.Board(fen)
+    return board
+
+
+class LiveGame:
+    __slots__ = ('game', 'board')
+
+    def __init__(self, game, board):
+        self.game = game
+        self.board = board
+
+
+class GameRegistry:
+    """LRU map of game id to ``LiveGame``.
+
+    Guarded by a lock because games are also discarded from DB helpers
+    running in the sync thread pool.
+    """
+
+    def __init__(self, maxsize=MAX_LIVE_GAMES):
+        self.maxsize = maxsize
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._games)
+
+    def get(self, game_id):
+        with self._lock:
+            entry = self._games.get(game_id)
+            if entry is not None:
+                self._games.move_to_end(game_id)
+            return entry
+
+    def load(self, game):
+        """Cache ``game`` with a board rebuilt from its move list.
+
+        Reads ``game.moves_uci``, so call it where the ORM may be used or
+        with the move list already loaded.
+        """
+        entry = LiveGame(game, build_board(game.moves_uci, game.fen))
+        with self._lock:
+            self._games[game.pk] = entry
+            self._games.move_to_end(game.pk)
+            while len(self._games) > self.maxsize:
+                self._games.popitem(last=False)
+        return entry
+
+    def discard(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+
+live_games = GameRegistry()
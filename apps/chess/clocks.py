@@ -0,0 +1,222 @@
+"""Server-side chess clocks.
+
+The server keeps both clocks in milliseconds. ``white_ms``/``black_ms``
+hold what each side had when the side to move started thinking (at
+``last_move_at``, or ``started_at`` before the first move), so the running
+clock is always derived from the server's own timestamps and never from
+the client. ``debit_move`` charges a move against the mover, crediting back
+measured network lag (capped) and adding the game's increment.
+
+Every active game also stores ``clock_expires_at``: the moment the side to
+move runs out of time. ``end_due_games`` ends the games whose deadline has
+passed, reading only those rows through the partial index.
+
+Inside the ASGI process ``timeout_worker`` sleeps until the nearest
+deadline and flags the game as soon as it passes; consumers nudge it when a
+move sets an earlier deadline. The ``enforce_chess_timeouts`` command runs
+the same check from cron, for games nobody has connected to since a restart.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from apps.economy.services import InsufficientFunds, game_transfer
+from apps.notifications.activity import invalidate_activity
+from apps.notifications.services import send_notifications_bulk
+
+from .boards import live_games
+from .models import ChessGame
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on one sleep, so deadlines set by another process are seen.
+MAX_SLEEP = 60
+
+# Most network lag credited back on a single move.
+MAX_LAG_COMPENSATION_MS = 500
+
+
+def side_to_move(fen):
+    """Return 'white' or 'black' from the active-colour field of ``fen``."""
+    parts = fen.split(' ')
+    return 'black' if len(parts) > 1 and parts[1] == 'b' else 'white'
+
+
+def _ms_between(start, end):
+    return round((end - start).total_seconds() * 1000)
+
+
+def clock_started_at(game):
+    """When the side to move's clock started running."""
+    return game.last_move_at or game.started_at
+
+
+def clock_expiry(fen, white_ms, black_ms, since):
+    """Return when the side to move in ``fen`` flags, its clock running from ``since``."""
+    remaining = black_ms if side_to_move(fen) == 'black' else white_ms
+    return since + timedelta(milliseconds=remaining)
+
+
+def clock_state(game, now=None):
+    """Return ``(white_ms, black_ms)`` as of ``now``, the running clock debited."""
+    white_ms, black_ms = game.white_ms, game.black_ms
+    started = clock_started_at(game)
+    if game.status == 'active' and started:
+        elapsed = _ms_between(started, now or timezone.now())
+        if side_to_move(game.fen) == 'white':
+            white_ms = max(0, white_ms - elapsed)
+        else:
+            black_ms = max(0, black_ms - elapsed)
+    return white_ms, black_ms
+
+
+def debit_move(game, received_at, lag_ms=0):
+    """Charge the side to move for a move the server received at ``received_at``.
+
+    ``lag_ms`` is the round trip the server measured to the mover and is
+    credited back up to ``MAX_LAG_COMPENSATION_MS``. Returns the clocks
+    ``(white_ms, black_ms)`` after the move, increment included, or ``None``
+    if the mover had already run out of time.
+    """
+    elapsed = _ms_between(clock_started_at(game), received_at)
+    elapsed = max(0, elapsed - min(max(lag_ms, 0), MAX_LAG_COMPENSATION_MS))
+    white_ms, black_ms = game.white_ms, game.black_ms
+    bonus = game.increment * 1000
+    if side_to_move(game.fen) == 'white':
+        if elapsed >= white_ms:
+            return None
+        white_ms += bonus - elapsed
+    else:
+        if elapsed >= black_ms:
+            return None
+        black_ms += bonus - elapsed
+    return white_ms, black_ms
+
+
+def end_timed_out_game(game, now):
+    """Flag the side to move in ``game`` and settle the stake.
+
+    Returns the event to broadcast to the game's group, or ``None`` if the
+    game was already over.
+    """
+    if side_to_move(game.fen) == 'white':
+        winner, loser = game.black_player, game.white_player
+    else:
+        winner, loser = game.white_player, game.black_player
+    if not winner or not loser:
+        return None
+
+    live_games.discard(game.pk)
+    # Atomically transition active -> completed (TOCTOU guard)
+    updated = ChessGame.objects.filter(pk=game.pk, status='active').update(
+        status='completed',
+        winner=winner,
+        end_reason='timeout',
+        ended_at=now,
+    )
+    if not updated:
+        return None
+    invalidate_activity(game.creator_id, game.opponent_id)
+
+    try:
+        game_transfer(winner, loser, game.stake, note='Chess - timeout')
+    except InsufficientFunds:
+        ChessGame.objects.filter(pk=game.pk).update(
+            status='cancelled',
+            end_reason='cancelled',
+            ended_at=now,
+        )
+        return {'type': 'game_error', 'message': 'Game cancelled - insufficient balance.'}
+
+    send_notifications_bulk([
+        (winner, 'Chess Win!',
+         f'You won {game.stake} LC from {loser.profile.get_display_name()} by timeout.'),
+        (loser, 'Chess Defeat',
+         f'You lost {game.stake} LC to {winner.profile.get_display_name()} by timeout.'),
+    ], 'game_result', link='/chess/')
+    return {
+        'type': 'chess_game_over',
+        'winner': winner.username,
+        'reason': 'timeout',
+        'stake': game.stake,
+    }
+
+
+def end_due_games(now=None):
+    """End every active game whose clock has run out.
+
+    Returns ``[(game_id, event)]`` for the games this call ended.
+    """
+    now = now or timezone.now()
+    due = ChessGame.objects.filter(
+        status='active', clock_expires_at__lte=now,
+    ).select_related('white_player__profile', 'black_player__profile')
+
+    ended = []
+    for game in due:
+        event = end_timed_out_game(game, now)
+        if event is not None:
+            ended.append((game.pk, event))
+    return ended
+
+
+def next_expiry():
+    """Return the earliest pending clock deadline, or ``None``."""
+    return (
+        ChessGame.objects.filter(status='active', clock_expires_at__isnull=False)
+        .order_by('clock_expires_at')
+        .values_list('clock_expires_at', flat=True)
+        .first()
+    )
+
+
+class TimeoutWorker:
+    """Single task that ends games the moment their clock runs out."""
+
+    def __init__(self):
+        self._task = None
+        self._wakeup = None
+        self._next_at = None
+
+    def ensure_running(self):
+        """Start the worker on the running event loop if it is not running."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._next_at = None
+            self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    def notify(self, expires_at):
+        """Wake the worker if ``expires_at`` is sooner than what it waits for."""
+        if self._wakeup is not None and (self._next_at is None or expires_at < self._next_at):
+            self._wakeup.set()
+
+    async def _run(self):
+        layer = get_channel_layer()
+        while True:
+            self._wakeup.clear()
+            try:
+                for game_id, event in await database_sync_to_async(end_due_games)():
+                    logger.info('Chess game %s ended on time', game_id)
+                    await layer.group_send(f'chess_{game_id}', event)
+                self._next_at = await database_sync_to_async(next_expiry)()
+            except Exception:
+                logger.exception('Chess timeout check failed')
+                self._next_at = None
+
+            timeout = MAX_SLEEP
+            if self._next_at is not None:
+                timeout = min(max((self._next_at - timezone.now()).total_seconds(), 0), MAX_SLEEP)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+timeout_worker = TimeoutWorker()
@@ -1,15 +1,23 @@
 import json
 import logging
+import time
+from datetime import timedelta
 
 import chess
 from channels.db import database_sync_to_async
+from django.db import transaction
 from django.utils import timezone
 
 from apps.economy.services import InsufficientFunds
 from apps.games.mixins import BaseGameConsumer
-from apps.notifications.services import send_notification
+from apps.notifications.activity import invalidate_activity
+from apps.notifications.services import send_notifications_bulk
 
-from .models import ChessGame
+from .boards import live_games
+from .clocks import (
+    clock_expiry, clock_state, debit_move, end_timed_out_game, side_to_move, timeout_worker,
+)
+from .models import ChessGame, ChessMove, encode_move
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +30,16 @@ class ChessConsumer(BaseGameConsumer):
         self.room_group_name = f'chess_{self.game_id}'
         self.user = self.scope['user']
         self.is_spectator = False
+        # Round trip to this client, measured from our last chess_move to
+        # its move_ack, and credited back on the player's next move.
+        self._lag_ms = 0
+        self._move_sent_at = None
 
         if self.user.is_anonymous:
             await self.close()
             return
 
-        game = await self.get_game()
+        game = await self.get_game(with_moves=True)
         if not game:
             await self.close()
             return
@@ -43,6 +55,7 @@ class ChessConsumer(BaseGameConsumer):
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
+        timeout_worker.ensure_running()
 
         logger.info('Chess WS connected: user=%s game=%s spectator=%s', self.user.username, self.game_id, self.is_spectator)
 
@@ -56,6 +69,7 @@ class ChessConsumer(BaseGameConsumer):
             just_activated = await self.activate_game(game)
             if just_activated:
                 game = await self.get_game()
+                timeout_worker.notify(game.clock_expires_at)
 
         if just_activated:
             # Broadcast updated game_state to ALL players in the room so the
@@ -65,7 +79,7 @@ class ChessConsumer(BaseGameConsumer):
             })
         else:
             # Send current game state only to the newly connected player
-            white_time, black_time = self.get_adjusted_times(game)
+            white_ms, black_ms = clock_state(game)
             your_side = None
             if not self.is_spectator and game.white_player and game.black_player:
                 your_side = game.get_player_side(self.user)
@@ -76,8 +90,9 @@ class ChessConsumer(BaseGameConsumer):
                 'moves_uci': game.moves_uci,
                 'white_player': game.white_player.username if game.white_player else None,
                 'black_player': game.black_player.username if game.black_player else None,
-                'white_time': white_time,
-                'black_time': black_time,
+                'white_ms': white_ms,
+                'black_ms': black_ms,
+                'increment': game.increment,
                 'your_side': your_side,
                 'spectating': self.is_spectator,
             }))
@@ -98,6 +113,9 @@ class ChessConsumer(BaseGameConsumer):
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
 
     async def receive(self, text_data):
+        # Moves are charged to the clock as of arrival, before any DB work
+        received_at = timezone.now()
+
         # Spectators cannot send any game actions
         if self.is_spectator:
             return
@@ -115,7 +133,9 @@ class ChessConsumer(BaseGameConsumer):
             return
 
         if action == 'move':
-            await self.handle_move(data)
+            await self.handle_move(data, received_at)
+        elif action == 'move_ack':
+            self.handle_move_ack()
         elif action == 'resign':
             await self.handle_resign()
         elif action == 'timeout':
@@ -127,32 +147,26 @@ class ChessConsumer(BaseGameConsumer):
         elif action == 'respond_draw':
             await self.handle_respond_draw(data)
 
-    async def handle_move(self, data):
+    async def handle_move(self, data, received_at):
         """Validate and relay a move to the other player.
 
-        Uses python-chess for server-side move validation.  The FEN after the
+        Uses python-chess for server-side move validation against the
+        game's cached board (see ``apps.chess.boards``).  The FEN after the
         move is computed on the server - the client-supplied 'fen' field is
-        intentionally ignored to prevent game-state forgery.
+        intentionally ignored to prevent game-state forgery.  Clocks are
+        likewise server-side: the mover is charged up to ``received_at``.
         """
-        game = await self.get_game()
-        if not game or game.status != 'active':
+        entry = await self.get_live_game()
+        if entry is None:
             return
+        game, board = entry.game, entry.board
 
         side = game.get_player_side(self.user)
         move_uci = data.get('move', '').strip()
-        white_time = data.get('white_time')
-        black_time = data.get('black_time')
 
         if not move_uci:
             return
 
-        # Server-side validation via python-chess
-        try:
-            board = chess.Board(game.fen)
-        except ValueError:
-            logger.warning('Corrupt FEN in game %s: %s', game.pk, game.fen)
-            return
-
         # Validate it's this player's turn
         if (board.turn == chess.WHITE and side != 'white') or \
            (board.turn == chess.BLACK and side != 'black'):
@@ -171,27 +185,57 @@ class ChessConsumer(BaseGameConsumer):
             )
             return
 
-        # Apply the move and derive the authoritative FEN server-side
-        board.push(move)
-        fen_after = board.fen()
+        clocks = debit_move(game, received_at, self._lag_ms)
+        if clocks is None:
+            # The flag fell before the move arrived
+            live_games.discard(game.pk)
+            event = await database_sync_to_async(end_timed_out_game)(game, timezone.now())
+            if event:
+                await self.channel_layer.group_send(self.room_group_name, event)
+            return
+        white_ms, black_ms = clocks
 
-        await self.save_move(game.pk, move_uci, fen_after, white_time, black_time)
+        # Apply the move and derive the authoritative FEN server-side.  The
+        # cached row (move list included) is updated before saving so a move
+        # handled meanwhile by the opponent's consumer already sees this one.
+        fen_before = game.fen
+        san = board.san(move)
+        board.push(move)
+        game.fen = board.fen()
+        game.moves_uci = (game.moves_uci + ' ' + move_uci).strip()
+        game.last_move_at = received_at
+        game.white_ms, game.black_ms = white_ms, black_ms
+        game.clock_expires_at = clock_expiry(game.fen, white_ms, black_ms, received_at)
+
+        clock_ms = white_ms if side == 'white' else black_ms
+        if not await self.save_move(game, fen_before, board.ply(), move, san, clock_ms):
+            # The game ended or moved on elsewhere; drop the stale board
+            live_games.discard(game.pk)
+            return
+        timeout_worker.notify(game.clock_expires_at)
 
         await self.channel_layer.group_send(self.room_group_name, {
             'type': 'chess_move',
             'move': move_uci,
-            'fen': fen_after,
+            'fen': game.fen,
             'player': self.user.username,
-            'white_time': white_time,
-            'black_time': black_time,
+            'white_ms': white_ms,
+            'black_ms': black_ms,
         })
 
         # Detect game-over server-side so the result is never lost to throttling
         # (the client sends game_over right after move on the same connection,
         # which would otherwise be dropped by the 0.15 s MESSAGE_COOLDOWN guard).
-        if board.is_game_over():
+        # A position repeated three times ends the game as a draw too.
+        if board.is_game_over() or board.is_repetition(3):
             await self._finish_game_after_move(game, side, board)
 
+    def handle_move_ack(self):
+        """The client received the opponent's move; record the round trip."""
+        if self._move_sent_at is not None:
+            self._lag_ms = round((time.monotonic() - self._move_sent_at) * 1000)
+            self._move_sent_at = None
+
     async def handle_resign(self):
         game = await self.get_game()
         if not game or game.status != 'active':
@@ -373,7 +417,7 @@ class ChessConsumer(BaseGameConsumer):
                 reason = 'seventy_five' if board.is_seventyfive_moves() else 'fifty_move'
             elif board.is_fivefold_repetition():
                 reason = 'fivefold'
-            elif board.can_claim_threefold_repetition():
+            elif board.is_repetition(3):
                 reason = 'threefold'
             else:
                 reason = 'draw'
@@ -400,9 +444,7 @@ class ChessConsumer(BaseGameConsumer):
             return
 
         # Only allow draw offers on your turn
-        board = chess.Board(game.fen)
-        if (board.turn == chess.WHITE and side != 'white') or \
-           (board.turn == chess.BLACK and side != 'black'):
+        if side_to_move(game.fen) != side:
             return
 
         await self.channel_layer.group_send(self.room_group_name, {
@@ -437,10 +479,10 @@ class ChessConsumer(BaseGameConsumer):
 
     async def game_activated(self, event):
         """Sent to the whole group when the game transitions pending → active."""
-        game = await self.get_game()
+        game = await self.get_game(with_moves=True)
         if not game:
             return
-        white_time, black_time = self.get_adjusted_times(game)
+        white_ms, black_ms = clock_state(game)
         await self.send(text_data=json.dumps({
             'type': 'game_state',
             'status': game.status,
@@ -448,8 +490,9 @@ class ChessConsumer(BaseGameConsumer):
             'moves_uci': game.moves_uci,
             'white_player': game.white_player.username if game.white_player else None,
             'black_player': game.black_player.username if game.black_player else None,
-            'white_time': white_time,
-            'black_time': black_time,
+            'white_ms': white_ms,
+            'black_ms': black_ms,
+            'increment': game.increment,
             'your_side': game.get_player_side(self.user) if game.white_player and game.black_player else None,
         }))
 
@@ -466,13 +509,15 @@ class ChessConsumer(BaseGameConsumer):
         }))
 
     async def chess_move(self, event):
+        if not self.is_spectator and event['player'] != self.user.username:
+            self._move_sent_at = time.monotonic()
         await self.send(text_data=json.dumps({
             'type': 'chess_move',
             'move': event['move'],
             'fen': event['fen'],
             'player': event['player'],
-            'white_time': event['white_time'],
-            'black_time': event['black_time'],
+            'white_ms': event['white_ms'],
+            'black_ms': event['black_ms'],
         }))
 
     async def chess_game_over(self, event):
@@ -501,37 +546,23 @@ class ChessConsumer(BaseGameConsumer):
             'message': event['message'],
         }))
 
-    # Time helpers 
-
-    @staticmethod
-    def get_adjusted_times(game):
-        """Return (white_time, black_time) adjusted for elapsed time since last move.
-
-        The DB stores the clock values as of the last move.  If a game is
-        active, the current player's clock has been ticking since then.
-        """
-        white_time = game.white_time
-        black_time = game.black_time
-        if game.status == 'active' and game.last_move_at:
-            elapsed = (timezone.now() - game.last_move_at).total_seconds()
-            # Determine whose clock is running from the FEN active color
-            parts = game.fen.split(' ')
-            active_color = parts[1] if len(parts) > 1 else 'w'
-            if active_color == 'w':
-                white_time = max(0, int(white_time - elapsed))
-            else:
-                black_time = max(0, int(black_time - elapsed))
-        return white_time, black_time
-
     # Database helpers 
 
     @database_sync_to_async
-    def get_game(self):
+    def get_game(self, with_moves=False):
+        """Load the game; ``with_moves`` prefetches its moves for ``moves_uci``.
+
+        Only the paths that send ``game_state`` or build the board need the
+        moves, and they must ask for them here so no query runs in async code.
+        """
+        games = ChessGame.objects.select_related(
+            'white_player__profile', 'black_player__profile',
+            'creator', 'opponent',
+        )
+        if with_moves:
+            games = games.prefetch_related('moves')
         try:
-            return ChessGame.objects.select_related(
-                'white_player__profile', 'black_player__profile',
-                'creator', 'opponent',
-            ).get(pk=self.game_id)
+            return games.get(pk=self.game_id)
         except ChessGame.DoesNotExist:
             return None
 
@@ -555,36 +586,56 @@ class ChessConsumer(BaseGameConsumer):
             white_id = game.opponent_id
             black_id = game.creator_id
 
+        now = timezone.now()
         updated = ChessGame.objects.filter(pk=game.pk, status='pending').update(
             status='active',
             white_player_id=white_id,
             black_player_id=black_id,
-            white_time=game.time_control,
-            black_time=game.time_control,
-            started_at=timezone.now(),
+            white_ms=game.time_control * 1000,
+            black_ms=game.time_control * 1000,
+            started_at=now,
+            clock_expires_at=now + timedelta(seconds=game.time_control),
         )
+        if updated:
+            invalidate_activity(game.creator_id, game.opponent_id)
         return updated > 0
 
+    async def get_live_game(self):
+        """Return the cached ``LiveGame`` for an active game, loading it on a miss."""
+        entry = live_games.get(int(self.game_id))
+        if entry is None:
+            game = await self.get_game(with_moves=True)
+            if not game or game.status != 'active':
+                return None
+            entry = live_games.load(game)
+        return entry
+
     @database_sync_to_async
-    def save_move(self, game_id, move_uci, fen_after, white_time, black_time):
-        game = ChessGame.objects.get(pk=game_id)
-        moves = (game.moves_uci + ' ' + move_uci).strip()
-        update = {
-            'fen': fen_after,
-            'moves_uci': moves,
-            'last_move_at': timezone.now(),
-        }
-        # Only accept times that are non-negative and not higher than the
-        # current stored value - prevents clients from inflating their clock.
-        if white_time is not None:
-            wt = int(white_time)
-            if 0 <= wt <= game.white_time:
-                update['white_time'] = wt
-        if black_time is not None:
-            bt = int(black_time)
-            if 0 <= bt <= game.black_time:
-                update['black_time'] = bt
-        ChessGame.objects.filter(pk=game_id).update(**update)
+    def save_move(self, game, fen_before, ply, move, san, clock_ms):
+        """Write the move already applied to ``game`` and append its row.
+
+        Conditional on the stored FEN so a stale cached game can never
+        overwrite newer state; returns False if nothing was written.
+        """
+        with transaction.atomic():
+            updated = ChessGame.objects.filter(pk=game.pk, status='active', fen=fen_before).update(
+                fen=game.fen,
+                last_move_at=game.last_move_at,
+                white_ms=game.white_ms,
+                black_ms=game.black_ms,
+                clock_expires_at=game.clock_expires_at,
+            )
+            if not updated:
+                return False
+            ChessMove.objects.create(
+                game_id=game.pk,
+                ply=ply,
+                move=encode_move(move),
+                san=san,
+                clock_ms=clock_ms,
+                played_at=game.last_move_at,
+            )
+        return True
 
     @database_sync_to_async
     def finish_game(self, game_id, winner_id, reason):
@@ -592,21 +643,31 @@ class ChessConsumer(BaseGameConsumer):
 
         Returns True if this call performed the update.
         """
+        live_games.discard(game_id)
         updated = ChessGame.objects.filter(pk=game_id, status='active').update(
             status='completed',
             winner_id=winner_id,
             end_reason=reason,
             ended_at=timezone.now(),
         )
+        if updated:
+            self._invalidate_activity(game_id)
         return updated > 0
 
     @database_sync_to_async
     def cancel_game_db(self, game_id):
+        live_games.discard(game_id)
         ChessGame.objects.filter(pk=game_id).update(
             status='cancelled',
             end_reason='cancelled',
             ended_at=timezone.now(),
         )
+        self._invalidate_activity(game_id)
+
+    def _invalidate_activity(self, game_id):
+        invalidate_activity(*ChessGame.objects.filter(pk=game_id).values_list(
+            'creator_id', 'opponent_id',
+        ).first() or ())
 
     @database_sync_to_async
     def create_chess_notifications(self, game, winner, loser, reason):
@@ -615,17 +676,9 @@ class ChessConsumer(BaseGameConsumer):
             'resign': 'resignation',
             'timeout': 'timeout',
         }.get(reason, reason)
-        send_notification(
-            winner,
-            'game_result',
-            'Chess Win!',
-            f'You won {game.stake} LC from {loser.profile.get_display_name()} by {reason_text}.',
-            link='/chess/',
-        )
-        send_notification(
-            loser,
-            'game_result',
-            'Chess Defeat',
-            f'You lost {game.stake} LC to {winner.profile.get_display_name()} by {reason_text}.',
-            link='/chess/',
-        )
+        send_notifications_bulk([
+            (winner, 'Chess Win!',
+             f'You won {game.stake} LC from {loser.profile.get_display_name()} by {reason_text}.'),
+            (loser, 'Chess Defeat',
+             f'You lost {game.stake} LC to {winner.profile.get_display_name()} by {reason_text}.'),
+        ], 'game_result', link='/chess/')
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:35
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_clock_expiry(apps, schema_editor):
+    """Start the deadline for active games from the last move (or the start)."""
+    ChessGame = apps.get_model('chess', 'ChessGame')
+    batch = []
+    games = ChessGame.objects.filter(status='active').exclude(started_at=None)
+    for game in games.iterator(chunk_size=500):
+        parts = game.fen.split(' ')
+        remaining = game.black_time if len(parts) > 1 and parts[1] == 'b' else game.white_time
+        game.clock_expires_at = (game.last_move_at or game.started_at) + timedelta(seconds=remaining)
+        batch.append(game)
+        if len(batch) >= 500:
+            ChessGame.objects.bulk_update(batch, ['clock_expires_at'])
+            batch = []
+    if batch:
+        ChessGame.objects.bulk_update(batch, ['clock_expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0006_add_time_control'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chessgame',
+            name='clock_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chessgame',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['clock_expires_at'], name='chessgame_clock_expires'),
+        ),
+        migrations.RunPython(set_clock_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def seconds_to_ms(apps, schema_editor):
+    ChessGame = apps.get_model('chess', 'ChessGame')
+    ChessGame.objects.update(white_ms=F('white_ms') * 1000, black_ms=F('black_ms') * 1000)
+
+
+def ms_to_seconds(apps, schema_editor):
+    ChessGame = apps.get_model('chess', 'ChessGame')
+    ChessGame.objects.update(white_ms=F('white_ms') / 1000, black_ms=F('black_ms') / 1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0007_clock_expires_at'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='chessgame',
+            old_name='white_time',
+            new_name='white_ms',
+        ),
+        migrations.RenameField(
+            model_name='chessgame',
+            old_name='black_time',
+            new_name='black_ms',
+        ),
+        migrations.AlterField(
+            model_name='chessgame',
+            name='white_ms',
+            field=models.PositiveIntegerField(default=600000),
+        ),
+        migrations.AlterField(
+            model_name='chessgame',
+            name='black_ms',
+            field=models.PositiveIntegerField(default=600000),
+        ),
+        migrations.RunPython(seconds_to_ms, ms_to_seconds),
+        migrations.AddField(
+            model_name='chessgame',
+            name='increment',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'No increment'), (1, '+1 sec'), (2, '+2 sec'), (3, '+3 sec'), (5, '+5 sec'), (10, '+10 sec')], default=0),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:44
+
+import chess
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of apps.chess.models.encode_move / decode_move.
+def _encode(move):
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def _decode(code):
+    return chess.Move(code & 0x3F, code >> 6 & 0x3F, code >> 12 or None)
+
+
+def split_moves(apps, schema_editor):
+    """Replay each game's ``moves_uci`` into move rows with SAN.
+
+    Replay stops at the first move that is not legal in the position.
+    """
+    ChessGame = apps.get_model('chess', 'ChessGame')
+    ChessMove = apps.get_model('chess', 'ChessMove')
+    batch = []
+    for game_id, moves_uci in ChessGame.objects.exclude(moves_uci='').values_list(
+        'pk', 'moves_uci',
+    ).iterator(chunk_size=500):
+        board = chess.Board()
+        for ply, uci in enumerate(moves_uci.split(), start=1):
+            try:
+                move = chess.Move.from_uci(uci)
+            except ValueError:
+                break
+            if move not in board.legal_moves:
+                break
+            batch.append(ChessMove(game_id=game_id, ply=ply, move=_encode(move), san=board.san(move)))
+            board.push(move)
+        if len(batch) >= 500:
+            ChessMove.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ChessMove.objects.bulk_create(batch)
+
+
+def join_moves(apps, schema_editor):
+    ChessGame = apps.get_model('chess', 'ChessGame')
+    ChessMove = apps.get_model('chess', 'ChessMove')
+    moves = {}
+    for game_id, code in ChessMove.objects.order_by('game_id', 'ply').values_list('game_id', 'move'):
+        moves.setdefault(game_id, []).append(_decode(code).uci())
+    batch = [ChessGame(pk=game_id, moves_uci=' '.join(ucis)) for game_id, ucis in moves.items()]
+    ChessGame.objects.bulk_update(batch, ['moves_uci'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0008_clock_milliseconds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChessMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ply', models.PositiveSmallIntegerField()),
+                ('move', models.PositiveSmallIntegerField()),
+                ('san', models.CharField(max_length=10)),
+                ('clock_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('played_at', models.DateTimeField(blank=True, null=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='chess.chessgame')),
+            ],
+            options={
+                'ordering': ['game_id', 'ply'],
+                'constraints': [models.UniqueConstraint(fields=('game', 'ply'), name='unique_chess_move_ply')],
+            },
+        ),
+        migrations.RunPython(split_moves, join_moves),
+        migrations.RemoveField(
+            model_name='chessgame',
+            name='moves_uci',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0009_move_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chessgame',
+            name='pgn',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -1,6 +1,8 @@
+import chess
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils.functional import cached_property
 
 STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
 TIME_CONTROL = 600  # 10 minutes in seconds (legacy default)
@@ -14,6 +16,16 @@ TIME_CONTROL_CHOICES = [
 ]
 TIME_CONTROL_VALUES = {t[0] for t in TIME_CONTROL_CHOICES}
 
+INCREMENT_CHOICES = [
+    (0, 'No increment'),
+    (1, '+1 sec'),
+    (2, '+2 sec'),
+    (3, '+3 sec'),
+    (5, '+5 sec'),
+    (10, '+10 sec'),
+]
+INCREMENT_VALUES = {t[0] for t in INCREMENT_CHOICES}
+
 
 class ChessGame(models.Model):
     STATUS_CHOICES = [
@@ -73,6 +85,8 @@ class ChessGame(models.Model):
     time_control = models.PositiveIntegerField(
         choices=TIME_CONTROL_CHOICES, default=TIME_CONTROL,
     )
+    # Seconds added to a player's clock after each of their moves
+    increment = models.PositiveSmallIntegerField(choices=INCREMENT_CHOICES, default=0)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     winner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -84,12 +98,16 @@ class ChessGame(models.Model):
 
     # Game state
     fen = models.CharField(max_length=200, default=STARTING_FEN)
-    moves_uci = models.TextField(blank=True)  # space-separated UCI moves e.g. "e2e4 e7e5"
 
-    # Timers (seconds remaining)
-    white_time = models.PositiveIntegerField(default=TIME_CONTROL)
-    black_time = models.PositiveIntegerField(default=TIME_CONTROL)
+    # Clocks (milliseconds remaining when the side to move started thinking,
+    # i.e. at last_move_at, or started_at before the first move)
+    white_ms = models.PositiveIntegerField(default=TIME_CONTROL * 1000)
+    black_ms = models.PositiveIntegerField(default=TIME_CONTROL * 1000)
     last_move_at = models.DateTimeField(null=True, blank=True)
+    # When the side to move runs out of time; see apps.chess.clocks.
+    clock_expires_at = models.DateTimeField(null=True, blank=True)
+    # Rendered once the game is completed and first exported; see apps.chess.pgn.
+    pgn = models.TextField(blank=True, default='')
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -102,6 +120,10 @@ class ChessGame(models.Model):
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['creator', 'status']),
             models.Index(fields=['opponent', 'status']),
+            models.Index(
+                fields=['clock_expires_at'], name='chessgame_clock_expires',
+                condition=models.Q(status='active'),
+            ),
         ]
         constraints = [
             models.CheckConstraint(
@@ -115,6 +137,14 @@ class ChessGame(models.Model):
             f'{self.creator.username} vs {self.opponent.username} '            f'({self.stake} LC) - {self.status}'
         )
 
+    @cached_property
+    def moves_uci(self):
+        """Space-separated UCI moves e.g. "e2e4 e7e5", read from ``moves``.
+
+        Uses the prefetched ``moves`` when the game was loaded with them.
+        """
+        return ' '.join(decode_move(m.move).uci() for m in self.moves.all())
+
     def get_player_side(self, user):
         """Return 'white', 'black', or None for the given user."""
         if self.white_player_id == user.pk:
@@ -128,3 +158,37 @@ class ChessGame(models.Model):
         if self.creator_id == user.pk:
             return self.opponent
         return self.creator
+
+
+def encode_move(move):
+    """Pack a python-chess move into 15 bits: from, to and promotion piece."""
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code):
+    return chess.Move(code & 0x3F, code >> 6 & 0x3F, code >> 12 or None)
+
+
+class ChessMove(models.Model):
+    """One ply of a game. Rows are only ever appended."""
+
+    game = models.ForeignKey(ChessGame, on_delete=models.CASCADE, related_name='moves')
+    ply = models.PositiveSmallIntegerField()  # 1 = white's first move
+    move = models.PositiveSmallIntegerField()  # encode_move()
+    san = models.CharField(max_length=10)
+    # Mover's clock after the move (null for games from before clocks were kept)
+    clock_ms = models.PositiveIntegerField(null=True, blank=True)
+    played_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['game_id', 'ply']
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'ply'], name='unique_chess_move_ply'),
+        ]
+
+    def __str__(self):
+        return f'{self.game_id}/{self.ply}: {self.san}'
+
+    @property
+    def uci(self):
+        return decode_move(self.move).uci()
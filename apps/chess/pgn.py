@@ -0,0 +1,101 @@
+"""PGN export for completed chess games.
+
+Move text comes from the SAN stored on each ``ChessMove`` when it was
+played, so no position is replayed here. A completed game's PGN never
+changes: it is rendered the first time it is exported and stored on
+``ChessGame.pgn``, and every later download is a plain read.
+"""
+
+from collections import defaultdict
+from itertools import islice
+
+from .models import ChessGame, ChessMove
+
+LINE_WIDTH = 80
+
+# Games read (and rendered, if needed) per query when streaming an archive.
+ARCHIVE_CHUNK_SIZE = 100
+
+
+def game_result(game):
+    if game.winner_id is None:
+        return '1/2-1/2'
+    if game.winner_id == game.white_player_id:
+        return '1-0'
+    if game.winner_id == game.black_player_id:
+        return '0-1'
+    return '*'
+
+
+def render_pgn(game, san_moves):
+    """Return the PGN text of ``game`` played as ``san_moves``."""
+    white_name = game.white_player.username if game.white_player else '?'
+    black_name = game.black_player.username if game.black_player else '?'
+    result = game_result(game)
+
+    time_control = f'{game.time_control}+{game.increment}' if game.increment else f'{game.time_control}'
+    headers = [
+        '[Event "LoungeTrade Chess"]',
+        '[Site "loungecoin.trade"]',
+        f'[Date "{game.created_at.strftime("%Y.%m.%d")}"]',
+        f'[White "{white_name}"]',
+        f'[Black "{black_name}"]',
+        f'[Result "{result}"]',
+        f'[TimeControl "{time_control}"]',
+        f'[Termination "{game.get_end_reason_display()}"]',
+    ]
+
+    move_parts = []
+    for i, san in enumerate(san_moves):
+        if i % 2 == 0:
+            move_parts.append(f'{i // 2 + 1}. {san}')
+        else:
+            move_parts.append(san)
+    move_parts.append(result)
+
+    lines = []
+    current_line = ''
+    for part in move_parts:
+        if current_line and len(current_line) + 1 + len(part) > LINE_WIDTH:
+            lines.append(current_line)
+            current_line = part
+        else:
+            current_line = (current_line + ' ' + part).strip()
+    if current_line:
+        lines.append(current_line)
+
+    return '\n'.join(headers) + '\n\n' + '\n'.join(lines) + '\n'
+
+
+def game_pgn(game):
+    """Return the stored PGN of completed ``game``, rendering it on first use."""
+    if not game.pgn:
+        game.pgn = render_pgn(game, list(game.moves.values_list('san', flat=True)))
+        ChessGame.objects.filter(pk=game.pk, pgn='').update(pgn=game.pgn)
+    return game.pgn
+
+
+def stream_pgn(games):
+    """Yield the PGN of every completed game in the queryset ``games``.
+
+    Rows are read ``ARCHIVE_CHUNK_SIZE`` at a time, so memory stays flat
+    however many games match. Games without a stored PGN have their moves
+    fetched in one query per chunk and their PGN stored as they go.
+    """
+    rows = games.select_related('white_player', 'black_player').iterator(
+        chunk_size=ARCHIVE_CHUNK_SIZE,
+    )
+    while chunk := list(islice(rows, ARCHIVE_CHUNK_SIZE)):
+        unrendered = [game for game in chunk if not game.pgn]
+        if unrendered:
+            san_moves = defaultdict(list)
+            for game_id, san in ChessMove.objects.filter(
+                game_id__in=[game.pk for game in unrendered],
+            ).order_by('game_id', 'ply').values_list('game_id', 'san'):
+                san_moves[game_id].append(san)
+            for game in unrendered:
+                game.pgn = render_pgn(game, san_moves[game.pk])
+            ChessGame.objects.bulk_update(unrendered, ['pgn'])
+        for game in chunk:
+            # Games in a PGN database are separated by a blank line
+            yield game.pgn + '\n'
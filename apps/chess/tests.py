@@ -1,8 +1,18 @@
+from datetime import timedelta
+from io import StringIO
+
+import chess
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
-from apps.chess.models import ChessGame
+from apps.chess.boards import GameRegistry, build_board
+from apps.chess.clocks import (
+    MAX_LAG_COMPENSATION_MS, clock_expiry, clock_state, debit_move, end_due_games, next_expiry,
+)
+from apps.chess.models import STARTING_FEN, ChessGame, ChessMove, decode_move, encode_move
+from apps.chess.pgn import stream_pgn
 from apps.notifications.models import Notification
 
 
@@ -141,6 +151,18 @@ class CreateChessGameTest(TestCase):
         game = ChessGame.objects.get()
         self.assertEqual(game.time_control, 600)
 
+    def test_increment_stored(self):
+        self.client.login(username='alice', password='pass1234')
+        self._post(time_control=180, increment=2)
+        game = ChessGame.objects.get()
+        self.assertEqual(game.increment, 2)
+
+    def test_invalid_increment_defaults(self):
+        self.client.login(username='alice', password='pass1234')
+        self._post(increment=7)
+        game = ChessGame.objects.get()
+        self.assertEqual(game.increment, 0)
+
 
 class ChessPlayViewAccessTest(TestCase):
     def setUp(self):
@@ -367,9 +389,15 @@ class ChessPGNExportTest(TestCase):
             creator=self.alice, opponent=self.bob, stake=50,
             white_player=self.alice, black_player=self.bob,
             status='completed', winner=self.alice, end_reason='checkmate',
-            moves_uci='e2e4 e7e5 d1h5 b8c6 f1c4 g8f6 h5f7',
             ended_at=timezone.now(),
         )
+        board = chess.Board()
+        for ply, uci in enumerate('e2e4 e7e5 d1h5 b8c6 f1c4 g8f6 h5f7'.split(), start=1):
+            move = chess.Move.from_uci(uci)
+            ChessMove.objects.create(
+                game=self.game, ply=ply, move=encode_move(move), san=board.san(move),
+            )
+            board.push(move)
 
     def test_pgn_download(self):
         self.client.login(username='alice', password='pass1234')
@@ -382,6 +410,20 @@ class ChessPGNExportTest(TestCase):
         self.assertIn('[Result "1-0"]', content)
         self.assertIn('1. e4 e5', content)
 
+    def test_move_list_reads_without_joining_the_game(self):
+        sql = str(self.game.moves.all().query)
+        self.assertNotIn('JOIN', sql)
+        game = ChessGame.objects.prefetch_related('moves').get(pk=self.game.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(game.moves_uci.split()[:2], ['e2e4', 'e7e5'])
+
+    def test_pgn_time_control_includes_increment(self):
+        self.game.increment = 5
+        self.game.save()
+        self.client.login(username='alice', password='pass1234')
+        response = self.client.get(f'/chess/pgn/{self.game.pk}/')
+        self.assertIn('[TimeControl "600+5"]', response.content.decode())
+
     def test_pgn_requires_login(self):
         response = self.client.get(f'/chess/pgn/{self.game.pk}/')
         self.assertEqual(response.status_code, 302)
@@ -393,6 +435,58 @@ class ChessPGNExportTest(TestCase):
         response = self.client.get(f'/chess/pgn/{self.game.pk}/')
         self.assertEqual(response.status_code, 404)
 
+    def test_pgn_is_rendered_once_and_stored(self):
+        self.client.login(username='alice', password='pass1234')
+        first = self.client.get(f'/chess/pgn/{self.game.pk}/').content.decode()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.pgn, first)
+        ChessMove.objects.filter(game=self.game).delete()
+        second = self.client.get(f'/chess/pgn/{self.game.pk}/').content.decode()
+        self.assertEqual(second, first)
+
+    def _draw_game(self):
+        return ChessGame.objects.create(
+            creator=self.bob, opponent=self.alice, stake=10,
+            white_player=self.bob, black_player=self.alice,
+            status='completed', end_reason='draw', ended_at=timezone.now(),
+        )
+
+    def test_archive_pgn_streams_every_matching_game(self):
+        from django.core.cache import cache
+        cache.clear()
+        self._draw_game()
+        self.client.login(username='alice', password='pass1234')
+        response = self.client.get('/chess/archive/pgn/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('[Event '), 2)
+        self.assertIn('[Result "1-0"]', content)
+        self.assertIn('[Result "1/2-1/2"]', content)
+        self.assertIn('\n\n[Event ', content)
+        self.assertEqual(ChessGame.objects.filter(pgn='').count(), 0)
+
+    def test_archive_pgn_applies_archive_filters(self):
+        from django.core.cache import cache
+        cache.clear()
+        self._draw_game()
+        self.client.login(username='alice', password='pass1234')
+        response = self.client.get('/chess/archive/pgn/?result=draws')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('[Event '), 1)
+        self.assertIn('[Result "1/2-1/2"]', content)
+
+    def test_archive_pgn_reads_moves_once_per_chunk(self):
+        for _ in range(3):
+            self._draw_game()
+        games = ChessGame.objects.filter(status='completed')
+        # Games, then the move rows for the whole chunk, then the bulk update
+        with self.assertNumQueries(3):
+            pgns = list(stream_pgn(games))
+        self.assertEqual(len(pgns), 4)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(stream_pgn(games)), pgns)
+
 
 class ChessRematchTest(TestCase):
     def setUp(self):
@@ -459,3 +553,161 @@ class ChessRematchTest(TestCase):
         self.client.login(username='alice', password='pass1234')
         self.client.post(f'/chess/rematch/{self.game.pk}/')
         self.assertEqual(ChessGame.objects.filter(status='pending').count(), 0)
+
+
+class ChessClockExpiryTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+        self.alice.profile.balance = 500
+        self.alice.profile.save()
+        self.bob.profile.balance = 500
+        self.bob.profile.save()
+        self.now = timezone.now()
+
+    def _game(self, expires_in, fen=STARTING_FEN):
+        return ChessGame.objects.create(
+            creator=self.alice, opponent=self.bob, stake=50,
+            white_player=self.alice, black_player=self.bob,
+            status='active', fen=fen, started_at=self.now,
+            clock_expires_at=self.now + timedelta(seconds=expires_in),
+        )
+
+    def test_clock_expiry_uses_side_to_move(self):
+        after_e4 = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+        self.assertEqual(clock_expiry(STARTING_FEN, 60_000, 30_500, self.now), self.now + timedelta(seconds=60))
+        self.assertEqual(clock_expiry(after_e4, 60_000, 30_500, self.now), self.now + timedelta(seconds=30.5))
+
+    def test_only_expired_games_end(self):
+        expired = self._game(-1)
+        running = self._game(30)
+        ended = end_due_games(self.now)
+        self.assertEqual([game_id for game_id, _ in ended], [expired.pk])
+        self.assertEqual(ended[0][1]['winner'], 'bob')
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'completed')
+        self.assertEqual(expired.end_reason, 'timeout')
+        self.assertEqual(expired.winner, self.bob)
+        self.bob.profile.refresh_from_db()
+        self.assertEqual(self.bob.profile.balance, 550)
+        self.assertEqual(next_expiry(), running.clock_expires_at)
+
+    def test_black_flags_when_black_to_move(self):
+        fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+        game = self._game(-1, fen=fen)
+        end_due_games(self.now)
+        game.refresh_from_db()
+        self.assertEqual(game.winner, self.alice)
+
+    def test_finished_games_are_not_revisited(self):
+        self._game(-1)
+        self.assertEqual(len(end_due_games(self.now)), 1)
+        self.assertEqual(end_due_games(self.now), [])
+        self.assertIsNone(next_expiry())
+
+    def test_enforce_command(self):
+        self._game(-1)
+        self._game(30)
+        out = StringIO()
+        call_command('enforce_chess_timeouts', stdout=out)
+        self.assertIn('Timed out 1 game(s).', out.getvalue())
+
+
+class ChessClockTest(SimpleTestCase):
+    AFTER_E4 = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def _game(self, **kwargs):
+        fields = {
+            'status': 'active', 'fen': STARTING_FEN, 'started_at': self.now,
+            'white_ms': 60_000, 'black_ms': 60_000,
+        }
+        fields.update(kwargs)
+        return ChessGame(**fields)
+
+    def test_move_charges_the_mover_to_the_millisecond(self):
+        game = self._game()
+        clocks = debit_move(game, self.now + timedelta(milliseconds=1234))
+        self.assertEqual(clocks, (58_766, 60_000))
+
+    def test_black_is_charged_from_the_last_move(self):
+        game = self._game(fen=self.AFTER_E4, last_move_at=self.now + timedelta(seconds=10))
+        clocks = debit_move(game, self.now + timedelta(seconds=12))
+        self.assertEqual(clocks, (60_000, 58_000))
+
+    def test_increment_is_added_after_the_move(self):
+        game = self._game(increment=2)
+        clocks = debit_move(game, self.now + timedelta(seconds=1))
+        self.assertEqual(clocks, (61_000, 60_000))
+
+    def test_lag_is_credited_up_to_the_cap(self):
+        game = self._game()
+        received = self.now + timedelta(seconds=3)
+        self.assertEqual(debit_move(game, received, lag_ms=200), (57_200, 60_000))
+        self.assertEqual(
+            debit_move(game, received, lag_ms=10_000),
+            (57_000 + MAX_LAG_COMPENSATION_MS, 60_000),
+        )
+
+    def test_move_after_flag_is_rejected(self):
+        game = self._game()
+        self.assertIsNone(debit_move(game, self.now + timedelta(seconds=60)))
+        # Lag credit cannot save a flag that fell long ago
+        self.assertIsNone(debit_move(game, self.now + timedelta(seconds=70), lag_ms=500))
+
+    def test_clock_state_runs_only_the_side_to_move(self):
+        game = self._game(fen=self.AFTER_E4, last_move_at=self.now)
+        self.assertEqual(clock_state(game, self.now + timedelta(milliseconds=2500)), (60_000, 57_500))
+        self.assertEqual(clock_state(game, self.now + timedelta(seconds=90)), (60_000, 0))
+
+    def test_clock_state_is_frozen_once_the_game_ends(self):
+        game = self._game(status='completed', white_ms=1234)
+        self.assertEqual(clock_state(game, self.now + timedelta(hours=1)), (1234, 60_000))
+
+
+class GameRegistryTest(SimpleTestCase):
+    def _game(self, pk, moves_uci='', fen=STARTING_FEN):
+        game = ChessGame(pk=pk, fen=fen)
+        game.moves_uci = moves_uci
+        return game
+
+    def test_board_is_rebuilt_with_its_move_stack(self):
+        moves = 'g1f3 g8f6 f3g1 f6g8 g1f3 g8f6 f3g1 f6g8'
+        board = build_board(moves, 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 8 5')
+        self.assertEqual(len(board.move_stack), 8)
+        self.assertTrue(board.can_claim_threefold_repetition())
+
+    def test_stored_fen_wins_over_a_bad_move_list(self):
+        after_e4 = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+        self.assertEqual(build_board('d2d4', after_e4).fen(), after_e4)
+        self.assertEqual(build_board('e2e5', STARTING_FEN).fen(), STARTING_FEN)
+
+    def test_least_recently_used_game_is_evicted(self):
+        registry = GameRegistry(maxsize=2)
+        registry.load(self._game(1))
+        registry.load(self._game(2))
+        registry.get(1)
+        registry.load(self._game(3))
+        self.assertIsNotNone(registry.get(1))
+        self.assertIsNone(registry.get(2))
+        self.assertEqual(len(registry), 2)
+
+    def test_discard(self):
+        registry = GameRegistry()
+        registry.load(self._game(1, moves_uci='e2e4',
+                                 fen='rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'))
+        self.assertEqual(registry.get(1).board.peek().uci(), 'e2e4')
+        registry.discard(1)
+        self.assertIsNone(registry.get(1))
+
+
+class MoveEncodingTest(SimpleTestCase):
+    def test_round_trip(self):
+        for uci in ('e2e4', 'a1h8', 'h8a1', 'g1f3', 'e1g1', 'a7a8q', 'b2b1n', 'h7g8r', 'c2c1b'):
+            move = chess.Move.from_uci(uci)
+            code = encode_move(move)
+            self.assertLess(code, 1 << 16)
+            self.assertEqual(decode_move(code), move)
@@ -9,6 +9,9 @@ IMPORTANT: Never make synchronous ORM calls (refresh_from_db, queryset access)
 inside the async `run()` function. All DB assertions must happen *after*
 async_to_sync(run)() returns, from the regular test method body.
 """
+import asyncio
+from datetime import timedelta
+
 from asgiref.sync import async_to_sync
 from channels.layers import channel_layers
 from channels.routing import URLRouter
@@ -17,7 +20,9 @@ from django.contrib.auth.models import User
 from django.test import TransactionTestCase, override_settings
 from django.utils import timezone
 
-from apps.chess.models import ChessGame
+from apps.chess.boards import live_games
+from apps.chess.consumers import ChessConsumer
+from apps.chess.models import ChessGame, ChessMove
 from apps.chess.routing import websocket_urlpatterns
 
 TEST_CHANNEL_LAYERS = {
@@ -109,6 +114,10 @@ class ChessConsumerConnectionTest(TransactionTestCase):
 
         self.game.refresh_from_db()
         self.assertEqual(self.game.status, 'active')
+        self.assertEqual(
+            self.game.clock_expires_at,
+            self.game.started_at + timedelta(seconds=self.game.time_control),
+        )
 
     def test_non_participant_connection_closed(self):
         eve = User.objects.create_user('eve', 'eve@test.com', 'pass1234')
@@ -188,6 +197,31 @@ class ChessConsumerMoveTest(TransactionTestCase):
         self.assertEqual(move_msgs[1]['type'], 'chess_move')
         self.assertEqual(move_msgs[1]['move'], 'e2e4')
 
+    def test_move_is_charged_from_server_time(self):
+        """Client-supplied clock values are ignored."""
+        ChessGame.objects.filter(pk=self.game.pk).update(
+            started_at=timezone.now() - timedelta(seconds=5),
+        )
+        move_msgs = []
+
+        async def run():
+            white_comm = self._comm(self.alice)
+            await self._connect_active(white_comm)
+            await white_comm.send_json_to({
+                'action': 'move', 'move': 'e2e4', 'white_time': 600, 'black_time': 1,
+            })
+            move_msgs.append(await white_comm.receive_json_from())
+            await white_comm.disconnect()
+
+        async_to_sync(run)()
+
+        white_ms = move_msgs[0]['white_ms']
+        self.assertLessEqual(white_ms, 595_000)
+        self.assertGreater(white_ms, 590_000)
+        self.assertEqual(move_msgs[0]['black_ms'], 600_000)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.white_ms, white_ms)
+
     def test_illegal_move_produces_no_response(self):
         async def run():
             white_comm = self._comm(self.alice)
@@ -230,6 +264,68 @@ class ChessConsumerMoveTest(TransactionTestCase):
         self.assertIn('e2e4', self.game.moves_uci)
         self.assertNotEqual(self.game.fen, STARTING_FEN)
 
+    def test_move_appends_a_move_row(self):
+        async def run():
+            white_comm = self._comm(self.alice)
+            black_comm = self._comm(self.bob)
+            await self._connect_active(white_comm)
+            await self._connect_active(black_comm)
+            await white_comm.receive_json_from()  # player_connected(bob)
+
+            await white_comm.send_json_to({'action': 'move', 'move': 'g1f3'})
+            await white_comm.receive_json_from()  # chess_move
+            await black_comm.receive_json_from()  # chess_move
+            await black_comm.send_json_to({'action': 'move', 'move': 'd7d5'})
+            await white_comm.receive_json_from()  # chess_move
+            await black_comm.receive_json_from()  # chess_move
+
+            await white_comm.disconnect()
+            await black_comm.disconnect()
+
+        async_to_sync(run)()
+
+        moves = list(ChessMove.objects.filter(game=self.game))
+        self.assertEqual([(m.ply, m.uci, m.san) for m in moves], [(1, 'g1f3', 'Nf3'), (2, 'd7d5', 'd5')])
+        game = ChessGame.objects.get(pk=self.game.pk)
+        self.assertEqual((moves[0].clock_ms, moves[1].clock_ms), (game.white_ms, game.black_ms))
+        self.assertEqual(moves[1].played_at, game.last_move_at)
+        self.assertEqual(game.moves_uci, 'g1f3 d7d5')
+
+    def test_threefold_repetition_ends_game(self):
+        """Repetition needs the move stack, which survives a cache miss."""
+        knight_dance = ['g1f3', 'g8f6', 'f3g1', 'f6g8'] * 2
+        captured = []
+
+        async def run():
+            white_comm = self._comm(self.alice)
+            black_comm = self._comm(self.bob)
+            await self._connect_active(white_comm)
+            await self._connect_active(black_comm)
+            await white_comm.receive_json_from()  # player_connected(bob)
+
+            for ply, uci in enumerate(knight_dance):
+                if ply == 4:
+                    # Evict the game: the board is rebuilt from the move rows
+                    live_games.discard(self.game.pk)
+                comm = white_comm if ply % 2 == 0 else black_comm
+                await asyncio.sleep(ChessConsumer.MESSAGE_COOLDOWN)
+                await comm.send_json_to({'action': 'move', 'move': uci})
+                await white_comm.receive_json_from()  # chess_move
+                await black_comm.receive_json_from()  # chess_move
+
+            captured.append(await white_comm.receive_json_from())
+            await white_comm.disconnect()
+            await black_comm.disconnect()
+
+        async_to_sync(run)()
+
+        self.assertEqual(captured[0]['type'], 'chess_game_over')
+        self.assertEqual(captured[0]['reason'], 'threefold')
+        self.assertIsNone(captured[0]['winner'])
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.end_reason, 'threefold')
+        self.assertIsNone(live_games.get(self.game.pk))
+
 
 @override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
 class ChessConsumerResignTest(TransactionTestCase):
@@ -401,6 +497,64 @@ class ChessConsumerTimeoutTest(TransactionTestCase):
         self.game.refresh_from_db()
         self.assertEqual(self.game.winner_id, self.alice.pk)
 
+    def test_server_flags_expired_clock(self):
+        """The timeout worker ends the game without any client report."""
+        ChessGame.objects.filter(pk=self.game.pk).update(
+            clock_expires_at=timezone.now() + timedelta(seconds=0.3),
+        )
+        captured = []
+
+        async def run():
+            white_comm = self._comm(self.alice)
+            await self._connect_active(white_comm)
+            captured.append(await white_comm.receive_json_from(timeout=3))
+            await white_comm.disconnect()
+
+        async_to_sync(run)()
+
+        self.assertEqual(captured[0]['type'], 'chess_game_over')
+        self.assertEqual(captured[0]['reason'], 'timeout')
+        self.assertEqual(captured[0]['winner'], 'bob')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.status, 'completed')
+        self.assertEqual(self.game.winner_id, self.bob.pk)
+
+    def test_move_restarts_opponent_clock(self):
+        async def run():
+            white_comm = self._comm(self.alice)
+            await self._connect_active(white_comm)
+            await white_comm.send_json_to({'action': 'move', 'move': 'e2e4'})
+            await white_comm.receive_json_from()  # chess_move
+            await white_comm.disconnect()
+
+        async_to_sync(run)()
+
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.black_ms, 600_000)
+        self.assertEqual(self.game.clock_expires_at, self.game.last_move_at + timedelta(seconds=600))
+
+    def test_move_after_flag_ends_game(self):
+        """A move that arrives after the mover's time ran out loses on time."""
+        ChessGame.objects.filter(pk=self.game.pk).update(
+            started_at=timezone.now() - timedelta(seconds=601),
+        )
+        captured = []
+
+        async def run():
+            white_comm = self._comm(self.alice)
+            await self._connect_active(white_comm)
+            await white_comm.send_json_to({'action': 'move', 'move': 'e2e4'})
+            captured.append(await white_comm.receive_json_from())
+            await white_comm.disconnect()
+
+        async_to_sync(run)()
+
+        self.assertEqual(captured[0]['type'], 'chess_game_over')
+        self.assertEqual(captured[0]['reason'], 'timeout')
+        self.assertEqual(captured[0]['winner'], 'bob')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.moves_uci, '')
+
 
 @override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
 class ChessConsumerGameOverTest(TransactionTestCase):
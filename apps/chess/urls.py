@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.lobby_view, name='chess_lobby'),
     path('archive/', views.archive_view, name='chess_archive'),
+    path('archive/pgn/', views.export_archive_pgn, name='chess_archive_pgn'),
     path('live/', views.live_games, name='chess_live'),
     path('challenge/', views.create_game, name='chess_create'),
     path('play/<int:game_id>/', views.play_view, name='chess_play'),
@@ -1,18 +1,20 @@
-import chess
-
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
 from apps.accounts.decorators import rate_limit
+from apps.notifications.activity import invalidate_activity
 from apps.notifications.services import send_notification
 
-from .models import ChessGame, TIME_CONTROL, TIME_CONTROL_CHOICES, TIME_CONTROL_VALUES
+from .models import (
+    INCREMENT_CHOICES, INCREMENT_VALUES, TIME_CONTROL, TIME_CONTROL_CHOICES, TIME_CONTROL_VALUES, ChessGame,
+)
+from .pgn import game_pgn, stream_pgn
 
 
 @login_required
@@ -36,6 +38,7 @@ def lobby_view(request):
         'recent_games': recent_games,
         'max_stake': max_stake,
         'time_controls': TIME_CONTROL_CHOICES,
+        'increments': INCREMENT_CHOICES,
     })
 
 
@@ -49,6 +52,7 @@ def create_game(request):
     stake_raw = request.POST.get('stake', 0)
     creator_side = request.POST.get('side', 'random')
     time_control_raw = request.POST.get('time_control', TIME_CONTROL)
+    increment_raw = request.POST.get('increment', 0)
 
     try:
         stake = int(stake_raw)
@@ -75,6 +79,13 @@ def create_game(request):
     if time_control not in TIME_CONTROL_VALUES:
         time_control = TIME_CONTROL
 
+    try:
+        increment = int(increment_raw)
+    except (ValueError, TypeError):
+        increment = 0
+    if increment not in INCREMENT_VALUES:
+        increment = 0
+
     try:
         opponent = User.objects.get(username=opponent_username)
     except User.DoesNotExist:
@@ -106,9 +117,13 @@ def create_game(request):
         stake=stake,
         creator_side=creator_side,
         time_control=time_control,
+        increment=increment,
     )
+    invalidate_activity(request.user.pk, opponent.pk)
 
     tc_label = dict(TIME_CONTROL_CHOICES).get(time_control, f'{time_control}s')
+    if increment:
+        tc_label += f' +{increment}s'
     send_notification(
         opponent,
         'game_invite',
@@ -163,6 +178,7 @@ def decline_game(request, game_id):
     game.status = 'cancelled'
     game.end_reason = 'cancelled'
     game.save(update_fields=['status', 'end_reason'])
+    invalidate_activity(game.creator_id, game.opponent_id)
     messages.info(request, 'Chess challenge declined.')
     return redirect('chess_lobby')
 
@@ -177,18 +193,19 @@ def cancel_game(request, game_id):
     game.status = 'cancelled'
     game.end_reason = 'cancelled'
     game.save(update_fields=['status', 'end_reason'])
+    invalidate_activity(game.creator_id, game.opponent_id)
     messages.info(request, 'Chess challenge cancelled.')
     return redirect('chess_lobby')
 
 
-@login_required
-def archive_view(request):
+def _archive_games(request):
+    """Return the user's completed games filtered by the archive's query string.
+
+    Also returns the applied ``result`` and ``opponent`` filters.
+    """
     games = ChessGame.objects.filter(
         Q(creator=request.user) | Q(opponent=request.user),
         status='completed',
-    ).select_related(
-        'creator', 'opponent', 'winner',
-        'creator__profile', 'opponent__profile',
     )
 
     result_filter = request.GET.get('result', 'all')
@@ -205,6 +222,16 @@ def archive_view(request):
             Q(creator=request.user, opponent__username__icontains=opponent_query) |
             Q(opponent=request.user, creator__username__icontains=opponent_query)
         )
+    return games, result_filter, opponent_query
+
+
+@login_required
+def archive_view(request):
+    games, result_filter, opponent_query = _archive_games(request)
+    games = games.select_related(
+        'creator', 'opponent', 'winner',
+        'creator__profile', 'opponent__profile',
+    )
 
     paginator = Paginator(games, 20)
     page = paginator.get_page(request.GET.get('page'))
@@ -253,10 +280,14 @@ def rematch(request, game_id):
         opponent=opponent,
         stake=game.stake,
         time_control=game.time_control,
+        increment=game.increment,
         creator_side='random',
     )
+    invalidate_activity(request.user.pk, opponent.pk)
 
     tc_label = dict(TIME_CONTROL_CHOICES).get(game.time_control, f'{game.time_control}s')
+    if game.increment:
+        tc_label += f' +{game.increment}s'
     send_notification(
         opponent,
         'game_invite',
@@ -270,67 +301,25 @@ def rematch(request, game_id):
 
 @login_required
 def export_pgn(request, game_id):
-    game = get_object_or_404(ChessGame, pk=game_id, status='completed')
-
-    # Build PGN headers
+    game = get_object_or_404(
+        ChessGame.objects.select_related('white_player', 'black_player'),
+        pk=game_id, status='completed',
+    )
     white_name = game.white_player.username if game.white_player else '?'
     black_name = game.black_player.username if game.black_player else '?'
 
-    if game.winner_id == game.white_player_id:
-        result = '1-0'
-    elif game.winner_id == game.black_player_id:
-        result = '0-1'
-    elif game.winner_id is None:
-        result = '1/2-1/2'
-    else:
-        result = '*'
-
-    tc_label = dict(TIME_CONTROL_CHOICES).get(game.time_control, str(game.time_control))
-
-    headers = [
-        f'[Event "LoungeTrade Chess"]',
-        f'[Site "loungecoin.trade"]',
-        f'[Date "{game.created_at.strftime("%Y.%m.%d")}"]',
-        f'[White "{white_name}"]',
-        f'[Black "{black_name}"]',
-        f'[Result "{result}"]',
-        f'[TimeControl "{game.time_control}"]',
-        f'[Termination "{game.get_end_reason_display()}"]',
-    ]
-
-    # Replay UCI moves to get SAN notation
-    board = chess.Board()
-    san_moves = []
-    if game.moves_uci:
-        for uci_str in game.moves_uci.split():
-            move = chess.Move.from_uci(uci_str)
-            if move in board.legal_moves:
-                san_moves.append(board.san(move))
-                board.push(move)
-
-    # Format move text (80 char line wrap)
-    move_parts = []
-    for i, san in enumerate(san_moves):
-        if i % 2 == 0:
-            move_parts.append(f'{i // 2 + 1}. {san}')
-        else:
-            move_parts.append(san)
-    move_parts.append(result)
-
-    lines = []
-    current_line = ''
-    for part in move_parts:
-        if current_line and len(current_line) + 1 + len(part) > 80:
-            lines.append(current_line)
-            current_line = part
-        else:
-            current_line = (current_line + ' ' + part).strip()
-    if current_line:
-        lines.append(current_line)
-
-    pgn = '\n'.join(headers) + '\n\n' + '\n'.join(lines) + '\n'
-
     filename = f'chess_{game.pk}_{white_name}_vs_{black_name}.pgn'
-    response = HttpResponse(pgn, content_type='application/x-chess-pgn')
+    response = HttpResponse(game_pgn(game), content_type='application/x-chess-pgn')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@rate_limit('chess_pgn_archive', max_requests=5, window=60)
+def export_archive_pgn(request):
+    """Stream every game matching the archive filters as one PGN file."""
+    games, _, _ = _archive_games(request)
+    filename = f'chess_archive_{request.user.username}.pgn'
+    response = StreamingHttpResponse(stream_pgn(games), content_type='application/x-chess-pgn')
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
@@ -6,7 +6,8 @@ from django.utils import timezone
 
 from apps.economy.services import InsufficientFunds
 from apps.games.mixins import BaseGameConsumer
-from apps.notifications.services import send_notification
+from apps.notifications.activity import invalidate_activity
+from apps.notifications.services import send_notifications_bulk
 
 from .models import CoinFlipChallenge
 
@@ -216,6 +217,8 @@ class CoinFlipConsumer(BaseGameConsumer):
             winner_id=winner_id,
             resolved_at=timezone.now(),
         )
+        if updated:
+            self._invalidate_activity(challenge_id)
         return updated > 0
 
     @BaseGameConsumer.db_async
@@ -224,6 +227,7 @@ class CoinFlipConsumer(BaseGameConsumer):
         CoinFlipChallenge.objects.filter(
             pk=challenge_id, status='pending',
         ).update(status='declined')
+        self._invalidate_activity(challenge_id)
 
     @BaseGameConsumer.db_async
     def cancel_game(self, challenge_id):
@@ -231,23 +235,21 @@ class CoinFlipConsumer(BaseGameConsumer):
             status='cancelled',
             resolved_at=timezone.now(),
         )
+        self._invalidate_activity(challenge_id)
+
+    def _invalidate_activity(self, challenge_id):
+        invalidate_activity(*CoinFlipChallenge.objects.filter(pk=challenge_id).values_list(
+            'challenger_id', 'opponent_id',
+        ).first() or ())
 
     @BaseGameConsumer.db_async
     def create_game_notifications(self, challenge, winner_id, loser_id, flip_result):
         from django.contrib.auth.models import User
-        winner = User.objects.select_related('profile').get(pk=winner_id)
-        loser = User.objects.select_related('profile').get(pk=loser_id)
-        send_notification(
-            winner,
-            'game_result',
-            'You Won!',
-            f'You won {challenge.stake} coins against {loser.profile.get_display_name()}! The coin landed on {flip_result}.',
-            link='/coinflip/',
-        )
-        send_notification(
-            loser,
-            'game_result',
-            'You Lost',
-            f'You lost {challenge.stake} coins to {winner.profile.get_display_name()}. The coin landed on {flip_result}.',
-            link='/coinflip/',
-        )
+        users = User.objects.select_related('profile').in_bulk([winner_id, loser_id])
+        winner, loser = users[winner_id], users[loser_id]
+        send_notifications_bulk([
+            (winner, 'You Won!',
+             f'You won {challenge.stake} coins against {loser.profile.get_display_name()}! The coin landed on {flip_result}.'),
+            (loser, 'You Lost',
+             f'You lost {challenge.stake} coins to {winner.profile.get_display_name()}. The coin landed on {flip_result}.'),
+        ], 'game_result', link='/coinflip/')
@@ -4,6 +4,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from apps.coinflip.models import CoinFlipChallenge
+from apps.notifications.activity import invalidate_activity
 
 
 class Command(BaseCommand):
@@ -17,8 +18,13 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         cutoff = timezone.now() - timedelta(hours=options['hours'])
-        expired = CoinFlipChallenge.objects.filter(
+        stale = CoinFlipChallenge.objects.filter(
             status='pending',
             created_at__lt=cutoff,
-        ).update(status='expired')
+        )
+        players = set()
+        for challenger_id, opponent_id in stale.values_list('challenger_id', 'opponent_id'):
+            players.update((challenger_id, opponent_id))
+        expired = stale.update(status='expired')
+        invalidate_activity(*players)
         self.stdout.write(self.style.SUCCESS(f'Expired {expired} challenges.'))
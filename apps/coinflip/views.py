@@ -6,6 +6,7 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 
 from apps.accounts.decorators import rate_limit
+from apps.notifications.activity import invalidate_activity
 from apps.notifications.services import send_notification
 
 from .models import CoinFlipChallenge
@@ -99,6 +100,7 @@ def create_challenge(request):
         stake=stake,
         challenger_choice=choice,
     )
+    invalidate_activity(request.user.pk, opponent.pk)
 
     send_notification(
         opponent,
@@ -133,13 +135,14 @@ def decline_challenge(request, challenge_id):
     if request.method != 'POST':
         return redirect('coinflip_lobby')
     # Verify the challenge exists and belongs to this user (returns 404 otherwise).
-    get_object_or_404(
+    challenge = get_object_or_404(
         CoinFlipChallenge, pk=challenge_id, opponent=request.user, status='pending',
     )
     # Atomic conditional update to prevent overwriting a concurrent resolution.
     updated = CoinFlipChallenge.objects.filter(
         pk=challenge_id, status='pending',
     ).update(status='declined')
+    invalidate_activity(challenge.challenger_id, challenge.opponent_id)
     if not updated:
         messages.error(request, 'Challenge was already resolved.')
     else:
@@ -152,13 +155,14 @@ def cancel_challenge(request, challenge_id):
     if request.method != 'POST':
         return redirect('coinflip_lobby')
     # Verify the challenge exists and belongs to this user (returns 404 otherwise).
-    get_object_or_404(
+    challenge = get_object_or_404(
         CoinFlipChallenge, pk=challenge_id, challenger=request.user, status='pending',
     )
     # Atomic conditional update to prevent overwriting a concurrent resolution.
     updated = CoinFlipChallenge.objects.filter(
         pk=challenge_id, status='pending',
     ).update(status='cancelled')
+    invalidate_activity(challenge.challenger_id, challenge.opponent_id)
     if not updated:
         messages.error(request, 'Challenge was already resolved.')
     else:
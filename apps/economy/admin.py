@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Transaction
+from .models import LedgerEntry, Transaction
 
 
 @admin.register(Transaction)
@@ -11,3 +11,17 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ('sender__username', 'receiver__username', 'note')
     raw_id_fields = ('sender', 'receiver')
     readonly_fields = ('created_at',)
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('transaction', 'user', 'delta', 'balance_after', 'created_at')
+    list_select_related = ('transaction', 'user')
+    search_fields = ('user__username',)
+    raw_id_fields = ('transaction', 'user')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
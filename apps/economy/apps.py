@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EconomyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.economy'
+
+    def ready(self):
+        import apps.economy.signals  # noqa: F401
@@ -0,0 +1,53 @@
+"""Cached balance reads for polling endpoints and the navbar.
+
+Balances are cached per user and written through by the economy services
+once their transaction commits, so the navbar poll is a cache hit in the
+steady state. A miss falls back to ``UserProfile`` and refills the cache
+with ``add``, so a fill that read the old balance can never overwrite a
+value published after it.
+The timeout only bounds how long an out-of-order write could go unnoticed;
+normal updates replace the value immediately.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.accounts.models import UserProfile
+
+
+def _cache_key(user_id):
+    return f'balance:{user_id}'
+
+
+def _timeout():
+    return getattr(settings, 'BALANCE_CACHE_TIMEOUT', 600)
+
+
+def get_balance(user) -> int:
+    """Return ``user``'s balance, reading the database only on a cache miss."""
+    key = _cache_key(user.pk)
+    balance = cache.get(key)
+    if balance is None:
+        balance = (
+            UserProfile.objects.filter(user_id=user.pk)
+            .values_list('balance', flat=True)
+            .first()
+        ) or 0
+        cache.add(key, balance, _timeout())
+    return balance
+
+
+def publish_balances(profiles):
+    """Write the balances of ``profiles`` to the cache after the transaction commits.
+
+    The old values are dropped immediately, so readers fall back to the last
+    committed balance until the new one is published. Values are captured
+    now, while the caller still holds the row locks, and a rolled-back
+    transaction never publishes anything.
+    """
+    values = {_cache_key(p.user_id): p.balance for p in profiles}
+    if not values:
+        return
+    cache.delete_many(list(values))
+    transaction.on_commit(lambda: cache.set_many(values, _timeout()))
@@ -0,0 +1,7 @@
+from .balances import get_balance
+
+
+def nav_balance(request):
+    if request.user.is_authenticated:
+        return {'nav_balance': get_balance(request.user)}
+    return {'nav_balance': 0}
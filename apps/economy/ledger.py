@@ -0,0 +1,77 @@
+"""Double-entry ledger written alongside every Transaction.
+
+The economy services call ``record_ledger`` inside the same atomic block
+that changes balances, while they still hold the profile row locks, so each
+user's ``balance_after`` sequence is exact. Reads go through ``balance_at``
+and ``statement``, which are indexed range queries on ``(user, created_at)``.
+"""
+
+from .models import LedgerEntry
+
+
+def _legs(tx):
+    """Yield ``(user_id, delta)`` for both sides of ``tx``; None is the system side."""
+    yield tx.sender_id, -tx.amount
+    yield tx.receiver_id, tx.amount
+
+
+def record_ledger(transactions, balances):
+    """Write the ledger entries for ``transactions``.
+
+    ``balances`` maps each affected user id to its balance after *all* of
+    ``transactions`` have been applied; per-entry balances are derived by
+    walking the transactions backwards, so one user may appear several times.
+    """
+    running = dict(balances)
+    legs_by_tx = []
+    for tx in reversed(transactions):
+        legs = []
+        for user_id, delta in _legs(tx):
+            balance_after = None
+            if user_id is not None:
+                balance_after = running[user_id]
+                running[user_id] -= delta
+            legs.append(LedgerEntry(
+                transaction=tx,
+                user_id=user_id,
+                delta=delta,
+                balance_after=balance_after,
+                created_at=tx.created_at,
+            ))
+        legs_by_tx.append(legs)
+    entries = [entry for legs in reversed(legs_by_tx) for entry in legs]
+    return LedgerEntry.objects.bulk_create(entries)
+
+
+def balance_at(user, when):
+    """Return ``user``'s balance at ``when`` (0 before their first entry)."""
+    balance = (
+        LedgerEntry.objects
+        .filter(user=user, created_at__lte=when)
+        .order_by('-created_at', '-id')
+        .values_list('balance_after', flat=True)
+        .first()
+    )
+    return balance or 0
+
+
+def statement(user, start, end):
+    """Return ``(opening_balance, entries)`` for ``start <= created_at < end``.
+
+    ``entries`` is a lazy queryset in chronological order with the
+    transaction and its counterparties selected.
+    """
+    opening = (
+        LedgerEntry.objects
+        .filter(user=user, created_at__lt=start)
+        .order_by('-created_at', '-id')
+        .values_list('balance_after', flat=True)
+        .first()
+    ) or 0
+    entries = (
+        LedgerEntry.objects
+        .filter(user=user, created_at__gte=start, created_at__lt=end)
+        .select_related('transaction__sender', 'transaction__receiver')
+        .order_by('created_at', 'id')
+    )
+    return opening, entries
@@ -0,0 +1,89 @@
+"""Write ledger entries for transactions recorded before the ledger existed.
+
+History is streamed newest-first in keyset-paginated chunks. Each user's
+running balance is anchored to the balance just before their first live
+ledger entry (or their current balance if they have none) and walked
+backwards, so the backfilled ``balance_after`` values line up exactly with
+the entries written by the economy services. Safe to re-run: transactions
+that already have entries are skipped.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from apps.accounts.models import UserProfile
+from apps.economy.models import LedgerEntry, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Backfill ledger entries and running balances for existing transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Transactions processed per batch (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        pending = Transaction.objects.filter(
+            ~Exists(LedgerEntry.objects.filter(transaction=OuterRef('pk'))),
+        ).only('id', 'sender_id', 'receiver_id', 'amount', 'created_at')
+
+        running = {}
+        cursor = None
+        total = 0
+        while True:
+            chunk = pending.order_by('-created_at', '-id')
+            if cursor is not None:
+                created_at, pk = cursor
+                chunk = chunk.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+                )
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+
+            self._anchor(running, chunk)
+            entries = []
+            for tx in chunk:
+                for user_id, delta in ((tx.sender_id, -tx.amount), (tx.receiver_id, tx.amount)):
+                    balance_after = None
+                    if user_id is not None:
+                        balance_after = running[user_id]
+                        running[user_id] -= delta
+                    entries.append(LedgerEntry(
+                        transaction_id=tx.pk,
+                        user_id=user_id,
+                        delta=delta,
+                        balance_after=balance_after,
+                        created_at=tx.created_at,
+                    ))
+            with transaction.atomic():
+                LedgerEntry.objects.bulk_create(entries)
+
+            total += len(chunk)
+            cursor = (chunk[-1].created_at, chunk[-1].pk)
+            self.stdout.write(f'Backfilled {total} transaction(s)...')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled ledger for {total} transaction(s).'))
+
+    @staticmethod
+    def _anchor(running, chunk):
+        """Seed the running balance for users seen for the first time."""
+        new_ids = {
+            user_id
+            for tx in chunk
+            for user_id in (tx.sender_id, tx.receiver_id)
+            if user_id is not None and user_id not in running
+        }
+        if not new_ids:
+            return
+        first_live = LedgerEntry.objects.filter(user=OuterRef('user_id')).order_by('created_at', 'id')
+        rows = UserProfile.objects.filter(user_id__in=new_ids).annotate(
+            first_after=Subquery(first_live.values('balance_after')[:1]),
+            first_delta=Subquery(first_live.values('delta')[:1]),
+        ).values_list('user_id', 'balance', 'first_after', 'first_delta')
+        for user_id, balance, first_after, first_delta in rows:
+            running[user_id] = balance if first_after is None else first_after - first_delta
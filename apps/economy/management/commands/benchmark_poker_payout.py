@@ -0,0 +1,91 @@
+"""Compare lock-hold time of the bulk poker payout against the per-seat loop.
+
+Everything runs inside one transaction that is rolled back at the end, so
+no rows are left behind. That transaction stays open for all 2 x
+``--rounds`` settlements and holds its locks until the rollback. Other
+writers that touch the same rows wait for the whole run. The command
+therefore refuses to run unless ``DEBUG`` is on.
+
+Each timing covers the span from the first profile lock until the settlement
+is complete, which is how long other writers touching the same profiles
+would be blocked.
+"""
+
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.accounts.models import UserProfile
+from apps.economy.models import Transaction
+from apps.economy.services import poker_payout
+from apps.leaderboard.services import record_transactions
+
+
+def _loop_payout(payouts, note=''):
+    """The previous implementation: one lock, save and insert per seat."""
+    results = []
+    with transaction.atomic():
+        for user, amount in payouts:
+            if amount <= 0:
+                continue
+            profile = UserProfile.objects.select_for_update().get(user=user)
+            profile.balance += amount
+            profile.save(update_fields=['balance'])
+            results.append(Transaction.objects.create(
+                sender=None,
+                receiver=user,
+                amount=amount,
+                tx_type='game',
+                note=note or 'Poker payout',
+            ))
+        record_transactions(results)
+    return results
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark lock-hold time of poker_payout against the per-seat loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=8, help='Players paid per settlement (default: 8)')
+        parser.add_argument('--rounds', type=int, default=50, help='Settlements per variant (default: 50)')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError('Refusing to benchmark with DEBUG off; run it against a development database.')
+        seats = options['seats']
+        rounds = options['rounds']
+        try:
+            with transaction.atomic():
+                users = [
+                    User.objects.create_user(f'__payout_bench_{i}', password=None)
+                    for i in range(seats)
+                ]
+                payouts = [(user, 10 + i) for i, user in enumerate(users)]
+
+                timings = {}
+                for label, func in (('loop', _loop_payout), ('bulk', poker_payout)):
+                    samples = []
+                    for _ in range(rounds):
+                        start = time.perf_counter()
+                        func(payouts, note='Benchmark')
+                        samples.append((time.perf_counter() - start) * 1000)
+                    timings[label] = samples
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for label, samples in timings.items():
+            self.stdout.write(
+                f'{label:>4}: median {statistics.median(samples):.2f} ms, '
+                f'max {max(samples):.2f} ms over {rounds} settlements of {seats} seats'
+            )
+        speedup = statistics.median(timings['loop']) / statistics.median(timings['bulk'])
+        self.stdout.write(self.style.SUCCESS(f'Bulk payout holds locks {speedup:.1f}x shorter.'))
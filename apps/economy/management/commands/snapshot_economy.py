@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.economy.models import EconomySnapshot
+from apps.economy.snapshots import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Roll up closed hours and days into economy snapshots for the admin dashboards'
+
+    def handle(self, *args, **options):
+        created = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created[EconomySnapshot.HOUR]} hourly and '
+            f'{created[EconomySnapshot.DAY]} daily snapshot(s).'
+        ))
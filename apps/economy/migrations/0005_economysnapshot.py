@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('economy', '0004_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EconomySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('circulation', models.BigIntegerField()),
+                ('minted', models.BigIntegerField(default=0)),
+                ('deducted', models.BigIntegerField(default=0)),
+                ('traded', models.BigIntegerField(default=0)),
+                ('game_volume', models.BigIntegerField(default=0)),
+                ('mint_count', models.PositiveIntegerField(default=0)),
+                ('deduct_count', models.PositiveIntegerField(default=0)),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+                ('game_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start'), name='economy_snapshot_period')],
+            },
+        ),
+    ]
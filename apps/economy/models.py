@@ -36,9 +36,96 @@ class Transaction(models.Model):
         indexes = [
             models.Index(fields=['sender', 'tx_type', '-created_at']),
             models.Index(fields=['receiver', 'tx_type', '-created_at']),
+            # Keyset pagination over the whole ledger.
+            models.Index(fields=['-created_at', '-id'], name='transaction_time_id'),
         ]
 
     def __str__(self):
         sender_name = self.sender.username if self.sender else 'System'
         receiver_name = self.receiver.username if self.receiver else 'Deleted User'
         return f'{sender_name} → {receiver_name}: {self.amount} coins'
+
+
+class LedgerEntry(models.Model):
+    """One leg of a Transaction: the signed change to a single account.
+
+    Every Transaction writes one entry per side, so the deltas of a
+    transaction always sum to zero. User legs record ``balance_after``,
+    which makes "balance at time X" a single indexed lookup. The system
+    side (minting, deductions, poker escrow) has no user and no balance.
+    Rows are append-only.
+    """
+
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='ledger_entries',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ledger_entries',
+    )
+    delta = models.BigIntegerField()
+    balance_after = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = 'ledger entries'
+        indexes = [
+            # Point-in-time balance and statement range queries per user.
+            models.Index(fields=['user', '-created_at', '-id'], name='ledger_user_time'),
+        ]
+
+    def __str__(self):
+        account = self.user.username if self.user else 'System'
+        return f'{account} {self.delta:+d} -> {self.balance_after}'
+
+
+class EconomySnapshot(models.Model):
+    """Rolled-up economy figures for one closed hour or day.
+
+    Volumes cover transactions created in ``[period_start, period_end)``.
+    ``circulation`` is the sum of all balances at ``period_end``. Dashboards
+    add up these rows and only aggregate the transactions after the latest
+    one. Rows are written by the ``snapshot_economy`` command.
+    """
+
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIODS = [
+        (HOUR, 'Hourly'),
+        (DAY, 'Daily'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    circulation = models.BigIntegerField()
+    minted = models.BigIntegerField(default=0)
+    deducted = models.BigIntegerField(default=0)
+    traded = models.BigIntegerField(default=0)
+    game_volume = models.BigIntegerField(default=0)
+    mint_count = models.PositiveIntegerField(default=0)
+    deduct_count = models.PositiveIntegerField(default=0)
+    trade_count = models.PositiveIntegerField(default=0)
+    game_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-period_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'period_start'], name='economy_snapshot_period',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_period_display()} snapshot {self.period_start:%Y-%m-%d %H:%M}'
+
+    @property
+    def tx_count(self):
+        return self.mint_count + self.deduct_count + self.trade_count + self.game_count
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import logging
+from collections import defaultdict
 from typing import TYPE_CHECKING
 
 from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
 
 from apps.accounts.models import UserProfile
+from apps.leaderboard.services import record_transactions
 from apps.notifications.services import send_notification
 
+from .balances import publish_balances
+from .ledger import record_ledger
 from .models import Transaction
 
 if TYPE_CHECKING:
@@ -24,6 +29,28 @@ class InvalidTrade(Exception):
     pass
 
 
+def lock_profiles(*users: User) -> dict[int, UserProfile]:
+    """Lock the profiles of ``users`` with one query, in primary-key order.
+
+    Every service that changes balances takes its row locks through here,
+    so two transactions touching the same profiles (e.g. opposing trades
+    between the same pair) always lock them in the same order and cannot
+    deadlock. Must be called inside ``transaction.atomic()``.
+
+    Returns ``{user_id: profile}``.
+    """
+    user_ids = {user.pk for user in users}
+    profiles = {
+        profile.user_id: profile
+        for profile in UserProfile.objects.select_for_update()
+        .filter(user_id__in=user_ids)
+        .order_by('pk')
+    }
+    if len(profiles) != len(user_ids):
+        raise UserProfile.DoesNotExist('UserProfile matching query does not exist.')
+    return profiles
+
+
 def transfer_coins(
     sender: User,
     receiver: User,
@@ -38,8 +65,9 @@ def transfer_coins(
         raise InvalidTrade('Amount must be positive.')
 
     with transaction.atomic():
-        sender_profile = UserProfile.objects.select_for_update().get(user=sender)
-        receiver_profile = UserProfile.objects.select_for_update().get(user=receiver)
+        profiles = lock_profiles(sender, receiver)
+        sender_profile = profiles[sender.pk]
+        receiver_profile = profiles[receiver.pk]
 
         if sender_profile.balance < amount:
             raise InsufficientFunds(
@@ -50,6 +78,7 @@ def transfer_coins(
         receiver_profile.balance += amount
         sender_profile.save(update_fields=['balance'])
         receiver_profile.save(update_fields=['balance'])
+        publish_balances([sender_profile, receiver_profile])
 
         tx = Transaction.objects.create(
             sender=sender,
@@ -58,6 +87,11 @@ def transfer_coins(
             tx_type=tx_type,
             note=note,
         )
+        record_ledger([tx], {
+            sender.pk: sender_profile.balance,
+            receiver.pk: receiver_profile.balance,
+        })
+        record_transactions([tx])
 
         send_notification(
             receiver,
@@ -93,9 +127,10 @@ def mint_coins(
         raise InvalidTrade('Only admin users can mint coins.')
 
     with transaction.atomic():
-        target_profile = UserProfile.objects.select_for_update().get(user=target_user)
+        target_profile = lock_profiles(target_user)[target_user.pk]
         target_profile.balance += amount
         target_profile.save(update_fields=['balance'])
+        publish_balances([target_profile])
 
         tx = Transaction.objects.create(
             sender=None,
@@ -104,6 +139,8 @@ def mint_coins(
             tx_type='mint',
             note=note or f'Minted by {admin_user.username}',
         )
+        record_ledger([tx], {target_user.pk: target_profile.balance})
+        record_transactions([tx])
 
         send_notification(
             target_user,
@@ -134,8 +171,9 @@ def game_transfer(
     (e.g. 'Coin flip', 'Chess - checkmate').
     """
     with transaction.atomic():
-        loser_profile = UserProfile.objects.select_for_update().get(user=loser)
-        winner_profile = UserProfile.objects.select_for_update().get(user=winner)
+        profiles = lock_profiles(loser, winner)
+        loser_profile = profiles[loser.pk]
+        winner_profile = profiles[winner.pk]
 
         if loser_profile.balance < stake:
             raise InsufficientFunds(
@@ -146,6 +184,7 @@ def game_transfer(
         winner_profile.balance += stake
         loser_profile.save(update_fields=['balance'])
         winner_profile.save(update_fields=['balance'])
+        publish_balances([loser_profile, winner_profile])
 
         tx = Transaction.objects.create(
             sender=loser,
@@ -154,6 +193,11 @@ def game_transfer(
             tx_type='game',
             note=note,
         )
+        record_ledger([tx], {
+            loser.pk: loser_profile.balance,
+            winner.pk: winner_profile.balance,
+        })
+        record_transactions([tx])
 
         logger.info(
             'Game transfer: winner=%s loser=%s stake=%d',
@@ -173,7 +217,7 @@ def poker_buy_in(
         raise InvalidTrade('Amount must be positive.')
 
     with transaction.atomic():
-        profile = UserProfile.objects.select_for_update().get(user=user)
+        profile = lock_profiles(user)[user.pk]
 
         if profile.balance < amount:
             raise InsufficientFunds(
@@ -182,6 +226,7 @@ def poker_buy_in(
 
         profile.balance -= amount
         profile.save(update_fields=['balance'])
+        publish_balances([profile])
 
         tx = Transaction.objects.create(
             sender=user,
@@ -190,6 +235,8 @@ def poker_buy_in(
             tx_type='game',
             note=note or 'Poker buy-in',
         )
+        record_ledger([tx], {user.pk: profile.balance})
+        record_transactions([tx])
 
         logger.info('Poker buy-in: user=%s amount=%d', user.username, amount)
         return tx
@@ -202,26 +249,48 @@ def poker_payout(
     """Credit multiple users atomically after a poker game.
 
     payouts: list of (user, amount) tuples.
+
+    Every affected profile is locked by one ``lock_profiles`` query,
+    credited by a single UPDATE and the ledger rows are written with one
+    bulk insert, so the locks are held for a fixed number of round trips
+    however many seats are being settled. Returns one Transaction per
+    positive payout, in input order.
     """
-    results = []
-    with transaction.atomic():
-        for user, amount in payouts:
-            if amount <= 0:
-                continue
+    payouts = [(user, amount) for user, amount in payouts if amount > 0]
+    if not payouts:
+        return []
+
+    credits = defaultdict(int)
+    for user, amount in payouts:
+        credits[user.pk] += amount
 
-            profile = UserProfile.objects.select_for_update().get(user=user)
-            profile.balance += amount
-            profile.save(update_fields=['balance'])
+    with transaction.atomic():
+        profiles = list(lock_profiles(*(user for user, _ in payouts)).values())
+        UserProfile.objects.filter(user_id__in=credits).update(
+            balance=F('balance') + Case(
+                *[When(user_id=uid, then=Value(amount)) for uid, amount in credits.items()],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            ),
+        )
+        for profile in profiles:
+            profile.balance += credits[profile.user_id]
+        publish_balances(profiles)
 
-            tx = Transaction.objects.create(
+        results = Transaction.objects.bulk_create([
+            Transaction(
                 sender=None,
                 receiver=user,
                 amount=amount,
                 tx_type='game',
                 note=note or 'Poker payout',
             )
-            results.append(tx)
+            for user, amount in payouts
+        ])
+        record_ledger(results, {p.user_id: p.balance for p in profiles})
+        record_transactions(results)
 
+        for user, amount in payouts:
             logger.info('Poker payout: user=%s amount=%d', user.username, amount)
 
     return results
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.accounts.models import UserProfile
+
+from .balances import publish_balances
+
+
+@receiver(post_save, sender=UserProfile)
+def publish_saved_balance(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Refresh the cached balance after full profile saves (admin, forms).
+
+    The economy services save with ``update_fields=['balance']`` and publish
+    explicitly, so only saves outside them are handled here.
+    """
+    if raw or update_fields is not None:
+        return
+    publish_balances([instance])
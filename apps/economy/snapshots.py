@@ -0,0 +1,226 @@
+"""Hourly and daily economy rollups for the admin dashboards.
+
+``take_snapshots`` writes one ``EconomySnapshot`` per closed hour and day.
+Readers add up the daily rows, then the hourly rows after the last day, and
+only aggregate the raw transactions after the newest snapshot. That tail is
+at most an hour or so of rows, however large the Transaction table grows.
+
+Circulation is not summed over every profile on each page load either: it
+is the newest snapshot's figure plus the coins issued or retired by the tail
+(mints, deductions and poker escrow all have an empty side).
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncDay, TruncHour
+from django.utils import timezone
+
+from apps.accounts.models import UserProfile
+
+from .models import EconomySnapshot, Transaction
+
+logger = logging.getLogger(__name__)
+
+GAME_TX_TYPES = ('game', 'game_win', 'game_loss')
+
+VOLUME_FIELDS = (
+    'minted', 'deducted', 'traded', 'game_volume',
+    'mint_count', 'deduct_count', 'trade_count', 'game_count',
+)
+
+_MINT = Q(tx_type='mint', sender__isnull=True)
+_DEDUCT = Q(tx_type='mint', sender__isnull=False)
+_TRADE = Q(tx_type='trade')
+_GAME = Q(tx_type__in=GAME_TX_TYPES)
+_ISSUED = Q(sender__isnull=True, receiver__isnull=False)
+_RETIRED = Q(sender__isnull=False, receiver__isnull=True)
+
+_PERIODS = {
+    EconomySnapshot.HOUR: (timedelta(hours=1), TruncHour),
+    EconomySnapshot.DAY: (timedelta(days=1), TruncDay),
+}
+
+
+def _transaction_aggregates():
+    return {
+        'minted': Coalesce(Sum('amount', filter=_MINT), 0),
+        'deducted': Coalesce(Sum('amount', filter=_DEDUCT), 0),
+        'traded': Coalesce(Sum('amount', filter=_TRADE), 0),
+        'game_volume': Coalesce(Sum('amount', filter=_GAME), 0),
+        'mint_count': Count('id', filter=_MINT),
+        'deduct_count': Count('id', filter=_DEDUCT),
+        'trade_count': Count('id', filter=_TRADE),
+        'game_count': Count('id', filter=_GAME),
+        'net_issued': (
+            Coalesce(Sum('amount', filter=_ISSUED), 0)
+            - Coalesce(Sum('amount', filter=_RETIRED), 0)
+        ),
+    }
+
+
+def transaction_totals(queryset):
+    """Aggregate ``queryset`` into the snapshot volume fields plus ``net_issued``."""
+    return queryset.order_by().aggregate(**_transaction_aggregates())
+
+
+def _floor(moment, period):
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if period == EconomySnapshot.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _circulation_now():
+    return UserProfile.objects.aggregate(total=Sum('balance'))['total'] or 0
+
+
+def _snapshot_period(period, now):
+    """Create the missing snapshots for ``period``. Returns how many were added."""
+    length, trunc = _PERIODS[period]
+
+    last_end = (
+        EconomySnapshot.objects.filter(period=period)
+        .aggregate(end=Max('period_end'))['end']
+    )
+    if last_end is None:
+        first = Transaction.objects.order_by('created_at').values_list(
+            'created_at', flat=True,
+        ).first()
+        last_end = _floor(first or now, period)
+
+    starts = []
+    start = last_end
+    while start + length <= now:
+        starts.append(start)
+        start += length
+    if not starts:
+        return 0
+    end = starts[-1] + length
+
+    rows = (
+        Transaction.objects.filter(created_at__gte=last_end, created_at__lt=end)
+        .annotate(bucket=trunc('created_at'))
+        .values('bucket')
+        .annotate(**_transaction_aggregates())
+        .order_by()
+    )
+    by_start = {row.pop('bucket'): row for row in rows}
+
+    # Walk backwards from the current total, undoing the coins issued after
+    # each period to get the circulation at its end.
+    circulation = _circulation_now() - transaction_totals(
+        Transaction.objects.filter(created_at__gte=end),
+    )['net_issued']
+    snapshots = []
+    for start in reversed(starts):
+        totals = by_start.get(start, {})
+        snapshots.append(EconomySnapshot(
+            period=period,
+            period_start=start,
+            period_end=start + length,
+            circulation=circulation,
+            **{field: totals.get(field, 0) for field in VOLUME_FIELDS},
+        ))
+        circulation -= totals.get('net_issued', 0)
+
+    EconomySnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+    return len(snapshots)
+
+
+def take_snapshots(now=None):
+    """Roll up every closed hour and day since the last snapshot of each.
+
+    Returns ``{period: created}``. Safe to re-run: periods already recorded
+    are skipped, and a missed run is caught up on the next one.
+    """
+    now = now or timezone.now()
+    created = {}
+    with transaction.atomic():
+        for period in _PERIODS:
+            created[period] = _snapshot_period(period, now)
+    logger.info(
+        'Economy snapshots taken: hourly=%d daily=%d',
+        created[EconomySnapshot.HOUR], created[EconomySnapshot.DAY],
+    )
+    return created
+
+
+def economy_totals():
+    """Return all-time volumes and current circulation.
+
+    Sums the daily snapshots, then hourly snapshots after the last day, then
+    the transactions after the newest snapshot. Without any snapshots this
+    degrades to a full aggregate.
+    """
+    sums = {field: Coalesce(Sum(field), 0) for field in VOLUME_FIELDS}
+    totals = dict.fromkeys(VOLUME_FIELDS, 0)
+
+    since = None
+    for period in (EconomySnapshot.DAY, EconomySnapshot.HOUR):
+        snapshots = EconomySnapshot.objects.filter(period=period)
+        if since is not None:
+            snapshots = snapshots.filter(period_start__gte=since)
+        row = snapshots.aggregate(end=Max('period_end'), **sums)
+        since = row.pop('end') or since
+        for field in VOLUME_FIELDS:
+            totals[field] += row[field]
+
+    tail = Transaction.objects.all()
+    if since is not None:
+        tail = tail.filter(created_at__gte=since)
+    tail_totals = transaction_totals(tail)
+    for field in VOLUME_FIELDS:
+        totals[field] += tail_totals[field]
+
+    if since is None:
+        totals['circulation'] = _circulation_now()
+    else:
+        base = EconomySnapshot.objects.filter(period_end=since).values_list(
+            'circulation', flat=True,
+        ).first()
+        totals['circulation'] = base + tail_totals['net_issued']
+    return totals
+
+
+def daily_volume(days=30, now=None):
+    """Return per-day volume rows for the last ``days`` days, newest first.
+
+    Closed days come from daily snapshots; the days after the newest one are
+    grouped from the raw transactions. Days without transactions are omitted.
+    """
+    now = now or timezone.now()
+    cutoff = _floor(now - timedelta(days=days), EconomySnapshot.DAY)
+
+    rows = []
+    since = cutoff
+    for snapshot in EconomySnapshot.objects.filter(
+        period=EconomySnapshot.DAY, period_start__gte=cutoff,
+    ).order_by('period_start'):
+        since = snapshot.period_end
+        if snapshot.tx_count:
+            rows.append({
+                'date': snapshot.period_start.date(),
+                'mint_volume': snapshot.minted,
+                'trade_volume': snapshot.traded,
+                'game_volume': snapshot.game_volume,
+                'tx_count': snapshot.tx_count,
+            })
+
+    tail = (
+        Transaction.objects.filter(created_at__gte=since)
+        .annotate(date=TruncDate('created_at'))
+        .values('date')
+        .annotate(
+            mint_volume=Coalesce(Sum('amount', filter=_MINT), 0),
+            trade_volume=Coalesce(Sum('amount', filter=_TRADE), 0),
+            game_volume=Coalesce(Sum('amount', filter=_GAME), 0),
+            tx_count=Count('id'),
+        )
+        .order_by('date')
+    )
+    rows.extend(tail)
+    rows.reverse()
+    return rows
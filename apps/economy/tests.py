@@ -1,16 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from apps.accounts.models import UserProfile
-from apps.economy.models import Transaction
+from apps.admin_panel.services import admin_deduct_coins
+from apps.economy.balances import get_balance
+from apps.economy.ledger import balance_at, statement
+from apps.economy.models import EconomySnapshot, LedgerEntry, Transaction
 from apps.economy.services import (
     InsufficientFunds,
     InvalidTrade,
     game_transfer,
+    lock_profiles,
     mint_coins,
+    poker_buy_in,
+    poker_payout,
     transfer_coins,
 )
+from apps.economy.snapshots import daily_volume, economy_totals, take_snapshots
 
 
 class TransferCoinsTest(TestCase):
@@ -126,6 +142,286 @@ class GameTransferTest(TestCase):
             game_transfer(self.alice, self.bob, 200)
 
 
+class LockProfilesTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+
+    def test_single_query_in_primary_key_order(self):
+        with CaptureQueriesContext(connection) as ctx:
+            profiles = lock_profiles(self.bob, self.alice)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('ORDER BY "accounts_userprofile"."id" ASC', ctx.captured_queries[0]['sql'])
+        self.assertEqual(set(profiles), {self.alice.pk, self.bob.pk})
+
+    def test_missing_profile_raises(self):
+        self.bob.profile.delete()
+        with self.assertRaises(UserProfile.DoesNotExist):
+            lock_profiles(self.alice, self.bob)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentTransferStressTest(TransactionTestCase):
+    """Opposing transfers between the same pair must never deadlock."""
+
+    TRANSFERS = 2000
+    WORKERS = 16
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+        UserProfile.objects.filter(user__in=[self.alice, self.bob]).update(balance=1000)
+
+    def _worker(self, worker):
+        """Run this worker's share of transfers on one connection."""
+        errors = []
+        try:
+            for i in range(worker, self.TRANSFERS, self.WORKERS):
+                sender, receiver = (self.alice, self.bob) if i % 2 else (self.bob, self.alice)
+                try:
+                    if i % 4 < 2:
+                        transfer_coins(sender, receiver, 1)
+                    else:
+                        game_transfer(winner=receiver, loser=sender, stake=1)
+                except OperationalError as e:
+                    errors.append(e)
+        finally:
+            connection.close()
+        return errors
+
+    def test_no_deadlocks_and_supply_conserved(self):
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            errors = [e for errs in pool.map(self._worker, range(self.WORKERS)) for e in errs]
+
+        self.assertEqual(errors, [])
+        total = sum(UserProfile.objects.filter(
+            user__in=[self.alice, self.bob],
+        ).values_list('balance', flat=True))
+        self.assertEqual(total, 2000)
+        self.assertEqual(Transaction.objects.count(), self.TRANSFERS)
+
+
+class PokerPayoutTest(TestCase):
+    def _players(self, count):
+        return [
+            User.objects.create_user(f'player{i}', f'p{i}@test.com', 'pass1234')
+            for i in range(count)
+        ]
+
+    def test_payout_credits_and_records_in_order(self):
+        players = self._players(3)
+        txs = poker_payout(
+            [(players[0], 100), (players[1], 0), (players[2], 40)],
+            note='Table #1',
+        )
+        self.assertEqual([tx.receiver for tx in txs], [players[0], players[2]])
+        self.assertTrue(all(tx.pk for tx in txs))
+        self.assertEqual({tx.note for tx in txs}, {'Table #1'})
+        balances = dict(UserProfile.objects.values_list('user__username', 'balance'))
+        self.assertEqual(balances, {'player0': 100, 'player1': 0, 'player2': 40})
+
+    def test_repeated_user_credited_once_per_entry(self):
+        (player,) = self._players(1)
+        txs = poker_payout([(player, 30), (player, 20)])
+        self.assertEqual(len(txs), 2)
+        player.profile.refresh_from_db()
+        self.assertEqual(player.profile.balance, 50)
+
+    def test_empty_payout_makes_no_queries(self):
+        (player,) = self._players(1)
+        with self.assertNumQueries(0):
+            self.assertEqual(poker_payout([(player, 0)]), [])
+
+    def test_ledger_statements_do_not_grow_with_seats(self):
+        counts = []
+        for seats in (2, 8):
+            players = [
+                User.objects.create_user(f's{seats}_{i}', f's{seats}_{i}@test.com', 'pass1234')
+                for i in range(seats)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                poker_payout([(p, 10) for p in players])
+            counts.append(sum(
+                1 for q in ctx.captured_queries
+                if 'accounts_userprofile' in q['sql'] or 'economy_transaction' in q['sql']
+            ))
+        self.assertEqual(counts[0], counts[1])
+
+
+class BalanceCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+        self.alice.profile.balance = 100
+        self.alice.profile.save()
+
+    def test_miss_reads_database_then_hits_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_balance(self.alice), 100)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_balance(self.alice), 100)
+
+    def test_transfer_writes_through_on_commit(self):
+        get_balance(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer_coins(self.alice, self.bob, 40)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_balance(self.alice), 60)
+            self.assertEqual(get_balance(self.bob), 40)
+
+    def test_failed_transfer_publishes_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(InsufficientFunds):
+                transfer_coins(self.alice, self.bob, 500)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_balance(self.alice), 100)
+
+    def test_payout_writes_through(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            poker_payout([(self.alice, 5), (self.bob, 7)])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_balance(self.alice), 105)
+            self.assertEqual(get_balance(self.bob), 7)
+
+    def test_stale_fill_does_not_overwrite_published_balance(self):
+        # A reader missed before the transfer's value was published, then
+        # read the old committed balance from the database.
+        cache.set(f'balance:{self.alice.pk}', 60)
+        with patch.object(cache, 'get', return_value=None):
+            self.assertEqual(get_balance(self.alice), 100)
+        self.assertEqual(get_balance(self.alice), 60)
+
+    def test_balance_check_served_from_cache(self):
+        self.client.login(username='alice', password='pass1234')
+        get_balance(self.alice)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/profile/balance/')
+        self.assertContains(response, '100 LC')
+        self.assertFalse(any('accounts_userprofile' in q['sql'] for q in ctx.captured_queries))
+
+
+class LedgerTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@test.com', 'pass1234')
+        self.admin.profile.is_admin_user = True
+        self.admin.profile.save()
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+
+    def _run_history(self):
+        mint_coins(self.admin, self.alice, 100)
+        transfer_coins(self.alice, self.bob, 30)
+        game_transfer(self.bob, self.alice, 10)
+        poker_buy_in(self.bob, 20)
+        poker_payout([(self.bob, 15), (self.alice, 5), (self.bob, 5)])
+
+    def _ledger(self):
+        return list(
+            LedgerEntry.objects.order_by('transaction_id', 'id')
+            .values_list('transaction_id', 'user__username', 'delta', 'balance_after')
+        )
+
+    def test_entries_record_running_balances(self):
+        self._run_history()
+        balances = list(
+            LedgerEntry.objects.filter(user=self.bob)
+            .order_by('created_at', 'id')
+            .values_list('delta', 'balance_after')
+        )
+        self.assertEqual(balances, [(30, 30), (10, 40), (-20, 20), (15, 35), (5, 40)])
+        self.bob.profile.refresh_from_db()
+        self.assertEqual(balances[-1][1], self.bob.profile.balance)
+
+    def test_every_transaction_balances_to_zero(self):
+        self._run_history()
+        for tx in Transaction.objects.prefetch_related('ledger_entries'):
+            legs = list(tx.ledger_entries.all())
+            self.assertEqual(len(legs), 2)
+            self.assertEqual(sum(leg.delta for leg in legs), 0)
+
+    def test_balance_at_and_statement(self):
+        mint_coins(self.admin, self.alice, 100)
+        first = LedgerEntry.objects.get(user=self.alice)
+        transfer_coins(self.alice, self.bob, 30)
+        self.assertEqual(balance_at(self.alice, first.created_at), 100)
+        self.assertEqual(balance_at(self.alice, first.created_at - timedelta(seconds=1)), 0)
+        opening, entries = statement(
+            self.alice, first.created_at + timedelta(microseconds=1), timezone.now() + timedelta(seconds=1),
+        )
+        self.assertEqual(opening, 100)
+        self.assertEqual([e.delta for e in entries], [-30])
+
+    def test_backfill_reproduces_live_entries(self):
+        self._run_history()
+        expected = self._ledger()
+        # Drop the older half of the history, as if it predated the ledger.
+        cutoff = Transaction.objects.order_by('id')[2].pk
+        LedgerEntry.objects.filter(transaction_id__lt=cutoff).delete()
+
+        call_command('backfill_ledger', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(self._ledger(), expected)
+        call_command('backfill_ledger', stdout=StringIO())
+        self.assertEqual(self._ledger(), expected)
+
+
+class EconomySnapshotTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@test.com', 'pass1234')
+        self.admin.profile.is_admin_user = True
+        self.admin.profile.save()
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+
+        # Spread a history over the last few days.
+        base = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=50)
+        steps = [
+            (lambda: mint_coins(self.admin, self.alice, 500), 1),
+            (lambda: transfer_coins(self.alice, self.bob, 120), 5),
+            (lambda: game_transfer(self.bob, self.alice, 40), 26),
+            (lambda: poker_buy_in(self.bob, 50), 30),
+            (lambda: poker_payout([(self.alice, 30)])[0], 31),
+            (lambda: admin_deduct_coins(self.admin, self.alice, 25), 49),
+        ]
+        for step, hours in steps:
+            tx = step()
+            Transaction.objects.filter(pk=tx.pk).update(
+                created_at=base + timedelta(hours=hours, minutes=10),
+            )
+
+    def test_snapshots_match_full_aggregates(self):
+        expected = economy_totals()
+        expected_days = daily_volume()
+        self.assertEqual(expected['circulation'], 500 - 50 + 30 - 25)
+        self.assertEqual(expected['minted'], 500)
+        self.assertEqual(expected['deducted'], 25)
+
+        created = take_snapshots()
+        self.assertGreaterEqual(created[EconomySnapshot.HOUR], 49)
+        self.assertGreaterEqual(created[EconomySnapshot.DAY], 2)
+        self.assertEqual(economy_totals(), expected)
+        self.assertEqual(daily_volume(), expected_days)
+
+        self.assertEqual(take_snapshots(), {EconomySnapshot.HOUR: 0, EconomySnapshot.DAY: 0})
+
+    def test_snapshot_circulation_and_tail(self):
+        take_snapshots()
+        buy_in = Transaction.objects.get(tx_type='game', receiver=None)
+        after_buy_in = EconomySnapshot.objects.get(
+            period=EconomySnapshot.HOUR,
+            period_end=buy_in.created_at.replace(minute=0) + timedelta(hours=1),
+        )
+        self.assertEqual(after_buy_in.circulation, 500 - 50)
+        self.assertEqual(after_buy_in.game_count, 1)
+
+        # Transactions after the newest snapshot come from the tail.
+        mint_coins(self.admin, self.bob, 70)
+        totals = economy_totals()
+        self.assertEqual(totals['circulation'], 500 - 50 + 30 - 25 + 70)
+        self.assertEqual(totals['minted'], 570)
+        self.assertEqual(totals['mint_count'], 2)
+
+
 class TradeViewTest(TestCase):
     def setUp(self):
         self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
@@ -4,14 +4,15 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
 from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import render
 
 from apps.accounts.decorators import rate_limit
 
+from .balances import get_balance
 from .forms import MintForm, TradeForm
-from .models import Transaction
+from .models import LedgerEntry, Transaction
 from .services import InsufficientFunds, InvalidTrade, mint_coins, transfer_coins
 
 
@@ -45,7 +46,7 @@ def trade_view(request):
 
     return render(request, 'economy/trade.html', {
         'form': form,
-        'balance': request.user.profile.balance,
+        'balance': get_balance(request.user),
     })
 
 
@@ -109,9 +110,14 @@ def history_view(request):
 
 @login_required
 def export_transactions(request):
+    balance_after = LedgerEntry.objects.filter(
+        transaction=OuterRef('pk'), user=request.user,
+    ).values('balance_after')[:1]
     txs = Transaction.objects.filter(
         Q(sender=request.user) | Q(receiver=request.user)
-    ).select_related('sender', 'receiver').order_by('-created_at').iterator()
+    ).select_related('sender', 'receiver').annotate(
+        balance_after=Subquery(balance_after),
+    ).order_by('-created_at').iterator()
 
     class _Echo:
         """Pseudo-buffer that csv.writer can write to."""
@@ -121,7 +127,7 @@ def export_transactions(request):
     writer = csv.writer(_Echo())
 
     def rows():
-        yield writer.writerow(['Date', 'Type', 'From', 'To', 'Amount', 'Note'])
+        yield writer.writerow(['Date', 'Type', 'From', 'To', 'Amount', 'Balance', 'Note'])
         for tx in txs:
             yield writer.writerow([
                 tx.created_at.strftime('%Y-%m-%d %H:%M'),
@@ -129,6 +135,7 @@ def export_transactions(request):
                 tx.sender.username if tx.sender else 'System',
                 tx.receiver.username if tx.receiver else '',
                 tx.amount,
+                '' if tx.balance_after is None else tx.balance_after,
                 tx.note,
             ])
 
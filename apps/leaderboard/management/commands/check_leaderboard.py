@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.leaderboard.services import find_inconsistencies, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Check the leaderboard 24h delta buckets against the Transaction table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Rebuild the delta buckets if any inconsistency is found',
+        )
+
+    def handle(self, *args, **options):
+        problems = find_inconsistencies()
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('Leaderboard delta buckets are consistent.'))
+            return
+
+        for problem in problems:
+            self.stdout.write(self.style.WARNING(problem))
+
+        if options['fix']:
+            total = rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Found {len(problems)} problem(s); rebuilt {total} delta bucket(s).'
+            ))
+            return
+
+        raise CommandError(f'Found {len(problems)} leaderboard inconsistencies.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaderboard.services import DELTA_WINDOW_HOURS, prune_delta_buckets
+
+
+class Command(BaseCommand):
+    help = 'Delete hourly balance-delta buckets that fell out of the leaderboard window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=DELTA_WINDOW_HOURS * 2,
+            help=f'Keep buckets from the last this many hours (default: {DELTA_WINDOW_HOURS * 2})',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_delta_buckets(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} delta bucket(s).'))
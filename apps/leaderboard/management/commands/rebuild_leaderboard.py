@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.leaderboard.services import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the leaderboard 24h delta buckets from the Transaction table'
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} delta bucket(s).'))
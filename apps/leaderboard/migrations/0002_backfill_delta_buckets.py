@@ -0,0 +1,46 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_buckets(apps, schema_editor):
+    """Seed the buckets from the last day of transactions so deltas don't reset on deploy."""
+    Transaction = apps.get_model('economy', 'Transaction')
+    BalanceDeltaBucket = apps.get_model('leaderboard', 'BalanceDeltaBucket')
+
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=24)
+    deltas = defaultdict(int)
+    rows = (
+        Transaction.objects.filter(created_at__gte=since)
+        .values_list('sender_id', 'receiver_id', 'amount', 'created_at')
+        .iterator(chunk_size=2000)
+    )
+    for sender_id, receiver_id, amount, created_at in rows:
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        if sender_id is not None:
+            deltas[(sender_id, hour)] -= amount
+        if receiver_id is not None:
+            deltas[(receiver_id, hour)] += amount
+
+    BalanceDeltaBucket.objects.bulk_create(
+        [
+            BalanceDeltaBucket(user_id=user_id, hour=hour, delta=delta)
+            for (user_id, hour), delta in deltas.items()
+            if delta
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('economy', '0003_alter_transaction_receiver'),
+        ('leaderboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import models
+
+
+class BalanceDeltaBucket(models.Model):
+    """Net balance change for one user during one clock hour.
+
+    Written alongside every ledger entry by ``record_transactions`` so the
+    leaderboard's 24h delta is a sum over at most 24 rows per user.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='balance_delta_buckets',
+    )
+    hour = models.DateTimeField()
+    delta = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'hour'], name='delta_bucket_user_hour'),
+        ]
+        indexes = [
+            # Pruning deletes whole hours at once.
+            models.Index(fields=['hour'], name='delta_bucket_hour'),
+        ]
+
+    def __str__(self):
+        return f'user={self.user_id} {self.hour:%Y-%m-%d %H:00} {self.delta:+d}'
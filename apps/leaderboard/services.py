@@ -0,0 +1,181 @@
+"""Leaderboard reads and the 24h balance-delta store.
+
+Standings are read straight from ``UserProfile`` through its
+``(leaderboard_hidden, -balance, user)`` index: the top-N page is a range
+scan in index order, and a viewer's rank counts the visible balances above
+theirs on the same index. Nothing is copied per user, so balance writes pay
+no extra upkeep.
+
+The 24h deltas shown next to each balance come from hourly
+``BalanceDeltaBucket`` rows written with each ledger entry, rather than from
+re-aggregating the Transaction table on every page view.
+``find_inconsistencies`` and ``rebuild`` check and repair those buckets
+against the Transaction table.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Sum, Value, When
+from django.utils import timezone
+
+from apps.accounts.models import UserProfile
+from apps.economy.models import Transaction
+
+from .models import BalanceDeltaBucket
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 2000
+
+DELTA_WINDOW_HOURS = 24
+
+
+def top_profiles(limit):
+    """Return the top ``limit`` visible profiles with their user."""
+    return list(
+        UserProfile.objects.filter(leaderboard_hidden=False)
+        .select_related('user')
+        .order_by('-balance', 'user_id')[:limit]
+    )
+
+
+def rank_for_balance(balance):
+    """Return the competition rank a visible user with ``balance`` has (or would have)."""
+    return UserProfile.objects.filter(leaderboard_hidden=False, balance__gt=balance).count() + 1
+
+
+def _window_start(now=None):
+    return _hour_of(now or timezone.now()) - timedelta(hours=DELTA_WINDOW_HOURS - 1)
+
+
+def _transaction_deltas(since):
+    """Return ``{(user_id, hour): delta}`` recomputed from transactions since ``since``."""
+    deltas = defaultdict(int)
+    rows = (
+        Transaction.objects.filter(created_at__gte=since)
+        .values_list('sender_id', 'receiver_id', 'amount', 'created_at')
+        .iterator(chunk_size=REBUILD_BATCH_SIZE)
+    )
+    for sender_id, receiver_id, amount, created_at in rows:
+        hour = _hour_of(created_at)
+        if sender_id is not None:
+            deltas[(sender_id, hour)] -= amount
+        if receiver_id is not None:
+            deltas[(receiver_id, hour)] += amount
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def rebuild(now=None):
+    """Rewrite the buckets inside the delta window from the Transaction table.
+
+    Returns the number of buckets written.
+    """
+    since = _window_start(now)
+    deltas = _transaction_deltas(since)
+    with transaction.atomic():
+        BalanceDeltaBucket.objects.filter(hour__gte=since).delete()
+        BalanceDeltaBucket.objects.bulk_create(
+            [
+                BalanceDeltaBucket(user_id=user_id, hour=hour, delta=delta)
+                for (user_id, hour), delta in deltas.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+    logger.info('Leaderboard delta buckets rebuilt: buckets=%d', len(deltas))
+    return len(deltas)
+
+
+def find_inconsistencies(now=None):
+    """Compare the buckets inside the delta window against the Transaction table.
+
+    Returns a list of human-readable problem descriptions (empty when the
+    buckets are consistent).
+    """
+    since = _window_start(now)
+    expected = _transaction_deltas(since)
+    stored = {
+        (user_id, hour): delta
+        for user_id, hour, delta in BalanceDeltaBucket.objects.filter(
+            hour__gte=since,
+        ).exclude(delta=0).values_list('user_id', 'hour', 'delta')
+    }
+    problems = []
+    for user_id, hour in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get((user_id, hour), 0), stored.get((user_id, hour), 0)
+        if want != have:
+            problems.append(
+                f'user={user_id} hour={hour:%Y-%m-%d %H:00}: bucket delta {have} != transactions {want}'
+            )
+    return problems
+
+
+def _hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_transactions(transactions):
+    """Add the balance effect of ``transactions`` to the hourly delta buckets.
+
+    Must run in the same atomic block that changed the balances. Every
+    caller already holds the affected ``UserProfile`` row locks, so the
+    read-update-insert below cannot race with another writer for the same
+    user's bucket. Costs at most three statements however many rows change.
+    """
+    deltas = defaultdict(int)
+    for tx in transactions:
+        hour = _hour_of(tx.created_at)
+        if tx.sender_id is not None:
+            deltas[(tx.sender_id, hour)] -= tx.amount
+        if tx.receiver_id is not None:
+            deltas[(tx.receiver_id, hour)] += tx.amount
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    user_ids = {user_id for user_id, _ in deltas}
+    hours = {hour for _, hour in deltas}
+    buckets = BalanceDeltaBucket.objects.filter(user_id__in=user_ids, hour__in=hours)
+    existing = {key for key in buckets.values_list('user_id', 'hour') if key in deltas}
+    if existing:
+        buckets.update(delta=F('delta') + Case(
+            *[
+                When(user_id=user_id, hour=hour, then=Value(deltas[(user_id, hour)]))
+                for user_id, hour in existing
+            ],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        ))
+    missing = [
+        BalanceDeltaBucket(user_id=user_id, hour=hour, delta=delta)
+        for (user_id, hour), delta in deltas.items()
+        if (user_id, hour) not in existing
+    ]
+    if missing:
+        BalanceDeltaBucket.objects.bulk_create(missing)
+
+
+def recent_deltas(user_ids, now=None):
+    """Return ``{user_id: net change}`` over the last ``DELTA_WINDOW_HOURS`` buckets."""
+    if not user_ids:
+        return {}
+    since = _window_start(now)
+    rows = (
+        BalanceDeltaBucket.objects
+        .filter(user_id__in=user_ids, hour__gte=since)
+        .values('user_id')
+        .annotate(total=Sum('delta'))
+        .values_list('user_id', 'total')
+    )
+    return dict(rows)
+
+
+def prune_delta_buckets(keep_hours, now=None):
+    """Delete buckets older than ``keep_hours``. Returns the number deleted."""
+    cutoff = _hour_of(now or timezone.now()) - timedelta(hours=keep_hours)
+    deleted, _ = BalanceDeltaBucket.objects.filter(hour__lt=cutoff).delete()
+    return deleted
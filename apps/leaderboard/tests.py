@@ -1,7 +1,15 @@
+from datetime import timedelta
+from io import StringIO
+
 from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.economy.services import game_transfer, mint_coins, poker_buy_in, poker_payout, transfer_coins
 
-from apps.economy.services import transfer_coins
+from .models import BalanceDeltaBucket
+from .services import find_inconsistencies, rank_for_balance, rebuild, recent_deltas, top_profiles
 
 
 class LeaderboardViewTest(TestCase):
@@ -75,3 +83,98 @@ class LeaderboardViewTest(TestCase):
         deltas = {p.user.username: p.delta_24h for p in profiles}
         self.assertEqual(deltas['alice'], -50)
         self.assertEqual(deltas['bob'], 50)
+
+
+class LeaderboardRankTest(TestCase):
+    def _user(self, name, balance, hidden=False):
+        user = User.objects.create_user(name, f'{name}@test.com', 'pass1234')
+        user.profile.balance = balance
+        user.profile.leaderboard_hidden = hidden
+        user.profile.save()
+        return user
+
+    def test_ties_share_competition_rank(self):
+        self._user('a', 300)
+        self._user('b', 200)
+        self._user('c', 200)
+        self._user('hidden', 250, hidden=True)
+        self.assertEqual(
+            [rank_for_balance(balance) for balance in (300, 250, 200, 100)], [1, 2, 2, 4],
+        )
+
+    def test_top_profiles_skip_hidden_users(self):
+        self._user('a', 300)
+        self._user('b', 200)
+        self._user('hidden', 1000, hidden=True)
+        self.assertEqual([p.user.username for p in top_profiles(10)], ['a', 'b'])
+
+    def test_balance_save_has_no_leaderboard_upkeep(self):
+        a = self._user('a', 300)
+        with self.assertNumQueries(1):
+            a.profile.balance = 50
+            a.profile.save(update_fields=['balance'])
+
+
+class DeltaBucketConsistencyTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+        self.alice.profile.balance = 500
+        self.alice.profile.save()
+        transfer_coins(self.alice, self.bob, 40)
+
+    def test_rebuild_repairs_drift(self):
+        self.assertEqual(find_inconsistencies(), [])
+        BalanceDeltaBucket.objects.filter(user=self.bob).update(delta=7)
+        self.assertEqual(len(find_inconsistencies()), 1)
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(find_inconsistencies(), [])
+        self.assertEqual(recent_deltas([self.bob.pk]), {self.bob.pk: 40})
+
+    def test_check_command(self):
+        out = StringIO()
+        call_command('check_leaderboard', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+        BalanceDeltaBucket.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('check_leaderboard', stdout=StringIO())
+        call_command('check_leaderboard', '--fix', stdout=StringIO())
+        self.assertEqual(find_inconsistencies(), [])
+
+
+class BalanceDeltaBucketTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@test.com', 'pass1234')
+        self.bob = User.objects.create_user('bob', 'bob@test.com', 'pass1234')
+        self.alice.profile.balance = 500
+        self.alice.profile.is_admin_user = True
+        self.alice.profile.save()
+
+    def test_services_write_hourly_buckets(self):
+        transfer_coins(self.alice, self.bob, 100)
+        game_transfer(self.alice, self.bob, 30)
+        mint_coins(self.alice, self.bob, 20)
+        poker_buy_in(self.bob, 50)
+        poker_payout([(self.bob, 70), (self.alice, 10)])
+        self.assertEqual(
+            recent_deltas([self.alice.pk, self.bob.pk]),
+            {self.alice.pk: -60, self.bob.pk: 110},
+        )
+        # Everything happened within the same hour: one row per user.
+        self.assertEqual(BalanceDeltaBucket.objects.count(), 2)
+
+    def test_old_buckets_outside_window(self):
+        old_hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=24)
+        BalanceDeltaBucket.objects.create(user=self.bob, hour=old_hour, delta=999)
+        transfer_coins(self.alice, self.bob, 5)
+        self.assertEqual(recent_deltas([self.bob.pk]), {self.bob.pk: 5})
+
+    def test_prune_command(self):
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        BalanceDeltaBucket.objects.create(user=self.bob, hour=now - timedelta(hours=72), delta=1)
+        BalanceDeltaBucket.objects.create(user=self.bob, hour=now - timedelta(hours=2), delta=1)
+        out = StringIO()
+        call_command('prune_delta_buckets', stdout=out)
+        self.assertIn('Pruned 1', out.getvalue())
+        self.assertEqual(BalanceDeltaBucket.objects.count(), 1)
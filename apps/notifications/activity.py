@@ -0,0 +1,209 @@
+"""Per-user activity summary behind the notification badge and dropdown.
+
+``activity_summary`` combines two cached values:
+
+* Game counts (open chess games, coin flips and poker tables), computed in
+  a single query (one scalar subquery per count). Every view or consumer
+  that moves a game in or out of pending/active calls
+  ``invalidate_activity`` for the players involved.
+* The unread notification count, an atomic counter under
+  ``unread_notif_count:{pk}``. Creating, reading and deleting
+  notifications move it with ``adjust_unread`` (INCR/DECR), so the read
+  path never recounts. A missing counter is seeded once from the
+  ``notif_user_unread`` partial index, and ``reconcile_unread_counts``
+  (run from cron) corrects any drift.
+
+Once a change commits, ``badge_state`` is sent to the users' notification
+sockets; each ``NotificationConsumer`` answers with the fresh summary, so
+connected clients never need to poll.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery
+
+from .models import Notification
+
+ACTIVITY_CACHE_TIMEOUT = 300
+
+# Users whose counters are checked per query by reconcile_unread_counts.
+RECONCILE_BATCH_SIZE = 500
+
+
+def activity_cache_key(user_id):
+    return f'activity_summary:{user_id}'
+
+
+def unread_cache_key(user_id):
+    return f'unread_notif_count:{user_id}'
+
+
+def _push_badge_state(user_ids):
+    from .services import _ws_send_many
+
+    _ws_send_many([(user_id, {'type': 'badge_state'}) for user_id in user_ids])
+
+
+def invalidate_activity(*user_ids):
+    """Drop the cached game counts of ``user_ids`` and push their new badge state.
+
+    ``None`` entries are ignored. The cache is cleared again on commit, so a
+    summary read while the change was still uncommitted is not kept.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    keys = [activity_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+
+    def _push():
+        cache.delete_many(keys)
+        _push_badge_state(user_ids)
+
+    transaction.on_commit(_push)
+
+
+def adjust_unread(user_id, delta):
+    """Move ``user_id``'s unread counter by ``delta`` once the change commits.
+
+    A counter that is not cached is left alone: it is seeded from the
+    database, change included, the next time it is read.
+    """
+    adjust_unread_many({user_id: delta})
+
+
+def adjust_unread_many(deltas):
+    """``adjust_unread`` for a ``{user_id: delta}`` mapping, pushing badges in one batch.
+
+    Users whose delta is zero are skipped; their badge has not changed.
+    """
+    changed = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not changed:
+        return
+
+    def _apply():
+        for user_id, delta in changed.items():
+            try:
+                cache.incr(unread_cache_key(user_id), delta)
+            except ValueError:
+                pass
+        _push_badge_state(list(changed))
+
+    transaction.on_commit(_apply)
+
+
+def unread_count(user_id):
+    """Return the unread notification count of ``user_id`` from its counter."""
+    key = unread_cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        if not cache.add(key, count, None):
+            count = cache.get(key, count)
+    return max(count, 0)
+
+
+def reconcile_unread_counts():
+    """Correct cached unread counters that drifted from the database.
+
+    Only counters already in the cache are touched; missing ones are seeded
+    on their next read. Returns the number of counters corrected.
+    """
+    user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+    corrected = 0
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=RECONCILE_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == RECONCILE_BATCH_SIZE:
+            corrected += _reconcile_batch(batch)
+            batch = []
+    if batch:
+        corrected += _reconcile_batch(batch)
+    return corrected
+
+
+def _reconcile_batch(user_ids):
+    cached = cache.get_many([unread_cache_key(user_id) for user_id in user_ids])
+    if not cached:
+        return 0
+    actual = dict(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .order_by()
+        .values_list('user_id')
+        .annotate(n=Count('pk'))
+    )
+    drifted = {}
+    for user_id in user_ids:
+        key = unread_cache_key(user_id)
+        if key in cached and cached[key] != actual.get(user_id, 0):
+            drifted[key] = actual.get(user_id, 0)
+    if drifted:
+        cache.set_many(drifted, None)
+    return len(drifted)
+
+
+def _count(queryset):
+    """Scalar subquery counting the rows of ``queryset``."""
+    return Subquery(
+        queryset.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n'),
+        output_field=IntegerField(),
+    )
+
+
+def _summary_counts(user_id):
+    from apps.chess.models import ChessGame
+    from apps.coinflip.models import CoinFlipChallenge
+    from apps.poker.models import PokerPlayer
+
+    chess = ChessGame.objects.filter(Q(creator_id=user_id) | Q(opponent_id=user_id))
+    coinflip = CoinFlipChallenge.objects.filter(status='pending')
+    return get_user_model().objects.filter(pk=user_id).values(
+        unread_count=_count(Notification.objects.filter(user_id=user_id, is_read=False)),
+        chess_challenges=_count(ChessGame.objects.filter(opponent_id=user_id, status='pending')),
+        chess_pending=_count(chess.filter(status='pending')),
+        chess_active=_count(chess.filter(status='active')),
+        coinflip_challenges=_count(coinflip.filter(opponent_id=user_id)),
+        coinflip_pending=_count(coinflip.filter(Q(challenger_id=user_id) | Q(opponent_id=user_id))),
+        poker_tables=_count(
+            PokerPlayer.objects.filter(
+                user_id=user_id, table__status__in=['pending', 'active'],
+            ).exclude(status__in=['invited', 'left'])
+        ),
+    ).first()
+
+
+def activity_summary(user):
+    """Return the activity counts for ``user``.
+
+    Keys: ``unread_count``, ``pending_challenges`` (chess and coin flip
+    invitations waiting on the user), ``active_games`` (chess games in
+    progress plus open poker tables), per-game ``chess``/``coinflip``/
+    ``poker`` counts of everything listed in the dropdown, and
+    ``has_game_activity``.
+    """
+    key, unread_key = activity_cache_key(user.pk), unread_cache_key(user.pk)
+    cached = cache.get_many([key, unread_key])
+    summary = cached.get(key)
+    if summary is None:
+        counts = _summary_counts(user.pk)
+        pending_challenges = counts['chess_challenges'] + counts['coinflip_challenges']
+        active_games = counts['chess_active'] + counts['poker_tables']
+        summary = {
+            'pending_challenges': pending_challenges,
+            'active_games': active_games,
+            'chess': counts['chess_pending'] + counts['chess_active'],
+            'coinflip': counts['coinflip_pending'],
+            'poker': counts['poker_tables'],
+        }
+        summary['has_game_activity'] = bool(summary['chess'] or summary['coinflip'] or summary['poker'])
+        cache.set(key, summary, ACTIVITY_CACHE_TIMEOUT)
+        # Seed a missing unread counter from the same query
+        if unread_key not in cached and cache.add(unread_key, counts['unread_count'], None):
+            cached[unread_key] = counts['unread_count']
+
+    if unread_key in cached:
+        unread = max(cached[unread_key], 0)
+    else:
+        unread = unread_count(user.pk)
+    return {**summary, 'unread_count': unread}
@@ -1,8 +1,11 @@
 import json
 import logging
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .activity import activity_summary
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +22,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         self.group_name = f'notifications_{self.user.pk}'
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        await self.badge_state({})
 
     async def disconnect(self, close_code):
         if hasattr(self, 'group_name'):
@@ -46,3 +50,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'type': 'notification_deleted',
             'id': event['id'],
         }))
+
+    async def badge_state(self, event):
+        """Send the authoritative unread count and game activity flags."""
+        summary = await database_sync_to_async(activity_summary)(self.user)
+        await self.send(text_data=json.dumps({
+            'type': 'badge_state',
+            'unread_count': summary['unread_count'],
+            'has_game_activity': summary['has_game_activity'],
+            'pending_challenges': summary['pending_challenges'],
+            'active_games': summary['active_games'],
+        }))
@@ -1,12 +1,11 @@
-from django.core.cache import cache
+from .activity import activity_summary
 
 
 def unread_notification_count(request):
     if request.user.is_authenticated:
-        cache_key = f'unread_notif_count:{request.user.pk}'
-        count = cache.get(cache_key)
-        if count is None:
-            count = request.user.notifications.filter(is_read=False).count()
-            cache.set(cache_key, count, 30)  # Cache for 30 seconds
-        return {'unread_notification_count': count}
-    return {'unread_notification_count': 0}
+        summary = activity_summary(request.user)
+        return {
+            'unread_notification_count': summary['unread_count'],
+            'has_game_activity': summary['has_game_activity'],
+        }
+    return {'unread_notification_count': 0, 'has_game_activity': False}
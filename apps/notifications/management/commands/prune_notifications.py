@@ -0,0 +1,51 @@
+"""Management command to apply the notification retention policy.
+
+Collapses each user's read "Coins Received" notifications into one digest
+per day, then deletes read notifications past the age limit or beyond each
+user's cap, in batched deletes. Unread notifications are never touched.
+Intended to run via cron daily.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.retention import (
+    DELETE_BATCH_SIZE,
+    DIGEST_AFTER_DAYS,
+    MAX_AGE_DAYS,
+    MAX_PER_USER,
+    apply_retention,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compact and delete old read notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=MAX_AGE_DAYS,
+            help=f'Delete read notifications older than this many days (default: {MAX_AGE_DAYS})',
+        )
+        parser.add_argument(
+            '--per-user', type=int, default=MAX_PER_USER,
+            help=f'Notifications kept per user before read ones are deleted (default: {MAX_PER_USER})',
+        )
+        parser.add_argument(
+            '--digest-after-days', type=int, default=DIGEST_AFTER_DAYS,
+            help=f'Digest coin notifications from before the last N days (default: {DIGEST_AFTER_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETE_BATCH_SIZE,
+            help=f'Rows deleted per statement (default: {DELETE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        result = apply_retention(
+            max_age_days=options['days'],
+            max_per_user=options['per_user'],
+            digest_after_days=options['digest_after_days'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {result['compacted']}, expired {result['expired']}, "
+            f"over cap {result['over_cap']} notification(s)."
+        ))
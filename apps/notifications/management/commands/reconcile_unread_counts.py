@@ -0,0 +1,20 @@
+"""Management command to reconcile cached unread notification counters.
+
+The per-user counters are moved with INCR/DECR as notifications are
+created, read and deleted. A crash between a commit and its counter update,
+or a counter seeded while a change was in flight, can leave one off by a
+few; this resets every cached counter that disagrees with the
+``notif_user_unread`` index. Intended to run via cron every ~10 minutes.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.activity import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Correct cached unread notification counts that drifted from the database'
+
+    def handle(self, *args, **options):
+        corrected = reconcile_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} unread count(s).'))
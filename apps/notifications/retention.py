@@ -0,0 +1,201 @@
+"""Retention policy for the notification table.
+
+Only read notifications are touched, so unread counters never move. Each
+run of ``prune_notifications``:
+
+* collapses a user's read "Coins Received" rows from the same day into one
+  "Coins Received Digest" row, for days before the last
+  ``digest_after_days`` (today included), so only finished days are digested.
+  Rows read after their day was digested are folded into its digest;
+* deletes read notifications older than ``max_age_days``;
+* deletes read notifications beyond each user's newest ``max_per_user``.
+
+Deletes go by primary key in batches of ``batch_size`` so no statement
+holds locks on a large share of the table. Notifications are only a view
+of transfers and game results, whose own rows are kept, so nothing is
+archived.
+"""
+
+import re
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Notification
+
+MAX_AGE_DAYS = 90
+MAX_PER_USER = 200
+DIGEST_AFTER_DAYS = 1
+DELETE_BATCH_SIZE = 1000
+
+COINS_RECEIVED_TITLE = 'Coins Received'
+DIGEST_TITLE = 'Coins Received Digest'
+
+_AMOUNT_RE = re.compile(r'sent you (\d+) coins\.$')
+_DIGEST_RE = re.compile(r'^(\d+) transfers received on .+?(?:, (\d+) coins in total)?\.$')
+
+
+def delete_in_batches(queryset, batch_size=DELETE_BATCH_SIZE):
+    """Delete the rows of ``queryset`` by primary key, ``batch_size`` at a time."""
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += Notification.objects.filter(pk__in=pks).delete()[0]
+
+
+def _tally(messages):
+    """Return ``(transfers, coins)`` for "Coins Received" messages.
+
+    ``coins`` is ``None`` if any amount cannot be read.
+    """
+    amounts = [_AMOUNT_RE.search(message) for message in messages]
+    coins = sum(int(match.group(1)) for match in amounts) if all(amounts) else None
+    return len(messages), coins
+
+
+def _digest_tally(message):
+    """Read ``(transfers, coins)`` back from a digest message."""
+    match = _DIGEST_RE.match(message)
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+
+def _digest_message(transfers, coins, day):
+    text = f'{transfers} transfers received on {day:%b} {day.day}'
+    if coins is not None:
+        text += f', {coins} coins in total'
+    return text + '.'
+
+
+def compact_coin_notifications(older_than):
+    """Collapse read "Coins Received" rows per user and day before ``older_than``.
+
+    Rows for a day that already has a digest (read after an earlier run)
+    are folded into that digest, so each user and day keeps one digest.
+    Returns the number of rows removed.
+    """
+    sources = Notification.objects.filter(
+        notif_type='coin_received',
+        title=COINS_RECEIVED_TITLE,
+        is_read=True,
+        created_at__lt=older_than,
+    )
+    groups = list(
+        sources.annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('user_id', 'day')
+        .annotate(n=Count('pk'), last=Max('created_at'))
+    )
+    if not groups:
+        return 0
+    digests = {
+        (user_id, day): (pk, message, created_at)
+        for pk, user_id, day, message, created_at in Notification.objects.filter(
+            notif_type='coin_received',
+            title=DIGEST_TITLE,
+            user_id__in={group['user_id'] for group in groups},
+            created_at__lt=older_than,
+        ).annotate(day=TruncDate('created_at')).values_list(
+            'pk', 'user_id', 'day', 'message', 'created_at',
+        )
+    }
+
+    removed = 0
+    for group in groups:
+        key = (group['user_id'], group['day'])
+        digest = digests.get(key)
+        tally = _digest_tally(digest[1]) if digest else None
+        if digest is not None and tally is None:
+            continue  # a digest we cannot read back; leave the day alone
+        if digest is None and group['n'] < 2:
+            continue
+        rows = list(
+            sources.filter(user_id=group['user_id'], created_at__date=group['day'])
+            .values_list('pk', 'message')
+        )
+        if not rows:
+            continue
+        transfers, coins = _tally([message for _, message in rows])
+        latest = group['last']
+        with transaction.atomic():
+            if digest is None:
+                digest_pk = Notification.objects.create(
+                    user_id=group['user_id'],
+                    notif_type='coin_received',
+                    title=DIGEST_TITLE,
+                    message='',
+                    link='/profile/',
+                    is_read=True,
+                ).pk
+                removed -= 1
+            else:
+                digest_pk = digest[0]
+                latest = max(latest, digest[2])
+                transfers += tally[0]
+                coins = coins + tally[1] if coins is not None and tally[1] is not None else None
+            # auto_now_add ignores a value passed to create(), so the digest
+            # takes the time of its latest transfer here.
+            Notification.objects.filter(pk=digest_pk).update(
+                message=_digest_message(transfers, coins, group['day']),
+                created_at=latest,
+            )
+            removed += Notification.objects.filter(pk__in=[pk for pk, _ in rows]).delete()[0]
+    return removed
+
+
+def prune_expired(older_than, batch_size=DELETE_BATCH_SIZE):
+    """Delete read notifications created before ``older_than``."""
+    return delete_in_batches(
+        Notification.objects.filter(is_read=True, created_at__lt=older_than), batch_size,
+    )
+
+
+def prune_over_cap(max_per_user, batch_size=DELETE_BATCH_SIZE):
+    """Delete read notifications beyond each user's newest ``max_per_user``."""
+    over = (
+        Notification.objects.order_by()
+        .values('user_id')
+        .annotate(n=Count('pk'))
+        .filter(n__gt=max_per_user)
+        .values_list('user_id', flat=True)
+    )
+    deleted = 0
+    for user_id in list(over):
+        newest_dropped = (
+            Notification.objects.filter(user_id=user_id)
+            .order_by('-created_at', '-pk')
+            .values_list('created_at', 'pk')[max_per_user]
+        )
+        created_at, pk = newest_dropped
+        deleted += delete_in_batches(
+            Notification.objects.filter(user_id=user_id, is_read=True).filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lte=pk),
+            ),
+            batch_size,
+        )
+    return deleted
+
+
+def apply_retention(
+    max_age_days=MAX_AGE_DAYS,
+    max_per_user=MAX_PER_USER,
+    digest_after_days=DIGEST_AFTER_DAYS,
+    batch_size=DELETE_BATCH_SIZE,
+    now=None,
+):
+    """Run the whole policy. Returns ``{'compacted', 'expired', 'over_cap'}`` row counts."""
+    now = now or timezone.now()
+    first_kept_day = timezone.localdate(now) - timedelta(days=digest_after_days - 1)
+    return {
+        'compacted': compact_coin_notifications(
+            timezone.make_aware(datetime.combine(first_kept_day, time.min)),
+        ),
+        'expired': prune_expired(now - timedelta(days=max_age_days), batch_size),
+        'over_cap': prune_over_cap(max_per_user, batch_size),
+    }
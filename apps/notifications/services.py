@@ -1,9 +1,11 @@
+import asyncio
 import logging
+from collections import Counter
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from django.core.cache import cache
 
+from .activity import adjust_unread, adjust_unread_many
 from .models import Notification
 
 logger = logging.getLogger(__name__)
@@ -13,10 +15,10 @@ def send_notification(user, notif_type, title, message, link=''):
     """Create a notification and push it via WebSocket.
 
     The DB record is created immediately (safe inside an outer atomic block).
-    The WebSocket push and cache invalidation are deferred to
-    ``transaction.on_commit`` so they only fire after the enclosing
-    transaction has committed — preventing phantom notifications if the
-    transaction is rolled back.
+    The WebSocket pushes (the notification, then the new badge state) are
+    deferred to ``transaction.on_commit`` so they only fire after the
+    enclosing transaction has committed — preventing phantom notifications
+    if the transaction is rolled back.
     """
     from django.db import transaction as db_transaction
 
@@ -28,53 +30,81 @@ def send_notification(user, notif_type, title, message, link=''):
         link=link,
     )
 
-    # Cache invalidation is safe immediately (idempotent, no external effect).
-    cache.delete(f'unread_notif_count:{user.pk}')
-
     # Defer the WebSocket push until the enclosing transaction commits,
     # so clients never receive a notification for a rolled-back transfer.
     def _ws_push():
-        _ws_send(user.pk, {
-            'type': 'new_notification',
-            'notification': {
-                'id': notif.pk,
-                'notif_type': notif.notif_type,
-                'title': notif.title,
-                'message': notif.message,
-                'link': notif.link,
-                'created_at': notif.created_at.isoformat(),
-            },
-        })
+        _ws_send(user.pk, _new_notification_event(notif))
 
     db_transaction.on_commit(_ws_push)
+    # Followed by the counter bump and new badge_state, also on commit.
+    adjust_unread(user.pk, 1)
 
     return notif
 
 
+def send_notifications_bulk(recipients, notif_type, link=''):
+    """Create one notification per ``(user, title, message)`` in ``recipients``.
+
+    The bulk version of ``send_notification`` for fan-outs such as game
+    results: a single INSERT, then on commit one unread-counter update per
+    recipient and every WebSocket push sent in one batch.
+    """
+    from django.db import transaction as db_transaction
+
+    notifs = Notification.objects.bulk_create([
+        Notification(user=user, notif_type=notif_type, title=title, message=message, link=link)
+        for user, title, message in recipients
+    ])
+    if not notifs:
+        return notifs
+
+    def _ws_push():
+        _ws_send_many([(notif.user_id, _new_notification_event(notif)) for notif in notifs])
+
+    db_transaction.on_commit(_ws_push)
+    adjust_unread_many(Counter(notif.user_id for notif in notifs))
+
+    return notifs
+
+
+def _new_notification_event(notif):
+    return {
+        'type': 'new_notification',
+        'notification': {
+            'id': notif.pk,
+            'notif_type': notif.notif_type,
+            'title': notif.title,
+            'message': notif.message,
+            'link': notif.link,
+            'created_at': notif.created_at.isoformat(),
+        },
+    }
+
+
 def _ws_notify_read(user_id, pk):
     """Notify all tabs that a notification was marked read."""
-    cache.delete(f'unread_notif_count:{user_id}')
     _ws_send(user_id, {
         'type': 'notification_read',
         'id': pk,
     })
+    adjust_unread(user_id, -1)
 
 
-def _ws_notify_deleted(user_id, pk):
+def _ws_notify_deleted(user_id, pk, was_unread=False):
     """Notify all tabs that a notification was deleted."""
-    cache.delete(f'unread_notif_count:{user_id}')
     _ws_send(user_id, {
         'type': 'notification_deleted',
         'id': pk,
     })
+    adjust_unread(user_id, -1 if was_unread else 0)
 
 
-def _ws_notify_all_read(user_id):
-    """Notify all tabs that all notifications were marked read."""
-    cache.delete(f'unread_notif_count:{user_id}')
+def _ws_notify_all_read(user_id, count):
+    """Notify all tabs that all ``count`` unread notifications were marked read."""
     _ws_send(user_id, {
         'type': 'all_notifications_read',
     })
+    adjust_unread(user_id, -count)
 
 
 def _ws_send(user_id, message):
@@ -88,3 +118,21 @@ def _ws_send(user_id, message):
             )
     except Exception:
         logger.debug('Could not send WS notification to user %s', user_id, exc_info=True)
+
+
+def _ws_send_many(messages):
+    """Send ``(user_id, message)`` pairs to notification groups in one batch."""
+    try:
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+
+        async def _send_all():
+            await asyncio.gather(*(
+                channel_layer.group_send(f'notifications_{user_id}', message)
+                for user_id, message in messages
+            ))
+
+        async_to_sync(_send_all)()
+    except Exception:
+        logger.debug('Could not send %d WS notifications', len(messages), exc_info=True)
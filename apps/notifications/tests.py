@@ -1,11 +1,16 @@
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
 
 from .models import Notification
-from .services import send_notification
+from .retention import apply_retention
+from .services import send_notification, send_notifications_bulk
 
 
 class NotificationModelTest(TestCase):
@@ -53,11 +58,47 @@ class SendNotificationTest(TestCase):
         self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
 
     @patch('apps.notifications.services.get_channel_layer')
-    def test_send_notification_invalidates_cache(self, mock_channel_layer):
+    def test_send_notification_increments_unread_counter(self, mock_channel_layer):
         mock_channel_layer.return_value = None
         cache.set(f'unread_notif_count:{self.user.pk}', 5)
-        send_notification(self.user, 'game_invite', 'Test', 'msg')
-        self.assertIsNone(cache.get(f'unread_notif_count:{self.user.pk}'))
+        with self.captureOnCommitCallbacks(execute=True):
+            send_notification(self.user, 'game_invite', 'Test', 'msg')
+        self.assertEqual(cache.get(f'unread_notif_count:{self.user.pk}'), 6)
+
+    @patch('apps.notifications.services.get_channel_layer')
+    def test_send_notifications_bulk(self, mock_channel_layer):
+        mock_channel_layer.return_value = None
+        other = User.objects.create_user('other', 'other@test.com', 'pass1234')
+        cache.set(f'unread_notif_count:{self.user.pk}', 2)
+        cache.set(f'unread_notif_count:{other.pk}', 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                notifs = send_notifications_bulk([
+                    (self.user, 'Chess Win!', 'You won'),
+                    (other, 'Chess Defeat', 'You lost'),
+                ], 'game_result', link='/chess/')
+        self.assertEqual(len(notifs), 2)
+        self.assertEqual(
+            list(Notification.objects.order_by('pk').values_list('user', 'title', 'link')),
+            [(self.user.pk, 'Chess Win!', '/chess/'), (other.pk, 'Chess Defeat', '/chess/')],
+        )
+        self.assertEqual(cache.get(f'unread_notif_count:{self.user.pk}'), 3)
+        self.assertEqual(cache.get(f'unread_notif_count:{other.pk}'), 1)
+
+    def test_send_notifications_bulk_pushes_after_commit(self):
+        other = User.objects.create_user('other', 'other@test.com', 'pass1234')
+        with patch('apps.notifications.services._ws_send_many') as ws_send_many:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                send_notifications_bulk([(self.user, 'A', 'a'), (other, 'B', 'b')], 'game_result')
+                ws_send_many.assert_not_called()
+        self.assertEqual(len(callbacks), 2)
+        (sent,), _ = ws_send_many.call_args_list[0]
+        self.assertEqual([user_id for user_id, _ in sent], [self.user.pk, other.pk])
+        self.assertEqual({message['type'] for _, message in sent}, {'new_notification'})
+
+    def test_send_notifications_bulk_empty(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(send_notifications_bulk([], 'game_result'), [])
 
 
 class NotificationViewTest(TestCase):
@@ -162,10 +203,17 @@ class NotificationViewTest(TestCase):
         # Page 1 should have 20 notifications
         response = self.client.get('/notifications/')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.context['page_obj'].object_list), 20)
-        # Page 2 should have 5
-        response = self.client.get('/notifications/?page=2')
-        self.assertEqual(len(response.context['page_obj'].object_list), 5)
+        first_page = response.context['notifications']
+        self.assertEqual(len(first_page), 20)
+        # Page 2 should have 5, with no further page
+        response = self.client.get('/notifications/', {'cursor': response.context['next_cursor']})
+        second_page = response.context['notifications']
+        self.assertEqual(len(second_page), 5)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(
+            {n.pk for n in first_page} | {n.pk for n in second_page},
+            set(Notification.objects.filter(user=self.user).values_list('pk', flat=True)),
+        )
 
 
     def test_mark_all_read_htmx_returns_badge(self):
@@ -191,6 +239,7 @@ class NotificationViewTest(TestCase):
 
 class UnreadPartialTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
         Notification.objects.create(
             user=self.user, notif_type='coin_received',
@@ -214,6 +263,7 @@ class UnreadPartialTest(TestCase):
 
 class UnreadCountTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
 
     def test_unread_count_requires_login(self):
@@ -228,6 +278,7 @@ class UnreadCountTest(TestCase):
 
 class GameActivityBadgeTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
 
     def test_game_activity_badge_requires_login(self):
@@ -242,6 +293,7 @@ class GameActivityBadgeTest(TestCase):
 
 class GameActivityMobileTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
 
     def test_game_activity_mobile_requires_login(self):
@@ -256,6 +308,7 @@ class GameActivityMobileTest(TestCase):
 
 class GameActivityTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
         self.client.login(username='testuser', password='pass1234')
 
@@ -272,3 +325,199 @@ class GameActivityTest(TestCase):
         chess_games, coinflip_games, poker_tables = _get_active_games(self.user)
         self.assertEqual(len(poker_tables), 1)
         self.assertEqual(poker_tables[0].pk, table.pk)
+
+
+class ActivitySummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
+        self.other = User.objects.create_user('other', 'other@test.com', 'pass1234')
+        self.client.login(username='testuser', password='pass1234')
+
+    def test_counts_every_game_type_in_one_query(self):
+        from apps.chess.models import ChessGame
+        from apps.coinflip.models import CoinFlipChallenge
+        from apps.notifications.activity import activity_summary
+        from apps.poker.models import PokerPlayer, PokerTable
+
+        Notification.objects.create(user=self.user, notif_type='game_invite', title='T', message='m')
+        ChessGame.objects.create(creator=self.other, opponent=self.user, stake=10)
+        ChessGame.objects.create(creator=self.user, opponent=self.other, stake=10, status='active')
+        CoinFlipChallenge.objects.create(challenger=self.user, opponent=self.other, stake=10)
+        table = PokerTable.objects.create(creator=self.other, stake=100)
+        PokerPlayer.objects.create(table=table, user=self.user, seat=1, chips=1000, status='active')
+
+        with self.assertNumQueries(1):
+            summary = activity_summary(self.user)
+        self.assertEqual(summary['unread_count'], 1)
+        self.assertEqual(summary['pending_challenges'], 1)
+        self.assertEqual(summary['active_games'], 2)
+        self.assertEqual((summary['chess'], summary['coinflip'], summary['poker']), (2, 1, 1))
+        self.assertTrue(summary['has_game_activity'])
+
+        with self.assertNumQueries(0):
+            activity_summary(self.user)
+
+    def test_badge_poll_is_served_from_cache(self):
+        self.client.get('/notifications/unread-count/')
+        self.client.get('/notifications/game-activity/')
+        # Only the session and user lookups of each request remain
+        with self.assertNumQueries(4):
+            self.client.get('/notifications/unread-count/')
+            self.client.get('/notifications/game-activity/')
+
+    def test_new_challenge_invalidates_both_players(self):
+        from apps.notifications.activity import activity_summary
+
+        self.other.profile.balance = 500
+        self.other.profile.save()
+        self.user.profile.balance = 500
+        self.user.profile.save()
+        self.assertFalse(activity_summary(self.user)['has_game_activity'])
+        self.assertFalse(activity_summary(self.other)['has_game_activity'])
+
+        self.client.post('/chess/challenge/', {'opponent_username': 'other', 'stake': 10})
+        self.assertEqual(activity_summary(self.user)['chess'], 1)
+        self.assertEqual(activity_summary(self.other)['pending_challenges'], 1)
+
+    def test_marking_read_updates_badge(self):
+        from apps.notifications.activity import activity_summary
+
+        with patch('apps.notifications.services.get_channel_layer', return_value=None):
+            self.assertEqual(activity_summary(self.user)['unread_count'], 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                notif = send_notification(self.user, 'game_invite', 'T', 'm')
+                send_notification(self.user, 'game_invite', 'T', 'm')
+            self.assertEqual(activity_summary(self.user)['unread_count'], 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/notifications/read/{notif.pk}/')
+                self.client.post(f'/notifications/read/{notif.pk}/')
+            self.assertEqual(activity_summary(self.user)['unread_count'], 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/notifications/read-all/')
+        with self.assertNumQueries(0):
+            self.assertEqual(activity_summary(self.user)['unread_count'], 0)
+
+    def test_deleting_unread_notification_decrements_counter(self):
+        from apps.notifications.activity import unread_count
+
+        with patch('apps.notifications.services.get_channel_layer', return_value=None):
+            notif = send_notification(self.user, 'game_invite', 'T', 'm')
+            self.assertEqual(unread_count(self.user.pk), 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/notifications/delete/{notif.pk}/')
+        self.assertEqual(unread_count(self.user.pk), 0)
+
+    def test_badge_push_skips_users_with_zero_delta(self):
+        from apps.notifications.activity import adjust_unread_many
+
+        with patch('apps.notifications.activity._push_badge_state') as push:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                adjust_unread_many({self.user.pk: 0})
+            self.assertEqual(callbacks, [])
+            with self.captureOnCommitCallbacks(execute=True):
+                adjust_unread_many({self.user.pk: 1, self.other.pk: 0})
+        push.assert_called_once_with([self.user.pk])
+
+    def test_deleting_notification_read_meanwhile_decrements_counter_once(self):
+        from apps.notifications.activity import unread_count
+
+        with patch('apps.notifications.services.get_channel_layer', return_value=None):
+            notif = send_notification(self.user, 'game_invite', 'T', 'm')
+            send_notification(self.user, 'game_invite', 'T', 'm')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/notifications/read/{notif.pk}/')
+                self.client.post(f'/notifications/delete/{notif.pk}/')
+        self.assertEqual(unread_count(self.user.pk), 1)
+        self.assertFalse(Notification.objects.filter(pk=notif.pk).exists())
+
+    def test_reconcile_corrects_drifted_counters_only(self):
+        from apps.notifications.activity import unread_count
+
+        Notification.objects.create(user=self.user, notif_type='game_invite', title='T', message='m')
+        cache.set(f'unread_notif_count:{self.user.pk}', 7)
+        out = StringIO()
+        call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn('Corrected 1', out.getvalue())
+        self.assertEqual(unread_count(self.user.pk), 1)
+        # Counters that are not cached are left to be seeded on read
+        self.assertIsNone(cache.get(f'unread_notif_count:{self.other.pk}'))
+
+
+class NotificationRetentionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', 'test@test.com', 'pass1234')
+        # Midday, so rows a few hours apart fall on the same day
+        self.now = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def _notify(self, age, is_read=True, title='Coins Received', message='Bob sent you 10 coins.'):
+        notif = Notification.objects.create(
+            user=self.user, notif_type='coin_received', title=title, message=message, is_read=is_read,
+        )
+        Notification.objects.filter(pk=notif.pk).update(created_at=self.now - age)
+        return notif.pk
+
+    def test_read_coin_notifications_collapse_into_daily_digest(self):
+        for hours in (1, 2, 3):
+            self._notify(timedelta(days=3, hours=hours))
+        unread = self._notify(timedelta(days=3, hours=4), is_read=False)
+        today = self._notify(timedelta(0))
+        self._notify(timedelta(seconds=1))
+
+        result = apply_retention(now=self.now)
+
+        self.assertEqual(result['compacted'], 2)
+        digest = Notification.objects.get(title='Coins Received Digest')
+        self.assertTrue(digest.is_read)
+        self.assertIn('3 transfers received', digest.message)
+        self.assertIn('30 coins in total', digest.message)
+        self.assertEqual(digest.created_at, self.now - timedelta(days=3, hours=1))
+        # Unread rows and today's rows are left alone
+        self.assertEqual(Notification.objects.filter(pk__in=[unread, today]).count(), 2)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 4)
+
+    def test_rows_read_after_a_run_fold_into_the_existing_digest(self):
+        self._notify(timedelta(days=3, hours=1))
+        self._notify(timedelta(days=3, hours=2))
+        late = self._notify(timedelta(days=3, hours=3), is_read=False)
+        apply_retention(now=self.now)
+
+        Notification.objects.filter(pk=late).update(is_read=True)
+        result = apply_retention(now=self.now)
+
+        self.assertEqual(result['compacted'], 1)
+        digest = Notification.objects.get(user=self.user)
+        self.assertEqual(digest.title, 'Coins Received Digest')
+        self.assertIn('3 transfers received', digest.message)
+        self.assertIn('30 coins in total', digest.message)
+        self.assertEqual(digest.created_at, self.now - timedelta(days=3, hours=1))
+
+        # Nothing new to fold: a third run leaves the digest alone
+        self.assertEqual(apply_retention(now=self.now)['compacted'], 0)
+        self.assertEqual(Notification.objects.get(user=self.user).message, digest.message)
+
+    def test_expired_read_notifications_are_deleted(self):
+        old_read = self._notify(timedelta(days=100), title='Chess Win!')
+        old_unread = self._notify(timedelta(days=100), is_read=False, title='Chess Win!')
+        recent = self._notify(timedelta(days=10), title='Chess Win!')
+
+        result = apply_retention(max_age_days=90, batch_size=1, now=self.now)
+
+        self.assertEqual(result['expired'], 1)
+        remaining = set(Notification.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {old_unread, recent})
+        self.assertNotIn(old_read, remaining)
+
+    def test_read_notifications_beyond_cap_are_deleted(self):
+        pks = [self._notify(timedelta(hours=hours), title='Chess Win!') for hours in range(5)]
+        unread = self._notify(timedelta(hours=10), is_read=False, title='Chess Win!')
+
+        out = StringIO()
+        call_command('prune_notifications', '--per-user', '3', '--batch-size', '1', stdout=out)
+
+        self.assertIn('over cap 2', out.getvalue())
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)),
+            set(pks[:3]) | {unread},
+        )
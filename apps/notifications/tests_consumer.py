@@ -1,14 +1,19 @@
 from channels.db import database_sync_to_async
 from channels.testing import WebsocketCommunicator
 from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
 from django.test import TransactionTestCase
 
 from .consumers import NotificationConsumer
+from .services import send_notification
 
 
 class NotificationConsumerTest(TransactionTestCase):
     """Tests for the NotificationConsumer WebSocket."""
 
+    def setUp(self):
+        cache.clear()
+
     async def _create_user(self):
         return await database_sync_to_async(User.objects.create_user)(
             'testuser', 'test@test.com', 'pass1234',
@@ -38,6 +43,7 @@ class NotificationConsumerTest(TransactionTestCase):
         communicator = self._make_communicator(user)
         connected, _ = await communicator.connect()
         self.assertTrue(connected)
+        await communicator.receive_json_from()  # badge_state
 
         # Simulate a group_send
         from channels.layers import get_channel_layer
@@ -58,3 +64,28 @@ class NotificationConsumerTest(TransactionTestCase):
         self.assertEqual(response['type'], 'new_notification')
         self.assertEqual(response['notification']['title'], 'Test')
         await communicator.disconnect()
+
+    async def test_badge_state_on_connect(self):
+        user = await self._create_user()
+        await database_sync_to_async(send_notification)(user, 'game_invite', 'Test', 'msg')
+        communicator = self._make_communicator(user)
+        await communicator.connect()
+
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'badge_state')
+        self.assertEqual(response['unread_count'], 1)
+        self.assertFalse(response['has_game_activity'])
+        await communicator.disconnect()
+
+    async def test_badge_state_follows_new_notification(self):
+        user = await self._create_user()
+        communicator = self._make_communicator(user)
+        await communicator.connect()
+        await communicator.receive_json_from()  # badge_state
+
+        await database_sync_to_async(send_notification)(user, 'game_invite', 'Test', 'msg')
+        self.assertEqual((await communicator.receive_json_from())['type'], 'new_notification')
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'badge_state')
+        self.assertEqual(response['unread_count'], 1)
+        await communicator.disconnect()
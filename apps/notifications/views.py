@@ -1,48 +1,71 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import HttpResponse, HttpResponseNotAllowed
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import redirect, render
 from django.utils.http import url_has_allowed_host_and_scheme
 
+from apps.pagination import keyset_page
+
+from .activity import activity_summary
 from .models import Notification
 from .services import _ws_notify_all_read, _ws_notify_deleted, _ws_notify_read
 
 
-def _get_active_games(user):
+NOTIFICATIONS_PER_PAGE = 20
+
+
+def _get_chess_games(user):
     from apps.chess.models import ChessGame
-    from apps.coinflip.models import CoinFlipChallenge
-    from apps.poker.models import PokerPlayer, PokerTable
 
-    chess_games = ChessGame.objects.filter(
+    return ChessGame.objects.filter(
         Q(creator=user) | Q(opponent=user),
         status__in=['pending', 'active'],
     ).select_related('creator', 'opponent').order_by('status', '-created_at')[:3]
 
-    coinflip_games = CoinFlipChallenge.objects.filter(
+
+def _get_coinflip_games(user):
+    from apps.coinflip.models import CoinFlipChallenge
+
+    return CoinFlipChallenge.objects.filter(
         Q(challenger=user) | Q(opponent=user),
         status='pending',
     ).select_related('challenger', 'opponent').order_by('-created_at')[:3]
 
+
+def _get_poker_tables(user):
+    from apps.poker.models import PokerPlayer, PokerTable
+
     poker_table_ids = PokerPlayer.objects.filter(
         user=user,
     ).exclude(
         status__in=['invited', 'left'],
     ).values_list('table_id', flat=True)
-    poker_tables = PokerTable.objects.filter(
+    return PokerTable.objects.filter(
         pk__in=poker_table_ids,
         status__in=['pending', 'active'],
     ).select_related('creator', 'creator__profile').order_by('status', '-created_at')[:3]
 
-    return chess_games, coinflip_games, poker_tables
+
+def _get_active_games(user, summary=None):
+    """Return up to three open chess games, coin flips and poker tables.
+
+    Game types the activity ``summary`` reports as empty are not queried.
+    """
+    if summary is None:
+        return _get_chess_games(user), _get_coinflip_games(user), _get_poker_tables(user)
+    return (
+        _get_chess_games(user) if summary['chess'] else [],
+        _get_coinflip_games(user) if summary['coinflip'] else [],
+        _get_poker_tables(user) if summary['poker'] else [],
+    )
 
 
 @login_required
 def notification_list(request):
-    all_notifications = request.user.notifications.all()
-    paginator = Paginator(all_notifications, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get('cursor', '')
+    notifications, next_cursor = keyset_page(
+        request.user.notifications.order_by('-created_at', '-id'), cursor, size=NOTIFICATIONS_PER_PAGE,
+    )
 
     is_htmx_pagination = (
         request.headers.get('HX-Request') == 'true'
@@ -51,21 +74,23 @@ def notification_list(request):
     template = 'notifications/partials/notification_list_page.html' if is_htmx_pagination else 'notifications/list.html'
 
     return render(request, template, {
-        'notifications': page_obj,
-        'page_obj': page_obj,
+        'notifications': notifications,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
     })
 
 
 @login_required
 def unread_partial(request):
     user = request.user
-    unread_qs = user.notifications.filter(is_read=False)
-    count = unread_qs.count()
-    notifications = unread_qs[:5]
-    chess_games, coinflip_games, poker_tables = _get_active_games(user)
+    summary = activity_summary(user)
+    notifications = []
+    if summary['unread_count']:
+        notifications = user.notifications.filter(is_read=False)[:5]
+    chess_games, coinflip_games, poker_tables = _get_active_games(user, summary)
     return render(request, 'notifications/partials/dropdown.html', {
         'notifications': notifications,
-        'unread_count': count,
+        'unread_count': summary['unread_count'],
         'chess_games': chess_games,
         'coinflip_games': coinflip_games,
         'poker_tables': poker_tables,
@@ -74,36 +99,10 @@ def unread_partial(request):
 
 @login_required
 def unread_count(request):
-    from apps.chess.models import ChessGame
-    from apps.coinflip.models import CoinFlipChallenge
-    from apps.poker.models import PokerPlayer, PokerTable
-
-    user = request.user
-    count = user.notifications.filter(is_read=False).count()
-
-    poker_table_ids = PokerPlayer.objects.filter(
-        user=user,
-    ).exclude(
-        status__in=['invited', 'left'],
-    ).values_list('table_id', flat=True)
-
-    has_game_activity = (
-        ChessGame.objects.filter(
-            Q(creator=user) | Q(opponent=user),
-            status__in=['pending', 'active'],
-        ).exists()
-        or CoinFlipChallenge.objects.filter(
-            Q(challenger=user) | Q(opponent=user),
-            status='pending',
-        ).exists()
-        or PokerTable.objects.filter(
-            pk__in=poker_table_ids,
-            status__in=['pending', 'active'],
-        ).exists()
-    )
+    summary = activity_summary(request.user)
     return render(request, 'notifications/partials/badge.html', {
-        'unread_count': count,
-        'has_game_activity': has_game_activity,
+        'unread_count': summary['unread_count'],
+        'has_game_activity': summary['has_game_activity'],
     })
 
 
@@ -115,8 +114,9 @@ def mark_read(request, pk):
     notif = request.user.notifications.filter(pk=pk).first()
     if notif and not notif.is_read:
         notif.is_read = True
-        notif.save(update_fields=['is_read'])
-        _ws_notify_read(request.user.pk, pk)
+        # Conditional so concurrent requests decrement the counter once
+        if request.user.notifications.filter(pk=pk, is_read=False).update(is_read=True):
+            _ws_notify_read(request.user.pk, pk)
 
     if request.headers.get('HX-Request') == 'true':
         if notif:
@@ -136,14 +136,13 @@ def mark_all_read(request):
     if request.method != 'POST':
         return HttpResponseNotAllowed(['POST'])
 
-    request.user.notifications.filter(is_read=False).update(is_read=True)
-    _ws_notify_all_read(request.user.pk)
+    count = request.user.notifications.filter(is_read=False).update(is_read=True)
+    _ws_notify_all_read(request.user.pk, count)
 
     if request.headers.get('HX-Request') == 'true':
-        count = 0
         return render(request, 'notifications/partials/badge.html', {
-            'unread_count': count,
-            'has_game_activity': False,
+            'unread_count': 0,
+            'has_game_activity': activity_summary(request.user)['has_game_activity'],
         })
 
     return redirect('notification_list')
@@ -154,9 +153,13 @@ def delete_notification(request, pk):
     if request.method != 'POST':
         return HttpResponseNotAllowed(['POST'])
 
-    notif = get_object_or_404(Notification, pk=pk, user=request.user)
-    notif.delete()
-    _ws_notify_deleted(request.user.pk, pk)
+    # Unread first, so the counter drops only for a row removed while unread
+    # even if a concurrent mark_read lands in between.
+    owned = Notification.objects.filter(pk=pk, user=request.user)
+    was_unread = bool(owned.filter(is_read=False).delete()[0])
+    if not was_unread and not owned.delete()[0]:
+        raise Http404('No Notification matches the given query.')
+    _ws_notify_deleted(request.user.pk, pk, was_unread=was_unread)
 
     if request.headers.get('HX-Request') == 'true':
         return HttpResponse('')
@@ -166,47 +169,19 @@ def delete_notification(request, pk):
 
 @login_required
 def game_activity_badge(request):
-    from apps.chess.models import ChessGame
-    from apps.coinflip.models import CoinFlipChallenge
-    from apps.poker.models import PokerPlayer, PokerTable
-
-    user = request.user
-
-    chess_challenges = ChessGame.objects.filter(
-        opponent=user, status='pending',
-    ).count()
-    coinflip_challenges = CoinFlipChallenge.objects.filter(
-        opponent=user, status='pending',
-    ).count()
-    pending_challenges = chess_challenges + coinflip_challenges
-
-    active_chess = ChessGame.objects.filter(
-        Q(creator=user) | Q(opponent=user),
-        status='active',
-    ).count()
-
-    poker_table_ids = PokerPlayer.objects.filter(
-        user=user,
-    ).exclude(
-        status__in=['invited', 'left'],
-    ).values_list('table_id', flat=True)
-    active_poker = PokerTable.objects.filter(
-        pk__in=poker_table_ids,
-        status__in=['pending', 'active'],
-    ).count()
-
-    active_games = active_chess + active_poker
-
+    summary = activity_summary(request.user)
     return render(request, 'notifications/partials/game_activity.html', {
-        'pending_challenges': pending_challenges,
-        'active_games': active_games,
-        'total_activity': pending_challenges + active_games,
+        'pending_challenges': summary['pending_challenges'],
+        'active_games': summary['active_games'],
+        'total_activity': summary['pending_challenges'] + summary['active_games'],
     })
 
 
 @login_required
 def game_activity_mobile(request):
-    chess_games, coinflip_games, poker_tables = _get_active_games(request.user)
+    chess_games, coinflip_games, poker_tables = _get_active_games(
+        request.user, activity_summary(request.user),
+    )
     return render(request, 'notifications/partials/game_activity_mobile.html', {
         'chess_games': chess_games,
         'coinflip_games': coinflip_games,
@@ -0,0 +1,45 @@
+"""Keyset pagination over querysets ordered newest first.
+
+Pages are addressed by the ``(created_at, id)`` of their last row rather than
+an OFFSET, so fetching page N costs the same as fetching page 1, rows
+inserted meanwhile never shift a page boundary, and no COUNT is needed.
+Querysets must be ordered by ``('-created_at', '-id')``.
+"""
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(created_at, pk):
+    return f'{created_at.isoformat()}_{pk}'
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` from a cursor string, or ``None`` if invalid."""
+    moment, _, pk = (cursor or '').rpartition('_')
+    created_at = parse_datetime(moment) if moment else None
+    if created_at is None or not pk.isdigit():
+        return None
+    return created_at, int(pk)
+
+
+def after_cursor(queryset, position):
+    """Restrict ``queryset`` (newest first) to rows strictly after ``position``."""
+    created_at, pk = position
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+
+def keyset_page(queryset, cursor, size):
+    """Return ``(rows, next_cursor)`` for the page after ``cursor``.
+
+    ``next_cursor`` is ``None`` on the last page. One extra row is fetched to
+    tell whether another page exists.
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        queryset = after_cursor(queryset, position)
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].pk)
@@ -1,25 +1,36 @@
 import asyncio
 import json
 import logging
+from datetime import datetime, timedelta
 
 from channels.db import database_sync_to_async
 from django.utils import timezone
 
 from apps.economy.services import InsufficientFunds, poker_buy_in, poker_payout
 from apps.games.mixins import BaseGameConsumer
-from apps.notifications.services import send_notification
+from apps.notifications.activity import invalidate_activity
+from apps.notifications.services import send_notifications_bulk
 
+from .equity import equities
 from .models import PokerHand, PokerPlayer, PokerTable
 from .services import (
+    action_prompt,
     advance_round,
     calculate_payouts,
     check_table_over,
-    get_valid_actions,
+    claim_action_deadline,
+    current_hand_id,
+    is_players_turn,
+    live_players,
+    overlay_live_state,
     process_action,
     process_rebuy,
     resolve_hand,
+    runout_cards,
+    set_action_deadline,
     start_hand,
 )
+from .timers import action_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +42,7 @@ class PokerConsumer(BaseGameConsumer):
         self.table_id = self.scope['url_route']['kwargs']['table_id']
         self.room_group_name = f'poker_{self.table_id}'
         self.user = self.scope['user']
-        self._action_timer = None
+        self._timeout_task = None
 
         self._showdown_ready = set()       # user_ids who are ready
         self._showdown_expected = set()    # user_ids who must confirm
@@ -65,10 +76,10 @@ class PokerConsumer(BaseGameConsumer):
         # Auto-deal first hand if the table is active but no hand has been dealt
         await self.maybe_deal_first_hand()
 
-    async def disconnect(self, close_code):
-        if self._action_timer and not self._action_timer.done():
-            self._action_timer.cancel()
+        action_scheduler.ensure_running()
+        await self.rearm_expired_deadline()
 
+    async def disconnect(self, close_code):
         if hasattr(self, 'user') and not self.user.is_anonymous:
             await self.set_online(False)
 
@@ -156,27 +167,22 @@ class PokerConsumer(BaseGameConsumer):
         except (ValueError, TypeError):
             amount = 0
 
-        player = await self.get_player()
-        if not player:
-            return
-
-        hand = await self.get_current_hand()
-        if not hand:
+        hand_id = await database_sync_to_async(current_hand_id)(int(self.table_id))
+        if not hand_id:
             return
 
         hand, action_taken, advance_info = await database_sync_to_async(
             process_action
-        )(hand.pk, self.user.pk, poker_action, amount)
+        )(hand_id, self.user.pk, poker_action, amount)
 
         if not action_taken:
             return
+        # The deadline is met; the next prompt schedules its own.
+        action_scheduler.cancel(hand.pk)
 
-        # Cancel any existing timer
-        if self._action_timer and not self._action_timer.done():
-            self._action_timer.cancel()
-
-        # Re-fetch player to get updated chip count after process_action
-        player = await self.get_player()
+        # Chip count after the action, straight from the live hand
+        stacks = await database_sync_to_async(live_players)(hand.pk)
+        chips, _ = stacks.get(self.user.pk, (0, None))
 
         # Broadcast the action
         await self.channel_layer.group_send(self.room_group_name, {
@@ -185,7 +191,7 @@ class PokerConsumer(BaseGameConsumer):
             'poker_action': action_taken,
             'amount': amount,
             'pot': hand.pot,
-            'chips': player.chips if player else 0,
+            'chips': chips,
         })
 
         if advance_info == 'winner':
@@ -217,6 +223,10 @@ class PokerConsumer(BaseGameConsumer):
 
     async def deal_remaining_and_showdown(self, hand):
         """Deal remaining community cards and resolve the hand."""
+        # No more betting: show everyone's odds as the board runs out
+        if hand.status not in ('showdown', 'completed'):
+            await self.send_equities(hand)
+
         # Deal remaining community cards if needed
         while hand.status not in ('showdown', 'completed'):
             hand, new_cards = await database_sync_to_async(advance_round)(hand.pk)
@@ -227,6 +237,7 @@ class PokerConsumer(BaseGameConsumer):
                     'round': hand.status,
                     'pot': hand.pot,
                 })
+                await self.send_equities(hand)
                 await asyncio.sleep(0.5)
 
         hand, results = await database_sync_to_async(resolve_hand)(hand.pk)
@@ -297,31 +308,24 @@ class PokerConsumer(BaseGameConsumer):
         })
 
     def _finish_table(self, table_id):
-        PokerTable.objects.filter(pk=table_id, status='active').update(
+        updated = PokerTable.objects.filter(pk=table_id, status='active').update(
             status='completed', ended_at=timezone.now(),
         )
+        if updated:
+            invalidate_activity(*PokerPlayer.objects.filter(table_id=table_id).values_list('user_id', flat=True))
 
     def _create_game_notifications(self, table_id, payouts):
-        table = PokerTable.objects.get(pk=table_id)
+        invested = dict(
+            PokerPlayer.objects.filter(table_id=table_id).values_list('user_id', 'coins_invested')
+        )
+        recipients = []
         for user, amount in payouts:
-            player = PokerPlayer.objects.get(table=table, user=user)
-            net = amount - player.coins_invested
+            net = amount - invested[user.pk]
             if net > 0:
-                send_notification(
-                    user,
-                    'game_result',
-                    'Poker Win!',
-                    f'You won {net} LC profit at poker table #{table.pk}!',
-                    link='/poker/',
-                )
+                recipients.append((user, 'Poker Win!', f'You won {net} LC profit at poker table #{table_id}!'))
             elif net < 0:
-                send_notification(
-                    user,
-                    'game_result',
-                    'Poker Result',
-                    f'You lost {abs(net)} LC at poker table #{table.pk}.',
-                    link='/poker/',
-                )
+                recipients.append((user, 'Poker Result', f'You lost {abs(net)} LC at poker table #{table_id}.'))
+        send_notifications_bulk(recipients, 'game_result', link='/poker/')
 
     async def handle_vote_end(self, data):
         vote = data.get('vote', True)
@@ -435,90 +439,96 @@ class PokerConsumer(BaseGameConsumer):
 
     async def send_action_required(self, hand):
         """Send action_required to the group with whose turn + valid actions."""
-        hand = await database_sync_to_async(
-            lambda: PokerHand.objects.select_related('table').get(pk=hand.pk)
-        )()
-        player = await database_sync_to_async(
-            lambda: PokerPlayer.objects.select_related('user').get(
-                table=hand.table, seat=hand.current_seat
-            )
-        )()
-        valid = await database_sync_to_async(get_valid_actions)(hand, player)
+        prompt = await database_sync_to_async(action_prompt)(hand.pk)
+        if prompt is None:
+            return
 
-        table = hand.table
-        timeout = table.time_per_action if table.time_per_action > 0 else 0
+        timeout = prompt['timeout'] if prompt['timeout'] > 0 else 0
+        if timeout:
+            deadline = timezone.now() + timedelta(seconds=timeout)
+            await database_sync_to_async(set_action_deadline)(hand.pk, deadline)
+            action_scheduler.schedule(int(self.table_id), hand.pk, prompt['user_id'], deadline)
 
         await self.channel_layer.group_send(self.room_group_name, {
             'type': 'action_required',
-            'seat': hand.current_seat,
-            'username': player.user.username,
-            'valid_actions': valid,
-            'current_bet': hand.current_bet,
-            'pot': hand.pot,
+            'seat': prompt['seat'],
+            'username': prompt['username'],
+            'valid_actions': prompt['valid_actions'],
+            'current_bet': prompt['current_bet'],
+            'pot': prompt['pot'],
             'timeout': timeout,
-            'hand_id': hand.pk,
-            'user_id': player.user_id,
-            # Designate this consumer as the timer owner
-            '_timer_owner': self.channel_name,
         })
 
-    async def action_timeout(self, hand_id, user_id, timeout):
-        """Auto-fold if player doesn't act in time."""
-        try:
-            await asyncio.sleep(timeout)
+    async def rearm_expired_deadline(self):
+        """Hand an overdue deadline to the scheduler again.
 
-            # Guard: verify the hand still expects this player's action
-            hand = await database_sync_to_async(
-                lambda: PokerHand.objects.select_related('table').get(pk=hand_id)
-            )()
-            if hand.status in ('completed', 'showdown'):
-                return
-            player = await database_sync_to_async(
-                lambda: PokerPlayer.objects.get(table=hand.table, user_id=user_id)
-            )()
-            if hand.current_seat != player.seat:
-                return
+        Its event was dropped if nobody was connected when it fired.
+        """
+        hand = await self.get_current_hand()
+        if hand and hand.action_deadline and hand.action_deadline <= timezone.now():
+            action_scheduler.schedule(hand.table_id, hand.pk, None, hand.action_deadline)
 
-            hand, action_taken, advance_info = await database_sync_to_async(
-                process_action
-            )(hand_id, user_id, 'fold')
+    async def timeout_fold(self, hand_id, user_id):
+        """Auto-fold a player who didn't act in time."""
+        hand, action_taken, advance_info = await database_sync_to_async(
+            process_action
+        )(hand_id, user_id, 'fold')
+
+        if not action_taken:
+            return
+        action_scheduler.cancel(hand.pk)
 
-            if action_taken:
-                username = await self.get_username(user_id)
-                fold_player = await database_sync_to_async(
-                    lambda: PokerPlayer.objects.get(table_id=self.table_id, user_id=user_id)
-                )()
+        username = await self.get_username(user_id)
+        stacks = await database_sync_to_async(live_players)(hand.pk)
+        chips, _ = stacks.get(user_id, (0, None))
+        await self.channel_layer.group_send(self.room_group_name, {
+            'type': 'player_acted',
+            'username': username,
+            'poker_action': 'fold',
+            'amount': 0,
+            'pot': hand.pot,
+            'chips': chips,
+        })
+
+        if advance_info == 'winner':
+            hand, results = await database_sync_to_async(resolve_hand)(hand.pk)
+            await self.broadcast_hand_result(hand, results, showdown=False)
+            await self.check_and_continue(hand)
+        elif advance_info == 'showdown':
+            await self.deal_remaining_and_showdown(hand)
+        elif advance_info == 'advance_round':
+            hand, new_cards = await database_sync_to_async(advance_round)(hand.pk)
+            if hand.status == 'showdown' or new_cards is None:
+                await self.deal_remaining_and_showdown(hand)
+            else:
                 await self.channel_layer.group_send(self.room_group_name, {
-                    'type': 'player_acted',
-                    'username': username,
-                    'poker_action': 'fold',
-                    'amount': 0,
+                    'type': 'community_cards',
+                    'cards': new_cards,
+                    'round': hand.status,
                     'pot': hand.pot,
-                    'chips': fold_player.chips,
                 })
+                await self.send_action_required(hand)
+        else:
+            await self.send_action_required(hand)
 
-                if advance_info == 'winner':
-                    hand, results = await database_sync_to_async(resolve_hand)(hand.pk)
-                    await self.broadcast_hand_result(hand, results, showdown=False)
-                    await self.check_and_continue(hand)
-                elif advance_info == 'showdown':
-                    await self.deal_remaining_and_showdown(hand)
-                elif advance_info == 'advance_round':
-                    hand, new_cards = await database_sync_to_async(advance_round)(hand.pk)
-                    if hand.status == 'showdown' or new_cards is None:
-                        await self.deal_remaining_and_showdown(hand)
-                    else:
-                        await self.channel_layer.group_send(self.room_group_name, {
-                            'type': 'community_cards',
-                            'cards': new_cards,
-                            'round': hand.status,
-                            'pot': hand.pot,
-                        })
-                        await self.send_action_required(hand)
-                else:
-                    await self.send_action_required(hand)
-        except asyncio.CancelledError:
-            pass
+    async def send_equities(self, hand):
+        """Broadcast win percentages during an all-in runout.
+
+        The calculation runs in a worker thread so a Monte Carlo preflop
+        estimate never stalls the event loop.
+        """
+        usernames, holes, board = await database_sync_to_async(runout_cards)(hand.pk)
+        if len(usernames) < 2:
+            return
+        shares = await asyncio.to_thread(equities, holes, board)
+        await self.channel_layer.group_send(self.room_group_name, {
+            'type': 'equity_update',
+            'round': hand.status,
+            'equities': [
+                {'username': username, 'equity': round(share * 100, 1)}
+                for username, share in zip(usernames, shares)
+            ],
+        })
 
     async def broadcast_hand_result(self, hand, results, showdown=True):
         """Broadcast hand results."""
@@ -555,9 +565,7 @@ class PokerConsumer(BaseGameConsumer):
         hand = await self.get_current_hand()
         player = await self.get_player()
 
-        my_cards = ''
-        if hand and hand.player_hands:
-            my_cards = hand.player_hands.get(str(self.user.pk), '')
+        my_cards = hand.hole_cards(self.user.pk) if hand else ''
 
         state = {
             'type': 'table_state',
@@ -609,15 +617,8 @@ class PokerConsumer(BaseGameConsumer):
 
     async def hand_started(self, event):
         """Send hand_started to client, with their private hole cards."""
-        # New hand - cancel any lingering timer from the previous hand
-        if self._action_timer and not self._action_timer.done():
-            self._action_timer.cancel()
-            self._action_timer = None
-
         hand = await self.get_current_hand()
-        my_cards = ''
-        if hand and hand.player_hands:
-            my_cards = hand.player_hands.get(str(self.user.pk), '')
+        my_cards = hand.hole_cards(self.user.pk) if hand else ''
 
         await self.send(text_data=json.dumps({
             'type': 'hand_started',
@@ -631,12 +632,6 @@ class PokerConsumer(BaseGameConsumer):
         }))
 
     async def action_required(self, event):
-        # Cancel any stale timer on THIS consumer - a new turn has started,
-        # so any timer we were running for the previous turn is obsolete.
-        if self._action_timer and not self._action_timer.done():
-            self._action_timer.cancel()
-            self._action_timer = None
-
         await self.send(text_data=json.dumps({
             'type': 'action_required',
             'seat': event['seat'],
@@ -647,12 +642,24 @@ class PokerConsumer(BaseGameConsumer):
             'timeout': event['timeout'],
         }))
 
-        # Only the designated consumer starts the server-side timer
-        timeout = event.get('timeout', 0)
-        if timeout > 0 and event.get('_timer_owner') == self.channel_name:
-            self._action_timer = asyncio.ensure_future(
-                self.action_timeout(event['hand_id'], event['user_id'], timeout)
-            )
+    async def action_deadline(self, event):
+        """A deadline from the scheduler expired; one consumer handles it."""
+        hand_id, user_id = event['hand_id'], event['user_id']
+        deadline = datetime.fromisoformat(event['deadline'])
+        if not await database_sync_to_async(claim_action_deadline)(hand_id, deadline):
+            return
+
+        if user_id is None:
+            # Re-armed after a restart or while nobody was connected: the
+            # hand resumes at the start of its street, so prompt afresh.
+            if await database_sync_to_async(current_hand_id)(int(self.table_id)) == hand_id:
+                hand = await self.get_current_hand()
+                if hand.status != 'completed':
+                    await self.send_action_required(hand)
+        elif await database_sync_to_async(is_players_turn)(hand_id, user_id):
+            # Run the fold (and the next hand it may deal) outside this
+            # handler so the consumer keeps relaying group messages.
+            self._timeout_task = asyncio.ensure_future(self.timeout_fold(hand_id, user_id))
 
     async def player_acted(self, event):
         await self.send(text_data=json.dumps({
@@ -691,6 +698,13 @@ class PokerConsumer(BaseGameConsumer):
             'pot': event['pot'],
         }))
 
+    async def equity_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'equity_update',
+            'round': event['round'],
+            'equities': event['equities'],
+        }))
+
     async def pot_update(self, event):
         await self.send(text_data=json.dumps({
             'type': 'pot_update',
@@ -791,21 +805,23 @@ class PokerConsumer(BaseGameConsumer):
 
     @database_sync_to_async
     def get_all_players(self):
-        return list(
+        players = list(
             PokerPlayer.objects.filter(table_id=self.table_id)
             .exclude(status='invited')
             .select_related('user', 'user__profile')
             .order_by('seat')
         )
+        overlay_live_state(int(self.table_id), players=players)
+        return players
 
     @database_sync_to_async
     def get_current_hand(self):
-        try:
-            return PokerHand.objects.filter(
-                table_id=self.table_id
-            ).select_related('table').order_by('-hand_number').first()
-        except PokerHand.DoesNotExist:
-            return None
+        hand = PokerHand.objects.filter(
+            table_id=self.table_id
+        ).select_related('table').order_by('-hand_number').first()
+        if hand is not None:
+            overlay_live_state(hand.table_id, hand=hand)
+        return hand
 
     @database_sync_to_async
     def set_online(self, online):
@@ -0,0 +1,301 @@
+"""Pure-Python state machine for one live poker hand.
+
+``HandState`` holds a hand in flat per-seat arrays and applies betting actions
+without touching the database, so a move costs a few list operations instead
+of row locks and JSON round trips. ``apps.poker.services`` keeps one state per
+live hand in the Daphne process and writes it back (together with the actions
+taken since the last write) at street boundaries and when the hand ends.
+
+Cards are ints ``0..51`` (``rank * 4 + suit`` over ``RANKS``/``SUITS``), one
+byte each in ``PokerHand.deck``; the lookup tables below convert them to
+two-character strings for display and to treys ints for evaluation.
+"""
+
+from array import array
+from functools import lru_cache
+
+from treys import Card
+
+RANKS = '23456789TJQKA'
+SUITS = 'shdc'
+
+CARD_STRS = tuple(r + s for r in RANKS for s in SUITS)
+CARD_CODES = {s: i for i, s in enumerate(CARD_STRS)}
+TREYS_CARDS = tuple(Card.new(s) for s in CARD_STRS)
+
+STREETS = ('preflop', 'flop', 'turn', 'river', 'showdown', 'completed')
+PREFLOP, FLOP, TURN, RIVER, SHOWDOWN, COMPLETED = range(len(STREETS))
+STREET_CODES = {name: i for i, name in enumerate(STREETS)}
+_STREET_CARDS = {PREFLOP: 3, FLOP: 1, TURN: 1}
+
+# Per-player status codes, and the PokerPlayer.status each maps to.
+IN_HAND, FOLDED, ALL_IN = 0, 1, 2
+PLAYER_STATUSES = ('active', 'folded', 'all_in')
+PLAYER_STATUS_CODES = {name: i for i, name in enumerate(PLAYER_STATUSES)}
+
+ACTIONS = ('fold', 'check', 'call', 'bet', 'raise', 'all_in', 'post_blind')
+ACTION_CODES = {name: i for i, name in enumerate(ACTIONS)}
+POST_BLIND = ACTION_CODES['post_blind']
+
+
+def encode_cards(csv_str):
+    """Parse a comma-separated card string into card codes."""
+    if not csv_str:
+        return []
+    return [CARD_CODES[c.strip()] for c in csv_str.split(',') if c.strip()]
+
+
+@lru_cache(maxsize=4096)
+def _decode(codes):
+    return ','.join(CARD_STRS[c] for c in codes)
+
+
+def decode_cards(codes):
+    """Convert card codes to a comma-separated card string (cached)."""
+    return _decode(bytes(codes))
+
+
+class HandState:
+    """Betting state of one hand, indexed by position in ``seats``.
+
+    ``seats`` lists the players dealt in, in ascending seat order; every other
+    per-player array uses the same index. ``deck`` is the whole shuffled deck
+    in deal order: two hole cards per player, then the board. ``deck_pos``
+    points at the next card to deal, so dealing never copies the deck. ``log``
+    collects ``(index, action_code, amount)`` entries, of which the first
+    ``log_saved`` are already persisted.
+    """
+
+    __slots__ = (
+        'hand_id', 'street', 'dealer_seat', 'big_blind',
+        'seats', 'user_ids', 'player_ids', 'names',
+        'stacks', 'bets', 'committed', 'status', 'acted',
+        'deck', 'deck_pos',
+        'pot', 'current', 'current_bet', 'last_raise',
+        'log', 'log_saved',
+    )
+
+    def __init__(self, hand_id, dealer_seat, big_blind, players, deck, deck_pos=None,
+                 street=PREFLOP):
+        """``players`` is a seat-ordered list of
+        ``(seat, user_id, player_id, name, stack)`` tuples. ``deck_pos``
+        defaults to just after the hole cards."""
+        n = len(players)
+        self.hand_id = hand_id
+        self.street = street
+        self.dealer_seat = dealer_seat
+        self.big_blind = big_blind
+        self.seats = array('H', (p[0] for p in players))
+        self.user_ids = tuple(p[1] for p in players)
+        self.player_ids = tuple(p[2] for p in players)
+        self.names = tuple(p[3] for p in players)
+        self.stacks = array('q', (p[4] for p in players))
+        self.bets = array('q', bytes(8 * n))
+        self.committed = array('q', bytes(8 * n))
+        self.status = bytearray(n)
+        self.acted = bytearray(n)
+        self.deck = bytes(deck)
+        self.deck_pos = 2 * n if deck_pos is None else deck_pos
+        self.pot = 0
+        self.current = -1
+        self.current_bet = 0
+        self.last_raise = big_blind
+        self.log = []
+        self.log_saved = 0
+
+    # -- lookups ----------------------------------------------------------
+
+    def index_of_user(self, user_id):
+        try:
+            return self.user_ids.index(user_id)
+        except ValueError:
+            return -1
+
+    def index_of_seat(self, seat):
+        for i, s in enumerate(self.seats):
+            if s == seat:
+                return i
+        return -1
+
+    @property
+    def current_seat(self):
+        return self.seats[self.current] if self.current >= 0 else 0
+
+    def hole_cards(self, index):
+        return self.deck[2 * index:2 * index + 2]
+
+    @property
+    def board(self):
+        return self.deck[2 * len(self.seats):self.deck_pos]
+
+    def in_hand(self):
+        return [i for i, s in enumerate(self.status) if s != FOLDED]
+
+    def _next_index(self, candidates, after_seat):
+        """First candidate clockwise after ``after_seat`` (wrapping around)."""
+        if not candidates:
+            return -1
+        for i in candidates:
+            if self.seats[i] > after_seat:
+                return i
+        return candidates[0]
+
+    # -- dealing ----------------------------------------------------------
+
+    def deal(self, count):
+        cards = self.deck[self.deck_pos:self.deck_pos + count]
+        self.deck_pos += count
+        return cards
+
+    def post_blind(self, index, amount):
+        amount = min(amount, self.stacks[index])
+        self._commit(index, amount)
+        self.log.append((index, POST_BLIND, amount))
+        return amount
+
+    def _commit(self, index, amount):
+        self.stacks[index] -= amount
+        self.bets[index] += amount
+        self.committed[index] += amount
+        self.pot += amount
+        if self.stacks[index] == 0:
+            self.status[index] = ALL_IN
+
+    # -- betting ----------------------------------------------------------
+
+    def valid_actions(self, index):
+        """Return the actions open to the player at ``index`` (see services)."""
+        if self.street == COMPLETED or index < 0:
+            return []
+        if self.status[index] != IN_HAND or index != self.current:
+            return []
+
+        chips = self.stacks[index]
+        my_bet = self.bets[index]
+        to_call = self.current_bet - my_bet
+        actions = [{'action': 'fold'}]
+
+        if to_call <= 0:
+            actions.append({'action': 'check'})
+            if chips > 0:
+                min_bet = self.last_raise or self.big_blind
+                if chips <= min_bet:
+                    actions.append({'action': 'all_in', 'amount': chips})
+                else:
+                    actions.append({'action': 'bet', 'min': min_bet, 'max': chips})
+        elif to_call >= chips:
+            actions.append({'action': 'all_in', 'amount': chips})
+        else:
+            actions.append({'action': 'call', 'amount': to_call})
+            min_raise = self.current_bet + self.last_raise
+            if min_raise - my_bet >= chips:
+                actions.append({'action': 'all_in', 'amount': chips})
+            else:
+                actions.append({'action': 'raise', 'min': min_raise, 'max': my_bet + chips})
+        return actions
+
+    def apply(self, index, action, amount=0):
+        """Apply ``action`` for the player at ``index``.
+
+        Returns ``(action, advance_info)`` like ``services.process_action``,
+        or ``(None, None)`` when the action is not allowed right now.
+        """
+        if action not in {a['action'] for a in self.valid_actions(index)}:
+            return None, None
+
+        my_bet = self.bets[index]
+        chips = self.stacks[index]
+        actual = 0
+
+        if action == 'fold':
+            self.status[index] = FOLDED
+        elif action == 'call':
+            actual = min(self.current_bet - my_bet, chips)
+            self._commit(index, actual)
+        elif action == 'bet':
+            actual = min(max(amount, self.last_raise or self.big_blind), chips)
+            self._commit(index, actual)
+            self.current_bet = my_bet + actual
+            self.last_raise = actual
+        elif action == 'raise':
+            raise_to = max(amount, self.current_bet + self.last_raise)
+            actual = min(raise_to - my_bet, chips)
+            self._commit(index, actual)
+            self.last_raise = my_bet + actual - self.current_bet
+            self.current_bet = my_bet + actual
+        elif action == 'all_in':
+            actual = chips
+            self._commit(index, actual)
+            new_total = my_bet + actual
+            if new_total > self.current_bet:
+                self.last_raise = new_total - self.current_bet
+                self.current_bet = new_total
+
+        self.acted[index] = 1
+        self.log.append((index, ACTION_CODES[action], actual))
+
+        in_hand = self.in_hand()
+        if len(in_hand) == 1:
+            return action, 'winner'
+
+        can_act = [i for i in in_hand if self.status[i] == IN_HAND]
+        if not can_act:
+            return action, 'showdown'
+
+        # The round is over once the next player to act has already acted
+        # and matched the bet; a raise leaves earlier callers short of it.
+        nxt = self._next_index(can_act, self.seats[index])
+        if self.acted[nxt] and self.bets[nxt] >= self.current_bet:
+            return action, 'advance_round'
+
+        self.current = nxt
+        return action, None
+
+    def advance(self):
+        """Deal the next street and reset betting. Returns the new cards.
+
+        Returns ``None`` (and moves to showdown) after the river, and for a
+        hand that is already at showdown or completed.
+        """
+        if self.street == RIVER:
+            self.street = SHOWDOWN
+            return None
+        if self.street not in _STREET_CARDS:
+            return None
+
+        new_cards = self.deal(_STREET_CARDS[self.street])
+        self.street += 1
+        self.current_bet = 0
+        self.last_raise = self.big_blind
+        for i in range(len(self.seats)):
+            self.bets[i] = 0
+            self.acted[i] = 0
+
+        acting = [i for i in self.in_hand() if self.status[i] == IN_HAND]
+        if acting:
+            self.current = self._next_index(acting, self.dealer_seat)
+        return new_cards
+
+    def complete_board(self):
+        """Deal whatever community cards are still missing."""
+        missing = 5 - len(self.board)
+        if missing > 0:
+            self.deal(missing)
+
+    # -- persistence helpers ----------------------------------------------
+
+    def round_bets(self):
+        """The ``PokerHand.round_bets`` dict for the current street."""
+        bets = {
+            str(self.user_ids[i]): self.bets[i]
+            for i in range(len(self.seats))
+            if self.bets[i] or self.acted[i]
+        }
+        bets['_acted'] = [str(self.user_ids[i]) for i in range(len(self.seats)) if self.acted[i]]
+        return bets
+
+    def unsaved_log(self):
+        return self.log[self.log_saved:]
+
+    def mark_saved(self):
+        self.log_saved = len(self.log)
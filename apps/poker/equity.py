@@ -0,0 +1,89 @@
+"""Win probabilities for the players still in a hand.
+
+``equities`` takes every contender's hole cards at once and returns each
+one's share of the pot in expectation (ties split). With one card or less to
+come every runout is enumerated; earlier streets are sampled. Hands are
+scored with the table evaluator, so a trial costs one lookup per player.
+
+Equity does not change when suits are relabelled or when the board or a
+player's two cards are reordered. Results are cached under the smallest key
+over the 24 suit permutations, so e.g. AhKh vs QdQc and AsKs vs QhQd
+share one entry.
+"""
+
+import random
+from itertools import combinations, permutations
+
+from django.core.cache import cache
+
+from .handeval import evaluator
+
+MONTE_CARLO_TRIALS = 3000
+CACHE_TIMEOUT = 3600
+
+_SUIT_PERMUTATIONS = tuple(permutations(range(4)))
+
+
+def canonical_key(holes, board=(), dead=()):
+    """Cache key shared by every suit relabelling of the same situation."""
+    best = None
+    for perm in _SUIT_PERMUTATIONS:
+        def relabel(cards):
+            return tuple(sorted((c & ~3) | perm[c & 3] for c in cards))
+
+        key = (tuple(relabel(hole) for hole in holes), relabel(board), relabel(dead))
+        if best is None or key < best:
+            best = key
+    holes_key, board_key, dead_key = best
+    parts = ['.'.join(map(str, hole)) for hole in holes_key]
+    return 'poker_equity:{}:{}:{}'.format(
+        '-'.join(parts), '.'.join(map(str, board_key)), '.'.join(map(str, dead_key)),
+    )
+
+
+def _add_shares(totals, holes, board):
+    scores = [evaluator.evaluate_codes(hole + board) for hole in holes]
+    best = min(scores)
+    winners = [i for i, score in enumerate(scores) if score == best]
+    share = 1 / len(winners)
+    for i in winners:
+        totals[i] += share
+
+
+def compute_equities(holes, board=(), dead=(), trials=MONTE_CARLO_TRIALS, rng=None):
+    """Uncached equities; see ``equities``."""
+    holes = [list(hole) for hole in holes]
+    board = list(board)
+    used = set(board).union(dead, *holes)
+    remaining = [c for c in range(52) if c not in used]
+    to_come = 5 - len(board)
+    totals = [0.0] * len(holes)
+
+    if to_come <= 1:
+        runouts = 0
+        for cards in combinations(remaining, to_come):
+            _add_shares(totals, holes, board + list(cards))
+            runouts += 1
+    else:
+        rng = rng or random.Random()
+        runouts = trials
+        for _ in range(trials):
+            _add_shares(totals, holes, board + rng.sample(remaining, to_come))
+
+    return [total / runouts for total in totals]
+
+
+def equities(holes, board=(), dead=(), trials=MONTE_CARLO_TRIALS, rng=None):
+    """Return each player's pot share in expectation, in the order of ``holes``.
+
+    ``holes`` holds two engine card codes per player, ``board`` the community
+    cards dealt so far and ``dead`` any other cards known to be out of the
+    deck. Turn and river are exact; preflop and flop use ``trials`` random
+    runouts. Results are cached per canonical situation.
+    """
+    key = canonical_key(holes, board, dead)
+    result = cache.get(key)
+    if result is None:
+        result = compute_equities(holes, board, dead, trials, rng)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
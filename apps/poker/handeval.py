@@ -0,0 +1,168 @@
+"""Table-driven hand evaluation with the same scores as ``treys``.
+
+treys scores a 7-card hand by evaluating all 21 five-card subsets. This module
+instead looks the hand up in precomputed tables, built once from treys by
+``manage.py build_hand_table`` and memory-mapped from ``POKER_HAND_TABLE``:
+
+- one table per hand size (5, 6 or 7 cards) holding the best non-flush score
+  for every multiset of ranks, indexed by its combinatorial rank;
+- one table of flush (and straight flush) scores indexed by the 13-bit rank
+  mask of the suited cards.
+
+A hand with five or more cards of one suit takes the better of its two
+lookups, otherwise only the rank table is read. Scores are identical to
+``treys.Evaluator.evaluate`` (lower is better), and ``HandEvaluator`` keeps
+its interface, so ``get_rank_class``/``class_to_string`` work unchanged. When
+the table file is missing it falls back to treys.
+"""
+
+import itertools
+import logging
+import mmap
+import os
+from array import array
+from collections import Counter
+from math import comb
+
+from django.conf import settings
+from treys import Evaluator
+
+from .engine import TREYS_CARDS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LCHR0001'
+HAND_SIZES = (5, 6, 7)
+FLUSH_SLOTS = 1 << 13
+RANK_SLOTS = {n: comb(13 + n - 1, n) for n in HAND_SIZES}
+
+# _CHOOSE[v][k] == comb(v, k) for the combinatorial index of a rank multiset.
+_CHOOSE = tuple(tuple(comb(v, k) for k in range(8)) for v in range(20))
+
+
+def rank_index(ranks):
+    """Index of a sorted rank multiset among those of its size.
+
+    Adding each position to its rank turns the multiset into a strictly
+    increasing sequence, which the combinatorial number system numbers
+    densely from 0 to ``RANK_SLOTS[n] - 1``.
+    """
+    return sum(_CHOOSE[r + i][i + 1] for i, r in enumerate(ranks))
+
+
+def _treys_card(rank, suit):
+    return TREYS_CARDS[rank * 4 + suit]
+
+
+def build_tables():
+    """Compute every table with treys. Returns ``{name: array('H')}``."""
+    evaluator = Evaluator()
+    tables = {'flush': array('H', bytes(2 * FLUSH_SLOTS))}
+
+    for n in (5, 6, 7):
+        for ranks in itertools.combinations(range(13), n):
+            mask = sum(1 << r for r in ranks)
+            cards = [_treys_card(r, 0) for r in ranks]
+            tables['flush'][mask] = evaluator.evaluate(cards[:2], cards[2:])
+
+    for n in HAND_SIZES:
+        table = array('H', bytes(2 * RANK_SLOTS[n]))
+        for ranks in itertools.combinations_with_replacement(range(13), n):
+            if max(Counter(ranks).values()) > 4:
+                continue
+            # Equal ranks sit next to each other, so cycling the suits gives
+            # them distinct suits and never puts five cards in one suit.
+            cards = [_treys_card(r, i % 4) for i, r in enumerate(ranks)]
+            table[rank_index(ranks)] = evaluator.evaluate(cards[:2], cards[2:])
+        tables[n] = table
+    return tables
+
+
+def write_tables(path, tables):
+    """Write ``tables`` to ``path`` atomically, in native byte order."""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        tables['flush'].tofile(f)
+        for n in HAND_SIZES:
+            tables[n].tofile(f)
+    os.replace(tmp, path)
+
+
+def load_tables(path):
+    """Memory-map the tables at ``path``. Returns ``{name: memoryview}``."""
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    expected = len(MAGIC) + 2 * (FLUSH_SLOTS + sum(RANK_SLOTS.values()))
+    if data[:len(MAGIC)] != MAGIC or len(data) != expected:
+        data.close()
+        raise ValueError(f'{path} is not a hand rank table')
+
+    view = memoryview(data)[len(MAGIC):].cast('H')
+    tables = {'flush': view[:FLUSH_SLOTS]}
+    offset = FLUSH_SLOTS
+    for n in HAND_SIZES:
+        tables[n] = view[offset:offset + RANK_SLOTS[n]]
+        offset += RANK_SLOTS[n]
+    return tables
+
+
+class HandEvaluator(Evaluator):
+    """``treys.Evaluator`` answering from the precomputed tables.
+
+    ``evaluate`` takes treys card ints like the original; ``evaluate_codes``
+    takes the ``rank * 4 + suit`` codes of ``apps.poker.engine``.
+    """
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path
+        self._tables = None
+
+    @property
+    def tables(self):
+        """The memory-mapped tables, or ``None`` when no table file exists."""
+        if self._tables is None:
+            path = self.path or settings.POKER_HAND_TABLE
+            try:
+                self._tables = load_tables(path)
+            except (OSError, ValueError) as e:
+                logger.warning('Hand rank table unavailable (%s); using treys', e)
+                self._tables = False
+        return self._tables or None
+
+    def _lookup(self, ranks, suits):
+        tables = self.tables
+        score = tables[len(ranks)][rank_index(sorted(ranks))]
+        for suit in range(4):
+            if suits.count(suit) >= 5:
+                mask = 0
+                for r, s in zip(ranks, suits):
+                    if s == suit:
+                        mask |= 1 << r
+                score = min(score, tables['flush'][mask])
+                break
+        return score
+
+    def evaluate(self, hand, board):
+        if self.tables is None:
+            return super().evaluate(hand, board)
+        cards = hand + board
+        ranks = [(c >> 8) & 0xF for c in cards]
+        # treys suit bits are 1, 2, 4, 8; this maps them to 0..3.
+        suits = [((c >> 12) & 0xF).bit_length() - 1 for c in cards]
+        return self._lookup(ranks, suits)
+
+    def evaluate_codes(self, codes):
+        """Score 5-7 engine card codes."""
+        if self.tables is None:
+            treys_cards = [TREYS_CARDS[c] for c in codes]
+            return super().evaluate(treys_cards[:2], treys_cards[2:])
+        return self._lookup([c >> 2 for c in codes], [c & 3 for c in codes])
+
+    def describe(self, score):
+        """Hand class name for ``score``, e.g. ``'Full House'``."""
+        return self.class_to_string(self.get_rank_class(score))
+
+
+evaluator = HandEvaluator()
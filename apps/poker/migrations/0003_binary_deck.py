@@ -0,0 +1,98 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+# Frozen copy of the card encoding in apps.poker.engine.
+CARD_STRS = tuple(r + s for r in '23456789TJQKA' for s in 'shdc')
+CARD_CODES = {card: i for i, card in enumerate(CARD_STRS)}
+
+
+def _codes(csv):
+    return [CARD_CODES[c] for c in (csv or '').split(',') if c]
+
+
+def _csv(codes):
+    return ','.join(CARD_STRS[c] for c in codes)
+
+
+def encode_decks(apps, schema_editor):
+    """Move CSV hole cards and the ``_deck`` tail into the binary deck.
+
+    The old tail was dealt from its end, so it is reversed to follow the
+    board in deal order.
+    """
+    PokerHand = apps.get_model('poker', 'PokerHand')
+    PokerPlayer = apps.get_model('poker', 'PokerPlayer')
+
+    seats = {
+        (table_id, user_id): seat
+        for table_id, user_id, seat in PokerPlayer.objects.values_list('table_id', 'user_id', 'seat')
+    }
+    batch = []
+    for hand in PokerHand.objects.exclude(player_hands={}).iterator(chunk_size=500):
+        cards = dict(hand.player_hands)
+        tail = _codes(cards.pop('_deck', ''))
+        dealt = sorted(
+            (int(uid) for uid in cards),
+            key=lambda uid: seats.get((hand.table_id, uid), 0),
+        )
+        deck = [c for uid in dealt for c in _codes(cards[str(uid)])]
+        deck += _codes(hand.community_cards)
+        hand.deck_pos = len(deck)
+        hand.deck = bytes(deck + tail[::-1])
+        hand.dealt_user_ids = dealt
+        batch.append(hand)
+        if len(batch) >= 500:
+            PokerHand.objects.bulk_update(batch, ['deck', 'deck_pos', 'dealt_user_ids'])
+            batch = []
+    if batch:
+        PokerHand.objects.bulk_update(batch, ['deck', 'deck_pos', 'dealt_user_ids'])
+
+
+def decode_decks(apps, schema_editor):
+    PokerHand = apps.get_model('poker', 'PokerHand')
+    batch = []
+    for hand in PokerHand.objects.exclude(dealt_user_ids=[]).iterator(chunk_size=500):
+        deck = bytes(hand.deck)
+        cards = {
+            str(uid): _csv(deck[2 * k:2 * k + 2])
+            for k, uid in enumerate(hand.dealt_user_ids)
+        }
+        cards['_deck'] = _csv(deck[hand.deck_pos:][::-1])
+        hand.player_hands = cards
+        batch.append(hand)
+        if len(batch) >= 500:
+            PokerHand.objects.bulk_update(batch, ['player_hands'])
+            batch = []
+    if batch:
+        PokerHand.objects.bulk_update(batch, ['player_hands'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0002_optimize_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokerhand',
+            name='dealt_user_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='pokerhand',
+            name='deck',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='pokerhand',
+            name='deck_pos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(encode_decks, decode_decks),
+        migrations.RemoveField(
+            model_name='pokerhand',
+            name='player_hands',
+        ),
+    ]
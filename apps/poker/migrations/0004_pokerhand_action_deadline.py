@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0003_binary_deck'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokerhand',
+            name='action_deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='pokerhand',
+            index=models.Index(condition=models.Q(('action_deadline__isnull', False)), fields=['action_deadline'], name='pokerhand_action_deadline'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
 
+from .engine import decode_cards
+
 
 class PokerTable(models.Model):
     STATUS_CHOICES = [
@@ -113,12 +115,19 @@ class PokerHand(models.Model):
     community_cards = models.CharField(max_length=30, blank=True)
     pot = models.PositiveIntegerField(default=0)
     side_pots = models.JSONField(default=list, blank=True)
-    player_hands = models.JSONField(default=dict, blank=True)
+    # Shuffled deck, one byte per card code (see apps.poker.engine): two hole
+    # cards per entry of dealt_user_ids, then the board. deck_pos is the
+    # number of cards dealt so far.
+    deck = models.BinaryField(default=b'', blank=True)
+    deck_pos = models.PositiveSmallIntegerField(default=0)
+    dealt_user_ids = models.JSONField(default=list, blank=True)
     current_seat = models.PositiveSmallIntegerField(default=0)
     current_bet = models.PositiveIntegerField(default=0)
     last_raise = models.PositiveIntegerField(default=0)
     winner_ids = models.JSONField(default=list, blank=True)
     round_bets = models.JSONField(default=dict, blank=True)
+    # When the player to act gets auto-folded; see apps.poker.timers.
+    action_deadline = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -126,10 +135,24 @@ class PokerHand(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['table', 'hand_number'], name='unique_table_hand'),
         ]
+        indexes = [
+            models.Index(
+                fields=['action_deadline'], name='pokerhand_action_deadline',
+                condition=models.Q(action_deadline__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f'Hand #{self.hand_number} at Table #{self.table_id}'
 
+    def hole_cards(self, user_id):
+        """Comma-separated hole cards dealt to ``user_id``, or ``''``."""
+        try:
+            k = self.dealt_user_ids.index(user_id)
+        except ValueError:
+            return ''
+        return decode_cards(self.deck[2 * k:2 * k + 2])
+
 
 class PokerAction(models.Model):
     ACTION_CHOICES = [
@@ -0,0 +1,64 @@
+"""Main and side pot resolution.
+
+Pots are layered by the distinct contribution levels of the players still in
+the hand. Each layer holds what every player (folded ones included) put in
+between the previous level and this one, and only contenders who reached the
+level can win it. Chips a folded player put in above the highest contender
+level go to the top layer.
+"""
+
+
+def build_pots(committed, contenders):
+    """Split contributions into layered pots.
+
+    ``committed`` lists each player's total contribution to the hand;
+    ``contenders`` are the indexes of players who have not folded. Returns
+    ``[(amount, eligible_indexes), ...]`` from the main pot upwards. One pass
+    over the contributions sorted once.
+    """
+    levels = sorted({committed[i] for i in contenders})
+    order = sorted(range(len(committed)), key=committed.__getitem__)
+    remaining = len(order)
+    k = 0
+    prev = 0
+    pots = []
+    for level in levels:
+        amount = 0
+        while k < len(order) and committed[order[k]] < level:
+            amount += committed[order[k]] - prev
+            k += 1
+            remaining -= 1
+        amount += remaining * (level - prev)
+        if amount:
+            pots.append((amount, [i for i in contenders if committed[i] >= level]))
+        prev = level
+
+    dead = sum(c - prev for c in committed if c > prev)
+    if dead:
+        if pots:
+            amount, eligible = pots[-1]
+            pots[-1] = (amount + dead, eligible)
+        else:
+            pots.append((dead, list(contenders)))
+    return pots
+
+
+def award_pots(pots, scores, seats, dealer_seat):
+    """Award each pot to its best eligible hands. Returns per-index winnings.
+
+    ``scores`` maps index to a treys score (lower is better), computed once
+    per contender by the caller. A split pot's odd chips go one at a time to
+    the winners in seat order starting left of the dealer.
+    """
+    winnings = dict.fromkeys(scores, 0)
+
+    def seat_order(i):
+        return (seats[i] <= dealer_seat, seats[i])
+
+    for amount, eligible in pots:
+        best = min(scores[i] for i in eligible)
+        winners = sorted((i for i in eligible if scores[i] == best), key=seat_order)
+        share, odd = divmod(amount, len(winners))
+        for n, i in enumerate(winners):
+            winnings[i] += share + (1 if n < odd else 0)
+    return winnings
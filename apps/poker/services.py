@@ -2,55 +2,32 @@ from __future__ import annotations
 
 import logging
 import secrets
+import threading
 from typing import TYPE_CHECKING
 
 from django.db import transaction
-
-from treys import Card, Evaluator
-
+from django.db.models import Sum
+
+from .engine import (
+    ACTIONS,
+    COMPLETED,
+    FOLDED,
+    PLAYER_STATUSES,
+    PLAYER_STATUS_CODES,
+    STREETS,
+    STREET_CODES,
+    HandState,
+    decode_cards,
+)
+from .handeval import evaluator
 from .models import PokerAction, PokerHand, PokerPlayer, PokerTable
+from .pots import award_pots, build_pots
 
 if TYPE_CHECKING:
     pass
 
 logger = logging.getLogger(__name__)
 
-evaluator = Evaluator()
-
-RANKS = '23456789TJQKA'
-SUITS = 'shdc'
-
-
-def _build_deck():
-    """Return a full 52-card deck as treys Card ints."""
-    cards = []
-    for r in RANKS:
-        for s in SUITS:
-            cards.append(Card.new(r + s))
-    return cards
-
-
-def _card_to_str(card_int):
-    """Convert a treys card int to a two-char string like 'As', 'Kh'."""
-    return Card.int_to_str(card_int)
-
-
-def _str_to_card(s):
-    """Convert a two-char string like 'As' to a treys card int."""
-    return Card.new(s)
-
-
-def _parse_cards(csv_str):
-    """Parse a comma-separated card string into treys card ints."""
-    if not csv_str:
-        return []
-    return [_str_to_card(c.strip()) for c in csv_str.split(',') if c.strip()]
-
-
-def _cards_to_csv(card_ints):
-    """Convert a list of treys card ints to comma-separated string."""
-    return ','.join(_card_to_str(c) for c in card_ints)
-
 
 def _get_active_seats(table, exclude_statuses=None):
     """Return PokerPlayers at the table who are still in play, ordered by seat."""
@@ -58,6 +35,7 @@ def _get_active_seats(table, exclude_statuses=None):
     return list(
         PokerPlayer.objects.filter(table=table)
         .exclude(status__in=exclude)
+        .select_related('user')
         .order_by('seat')
     )
 
@@ -75,40 +53,29 @@ def _next_seat(seats, current_seat, skip_seats=None):
     return seat_numbers[0]
 
 
-def _players_in_hand(hand, table):
-    """Return PokerPlayers who are still active in this hand (not folded/eliminated)."""
-    return list(
-        PokerPlayer.objects.filter(table=table)
-        .exclude(status__in=['folded', 'eliminated', 'spectating', 'left', 'invited'])
-        .order_by('seat')
-    )
-
-
 def start_hand(table_id):
     """Deal a new hand: rotate dealer, post blinds, deal hole cards.
 
+    The blinds are posted on the in-memory ``HandState`` first, so the hand
+    is inserted once in its final preflop position and the players and the
+    blind actions are each written with one statement, however many seats
+    the table has.
+
     Returns (hand, player_cards_map) where player_cards_map is
-    {user_id: [card_int, card_int]}.
+    {user_id: 'As,Kd'}.
     """
     with transaction.atomic():
         table = PokerTable.objects.select_for_update().get(pk=table_id)
-        active_players = _get_active_seats(table)
+        seated = _get_active_seats(table)
 
+        # Players with chips are dealt in (folded/all-in players from the
+        # last hand are active again); players with 0 chips sit out until
+        # they rebuy.
+        active_players = [p for p in seated if p.chips > 0]
         if len(active_players) < 2:
             return None, {}
-
-        # Reset folded players to active for new hand (only those with chips)
-        PokerPlayer.objects.filter(
-            table=table, status__in=['folded', 'all_in'], chips__gt=0,
-        ).update(status='active')
-        active_players = _get_active_seats(table)
-
-        # Players with 0 chips sit out until they rebuy
-        for p in active_players:
-            if p.chips == 0:
-                p.status = 'folded'
-                p.save(update_fields=['status'])
-        active_players = [p for p in active_players if p.chips > 0]
+        for p in seated:
+            p.status = 'active' if p.chips > 0 else 'folded'
 
         # Rotate dealer
         seat_numbers = [p.seat for p in active_players]
@@ -130,65 +97,19 @@ def start_hand(table_id):
             sb_seat = _next_seat(active_players, dealer_seat)
             bb_seat = _next_seat(active_players, sb_seat)
 
-        # Build and shuffle deck
-        deck = _build_deck()
-        rng = secrets.SystemRandom()
-        rng.shuffle(deck)
+        # Shuffle the deck; hole cards are its first two cards per player
+        deck = list(range(52))
+        secrets.SystemRandom().shuffle(deck)
+        deck = bytes(deck)
 
-        # Deal hole cards
-        player_cards = {}
-        for p in active_players:
-            card1 = deck.pop()
-            card2 = deck.pop()
-            player_cards[str(p.user_id)] = _cards_to_csv([card1, card2])
-
-        # Create hand record
-        hand = PokerHand.objects.create(
-            table=table,
-            hand_number=table.hand_number,
-            dealer_seat=dealer_seat,
-            player_hands=player_cards,
-            status='preflop',
-            current_bet=table.big_blind,
-            last_raise=table.big_blind,
+        state = HandState(
+            None, dealer_seat, table.big_blind,
+            [(p.seat, p.user_id, p.pk, p.user.username, p.chips) for p in active_players],
+            deck,
         )
-
-        # Store remaining deck in memory (we'll deal community from it)
-        # Save deck state as CSV in a way we can retrieve later
-        # We store the top of deck in the hand's community_cards prefixed with "deck:"
-        # Actually, let's store the deck as part of player_hands under a special key
-        hand.player_hands['_deck'] = _cards_to_csv(deck)
-        hand.save(update_fields=['player_hands'])
-
-        # Post blinds
-        sb_player = next(p for p in active_players if p.seat == sb_seat)
-        bb_player = next(p for p in active_players if p.seat == bb_seat)
-
-        sb_amount = min(table.small_blind, sb_player.chips)
-        bb_amount = min(table.big_blind, bb_player.chips)
-
-        sb_player.chips -= sb_amount
-        sb_player.save(update_fields=['chips'])
-        if sb_player.chips == 0:
-            sb_player.status = 'all_in'
-            sb_player.save(update_fields=['status'])
-
-        bb_player.chips -= bb_amount
-        bb_player.save(update_fields=['chips'])
-        if bb_player.chips == 0:
-            bb_player.status = 'all_in'
-            bb_player.save(update_fields=['status'])
-
-        hand.pot = sb_amount + bb_amount
-        hand.round_bets = {
-            str(sb_player.user_id): sb_amount,
-            str(bb_player.user_id): bb_amount,
-            '_acted': [],  # Blind posting does NOT count as acting
-        }
-        hand.save(update_fields=['pot', 'round_bets'])
-
-        PokerAction.objects.create(hand=hand, player=sb_player, action='post_blind', amount=sb_amount)
-        PokerAction.objects.create(hand=hand, player=bb_player, action='post_blind', amount=bb_amount)
+        state.post_blind(state.index_of_seat(sb_seat), table.small_blind)
+        state.post_blind(state.index_of_seat(bb_seat), table.big_blind)
+        state.current_bet = table.big_blind
 
         # Set first to act (UTG = after BB)
         if len(active_players) == 2:
@@ -196,282 +117,365 @@ def start_hand(table_id):
             first_seat = sb_seat
         else:
             first_seat = _next_seat(active_players, bb_seat)
-        hand.current_seat = first_seat
-        hand.save(update_fields=['current_seat'])
+        state.current = state.index_of_seat(first_seat)
 
-        # Build the map of user_id -> [card_int, card_int] for sending to clients
-        card_map = {}
-        for p in active_players:
-            cards_csv = player_cards[str(p.user_id)]
-            card_map[p.user_id] = cards_csv
+        hand = PokerHand(
+            table=table,
+            hand_number=table.hand_number,
+            dealer_seat=dealer_seat,
+            deck=deck,
+            dealt_user_ids=list(state.user_ids),
+        )
+        _sync_hand(state, hand)
+        hand.save(force_insert=True)
+        state.hand_id = hand.pk
+
+        for i, p in enumerate(active_players):
+            p.chips = state.stacks[i]
+            p.status = PLAYER_STATUSES[state.status[i]]
+        PokerPlayer.objects.bulk_update(seated, ['chips', 'status'])
+        PokerAction.objects.bulk_create(_action_rows(state))
+        state.mark_saved()
+
+        # Build the map of user_id -> hole cards for sending to clients
+        card_map = {
+            user_id: decode_cards(state.hole_cards(i))
+            for i, user_id in enumerate(state.user_ids)
+        }
+
+        with _live_lock:
+            _register(state, hand)
 
         return hand, card_map
 
 
-def get_valid_actions(hand, player):
-    """Return list of valid actions for the player in the current hand.
+# ---------------------------------------------------------------------------
+# Live hands
+#
+# The hand being played at a table lives in memory as a ``HandState``; the
+# consumers apply actions to it without touching the database. The state is
+# written back, with the actions taken since the last write, when a street is
+# dealt and when the hand ends. After a restart the state is rebuilt from the
+# last write: the hand row and player rows hold the street-start position and
+# the PokerAction log gives each player's contribution to the pot. Actions
+# taken after the last street boundary are lost with the process, which puts
+# the hand back at the start of that street.
+# ---------------------------------------------------------------------------
+
+_live_lock = threading.RLock()
+_live_hands = {}  # hand_id -> (HandState, PokerHand)
+
+
+def _build_state(hand, players, committed):
+    """Build a ``HandState`` from a hand row and its dealt-in players."""
+    state = HandState(
+        hand.pk, hand.dealer_seat, hand.table.big_blind,
+        [(p.seat, p.user_id, p.pk, p.user.username, p.chips) for p in players],
+        bytes(hand.deck), hand.deck_pos,
+        street=STREET_CODES[hand.status],
+    )
+    round_bets = hand.round_bets or {}
+    acted = set(round_bets.get('_acted', []))
+    for i, p in enumerate(players):
+        key = str(p.user_id)
+        state.status[i] = PLAYER_STATUS_CODES.get(p.status, FOLDED)
+        state.bets[i] = round_bets.get(key, 0)
+        state.acted[i] = key in acted
+        state.committed[i] = committed.get(p.user_id, 0)
+    state.pot = hand.pot
+    state.current = state.index_of_seat(hand.current_seat)
+    state.current_bet = hand.current_bet
+    state.last_raise = hand.last_raise
+    return state
+
+
+def _recover(hand_id):
+    """Rebuild the live state of a hand from its last persisted position."""
+    hand = PokerHand.objects.select_related('table').get(pk=hand_id)
+    players = sorted(
+        PokerPlayer.objects.filter(table_id=hand.table_id, user_id__in=hand.dealt_user_ids)
+        .select_related('user'),
+        key=lambda p: hand.dealt_user_ids.index(p.user_id),
+    )
+    committed = dict(
+        PokerAction.objects.filter(hand=hand)
+        .values('player__user_id')
+        .annotate(total=Sum('amount'))
+        .values_list('player__user_id', 'total')
+    )
+    state = _build_state(hand, players, committed)
+    if state.street != COMPLETED:
+        logger.info('Poker hand recovered: hand=%d street=%s', hand_id, hand.status)
+    return state, hand
 
-    Returns list of dicts: [{'action': 'fold'}, {'action': 'call', 'amount': 20}, ...]
+
+def _live(hand_id):
+    """Return ``(state, hand)`` for a hand, recovering it if not in memory.
+
+    Completed hands are returned but not kept.
     """
-    if hand.status == 'completed':
-        return []
+    entry = _live_hands.get(hand_id)
+    if entry is None:
+        entry = _recover(hand_id)
+        if entry[0].street != COMPLETED:
+            _live_hands[hand_id] = entry
+    return entry
+
+
+def _register(state, hand):
+    """Make ``state`` the live hand of its table, dropping any older one."""
+    for hand_id, (_, other) in list(_live_hands.items()):
+        if other.table_id == hand.table_id:
+            del _live_hands[hand_id]
+    _live_hands[hand.pk] = (state, hand)
+
+
+def _sync_hand(state, hand):
+    """Copy ``state`` onto the ``hand`` model instance (no query)."""
+    hand.status = STREETS[state.street]
+    hand.community_cards = decode_cards(state.board)
+    hand.pot = state.pot
+    hand.current_seat = state.current_seat
+    hand.current_bet = state.current_bet
+    hand.last_raise = state.last_raise
+    hand.round_bets = state.round_bets()
+    hand.deck_pos = state.deck_pos
+
+
+def _action_rows(state):
+    """``PokerAction`` instances for the log entries not saved yet."""
+    return [
+        PokerAction(
+            hand_id=state.hand_id, player_id=state.player_ids[i],
+            action=ACTIONS[code], amount=amount,
+        )
+        for i, code, amount in state.unsaved_log()
+    ]
 
-    if player.status in ('folded', 'eliminated', 'spectating', 'left', 'all_in'):
-        return []
 
-    if hand.current_seat != player.seat:
-        return []
+def _persist(state, hand):
+    """Write ``state`` to the hand row, the players and the action log."""
+    _sync_hand(state, hand)
+    with transaction.atomic():
+        hand.save(update_fields=[
+            'status', 'community_cards', 'pot', 'current_seat', 'current_bet',
+            'last_raise', 'round_bets', 'deck_pos', 'winner_ids', 'side_pots',
+            'action_deadline',
+        ])
+        PokerPlayer.objects.bulk_update(
+            [
+                PokerPlayer(pk=pk, chips=state.stacks[i], status=PLAYER_STATUSES[state.status[i]])
+                for i, pk in enumerate(state.player_ids)
+            ],
+            ['chips', 'status'],
+        )
+        rows = _action_rows(state)
+        if rows:
+            PokerAction.objects.bulk_create(rows)
+    state.mark_saved()
 
-    actions = [{'action': 'fold'}]
-    round_bets = hand.round_bets or {}
-    my_bet = round_bets.get(str(player.user_id), 0)
-    to_call = hand.current_bet - my_bet
 
-    if to_call <= 0:
-        # No bet to match
-        actions.append({'action': 'check'})
-        if player.chips > 0:
-            min_bet = hand.last_raise or hand.table.big_blind
-            if player.chips <= min_bet:
-                actions.append({'action': 'all_in', 'amount': player.chips})
-            else:
-                actions.append({'action': 'bet', 'min': min_bet, 'max': player.chips})
-    else:
-        # Must call or raise
-        if to_call >= player.chips:
-            actions.append({'action': 'all_in', 'amount': player.chips})
-        else:
-            actions.append({'action': 'call', 'amount': to_call})
-            min_raise = hand.current_bet + hand.last_raise
-            raise_chips_needed = min_raise - my_bet
-            if raise_chips_needed >= player.chips:
-                actions.append({'action': 'all_in', 'amount': player.chips})
-            else:
-                actions.append({
-                    'action': 'raise',
-                    'min': min_raise,
-                    'max': my_bet + player.chips,
-                })
+def discard_live_hand(hand_id):
+    """Forget the in-memory state of a hand without saving it.
 
-    return actions
+    The next access rebuilds it from the database, e.g. after rows were
+    edited directly.
+    """
+    with _live_lock:
+        _live_hands.pop(hand_id, None)
+
+
+def flush_table(table_id):
+    """Persist and drop the live hand of a table, if this process holds one."""
+    with _live_lock:
+        for hand_id, (state, hand) in list(_live_hands.items()):
+            if hand.table_id == table_id:
+                _persist(state, hand)
+                del _live_hands[hand_id]
+
+
+def current_hand_id(table_id):
+    """Return the pk of the table's latest hand, preferring the live one."""
+    with _live_lock:
+        for hand_id, (_, hand) in _live_hands.items():
+            if hand.table_id == table_id:
+                return hand_id
+    return (
+        PokerHand.objects.filter(table_id=table_id)
+        .order_by('-hand_number').values_list('pk', flat=True).first()
+    )
 
 
-def process_action(hand_id, player_id, action, amount=0):
-    """Validate and apply a player action.
+def live_players(hand_id):
+    """Return ``{user_id: (chips, status)}`` for a live hand, or ``{}``."""
+    with _live_lock:
+        entry = _live_hands.get(hand_id)
+        if entry is None:
+            return {}
+        state = entry[0]
+        return {
+            uid: (state.stacks[i], PLAYER_STATUSES[state.status[i]])
+            for i, uid in enumerate(state.user_ids)
+        }
 
-    Returns (hand, action_taken, advance_info) where advance_info is:
-    - None if the round continues
-    - 'advance_round' if betting round is complete
-    - 'showdown' if hand should go to showdown
-    - 'winner' if only one player remains
-    """
-    with transaction.atomic():
-        hand = PokerHand.objects.select_for_update().get(pk=hand_id)
-        table = hand.table
-        player = PokerPlayer.objects.select_for_update().get(
-            table=table, user_id=player_id
-        )
 
-        # Validate it's this player's turn
-        if hand.current_seat != player.seat:
-            return hand, None, None
-        if hand.status == 'completed':
-            return hand, None, None
-
-        valid = get_valid_actions(hand, player)
-        valid_action_names = {a['action'] for a in valid}
-        if action not in valid_action_names:
-            return hand, None, None
-
-        round_bets = hand.round_bets or {}
-        my_bet = round_bets.get(str(player.user_id), 0)
-
-        actual_amount = 0
-
-        if action == 'fold':
-            player.status = 'folded'
-            player.save(update_fields=['status'])
-
-        elif action == 'check':
-            actual_amount = 0
-            round_bets[str(player.user_id)] = my_bet  # Mark as having acted
-
-        elif action == 'call':
-            to_call = hand.current_bet - my_bet
-            actual_amount = min(to_call, player.chips)
-            player.chips -= actual_amount
-            player.save(update_fields=['chips'])
-            round_bets[str(player.user_id)] = my_bet + actual_amount
-            hand.pot += actual_amount
-            if player.chips == 0:
-                player.status = 'all_in'
-                player.save(update_fields=['status'])
-
-        elif action == 'bet':
-            actual_amount = max(amount, hand.last_raise or table.big_blind)
-            actual_amount = min(actual_amount, player.chips)
-            player.chips -= actual_amount
-            player.save(update_fields=['chips'])
-            round_bets[str(player.user_id)] = my_bet + actual_amount
-            hand.current_bet = my_bet + actual_amount
-            hand.last_raise = actual_amount
-            hand.pot += actual_amount
-            if player.chips == 0:
-                player.status = 'all_in'
-                player.save(update_fields=['status'])
-
-        elif action == 'raise':
-            # amount is the new total bet level
-            raise_to = max(amount, hand.current_bet + hand.last_raise)
-            raise_amount = raise_to - my_bet
-            raise_amount = min(raise_amount, player.chips)
-            actual_amount = raise_amount
-            player.chips -= raise_amount
-            player.save(update_fields=['chips'])
-            round_bets[str(player.user_id)] = my_bet + raise_amount
-            hand.last_raise = (my_bet + raise_amount) - hand.current_bet
-            hand.current_bet = my_bet + raise_amount
-            hand.pot += raise_amount
-            if player.chips == 0:
-                player.status = 'all_in'
-                player.save(update_fields=['status'])
-
-        elif action == 'all_in':
-            actual_amount = player.chips
-            player.chips = 0
-            player.status = 'all_in'
-            player.save(update_fields=['chips', 'status'])
-            round_bets[str(player.user_id)] = my_bet + actual_amount
-            new_total = my_bet + actual_amount
-            if new_total > hand.current_bet:
-                hand.last_raise = new_total - hand.current_bet
-                hand.current_bet = new_total
-            hand.pot += actual_amount
-
-        # Mark this player as having explicitly acted (distinct from blind posting)
-        acted = round_bets.get('_acted', [])
-        player_key = str(player.user_id)
-        if player_key not in acted:
-            acted.append(player_key)
-        round_bets['_acted'] = acted
-
-        hand.round_bets = round_bets
-        hand.save(update_fields=['pot', 'current_bet', 'last_raise', 'round_bets'])
-
-        # Record the action
-        PokerAction.objects.create(
-            hand=hand, player=player, action=action, amount=actual_amount,
+def overlay_live_state(table_id, hand=None, players=()):
+    """Update ``hand``/``players`` instances loaded from the database with the
+    unsaved position of the table's live hand, if any."""
+    with _live_lock:
+        entry = next(
+            (e for e in _live_hands.values() if e[1].table_id == table_id), None,
         )
+        if entry is None:
+            return
+        state, live_hand = entry
+        if hand is not None and hand.pk == live_hand.pk:
+            for field in (
+                'status', 'community_cards', 'pot', 'current_seat', 'current_bet',
+                'last_raise', 'round_bets',
+            ):
+                setattr(hand, field, getattr(live_hand, field))
+        for p in players:
+            i = state.index_of_user(p.user_id)
+            if i >= 0:
+                p.chips = state.stacks[i]
+                p.status = PLAYER_STATUSES[state.status[i]]
 
-        # Check what happens next
-        active_players = _players_in_hand(hand, table)
 
-        # Only one player left -> they win
-        if len(active_players) == 1:
-            hand.save(update_fields=['pot', 'current_bet', 'last_raise', 'round_bets'])
-            return hand, action, 'winner'
+def action_prompt(hand_id):
+    """Describe whose turn it is: seat, user, valid actions and timeout.
 
-        # Check if betting round is complete
-        players_who_can_act = [
-            p for p in active_players if p.status not in ('all_in', 'folded')
-        ]
+    Returns ``None`` when nobody is due to act.
+    """
+    with _live_lock:
+        state, hand = _live(hand_id)
+        i = state.current
+        if i < 0 or state.street == COMPLETED:
+            return None
+        return {
+            'seat': state.seats[i],
+            'user_id': state.user_ids[i],
+            'username': state.names[i],
+            'valid_actions': state.valid_actions(i),
+            'current_bet': state.current_bet,
+            'pot': state.pot,
+            'timeout': hand.table.time_per_action,
+        }
 
-        if len(players_who_can_act) == 0:
-            # Everyone is all-in or folded
-            return hand, action, 'showdown'
 
-        # Find next player to act
-        acting_seats = {p.seat for p in players_who_can_act}
-        next_s = _next_seat(
-            [p for p in active_players if p.seat in acting_seats],
-            player.seat,
+def is_players_turn(hand_id, user_id):
+    """Return True if the hand is still waiting on ``user_id`` to act."""
+    with _live_lock:
+        state, _ = _live(hand_id)
+        i = state.current
+        return (
+            STREETS[state.street] not in ('showdown', 'completed')
+            and i >= 0 and state.user_ids[i] == user_id
         )
 
-        # Check if the round is complete by seeing whether the next player
-        # has already explicitly acted (not just posted a blind) and matched
-        # the current bet.  When a bet/raise increases current_bet,
-        # previously-acting players' recorded amounts fall below it, so
-        # they'll need to act again - handled naturally.
-        acted_set = set(round_bets.get('_acted', []))
-        next_player = next((p for p in players_who_can_act if p.seat == next_s), None)
-        if next_player:
-            np_key = str(next_player.user_id)
-            np_has_acted = np_key in acted_set
-            np_bet = round_bets.get(np_key, 0)
 
-            if np_has_acted and np_bet >= hand.current_bet:
-                return hand, action, 'advance_round'
+def set_action_deadline(hand_id, deadline):
+    """Record when the player now due to act in ``hand_id`` times out.
+
+    ``None`` clears it. Written straight away (one indexed UPDATE) so the
+    deadline survives a restart even though the betting state is written
+    behind.
+    """
+    with _live_lock:
+        entry = _live_hands.get(hand_id)
+        if entry is not None:
+            entry[1].action_deadline = deadline
+        PokerHand.objects.filter(pk=hand_id).update(action_deadline=deadline)
 
-        hand.current_seat = next_s
-        hand.save(update_fields=['current_seat'])
-        return hand, action, None
 
+def claim_action_deadline(hand_id, deadline):
+    """Clear ``deadline`` if it is still the hand's current one.
 
-def advance_round(hand_id):
-    """Deal community cards and advance to the next betting round.
+    Every consumer at the table hears about an expired deadline; this
+    returns True for exactly one of them, which then handles the timeout.
+    """
+    with _live_lock:
+        claimed = PokerHand.objects.filter(
+            pk=hand_id, action_deadline=deadline,
+        ).update(action_deadline=None)
+        entry = _live_hands.get(hand_id)
+        if claimed and entry is not None:
+            entry[1].action_deadline = None
+    return bool(claimed)
+
+
+def pending_action_deadlines():
+    """Return ``[(hand_id, table_id, deadline)]`` for every running hand
+    waiting on a player, e.g. to re-arm timers after a restart."""
+    return list(
+        PokerHand.objects.filter(action_deadline__isnull=False, table__status='active')
+        .exclude(status='completed')
+        .values_list('pk', 'table_id', 'action_deadline')
+    )
 
-    Returns (hand, new_cards_csv) or (hand, None) if going to showdown.
+
+def runout_cards(hand_id):
+    """Return ``(usernames, holes, board)`` for the players still in the hand.
+
+    Hole cards are private until showdown, so only publish what is derived
+    from them once no further betting is possible.
     """
-    with transaction.atomic():
-        hand = PokerHand.objects.select_for_update().get(pk=hand_id)
-        table = hand.table
-
-        deck_csv = hand.player_hands.get('_deck', '')
-        deck = _parse_cards(deck_csv)
-
-        existing_community = _parse_cards(hand.community_cards)
-
-        if hand.status == 'preflop':
-            # Deal flop (3 cards)
-            new_cards = [deck.pop() for _ in range(3)]
-            hand.status = 'flop'
-        elif hand.status == 'flop':
-            # Deal turn (1 card)
-            new_cards = [deck.pop()]
-            hand.status = 'turn'
-        elif hand.status == 'turn':
-            # Deal river (1 card)
-            new_cards = [deck.pop()]
-            hand.status = 'river'
-        elif hand.status == 'river':
-            hand.status = 'showdown'
-            hand.save(update_fields=['status'])
-            return hand, None
-        else:
-            return hand, None
+    with _live_lock:
+        state, _ = _live(hand_id)
+        in_hand = state.in_hand()
+        return (
+            [state.names[i] for i in in_hand],
+            [tuple(state.hole_cards(i)) for i in in_hand],
+            tuple(state.board),
+        )
+
 
-        all_community = existing_community + new_cards
-        hand.community_cards = _cards_to_csv(all_community)
+def get_valid_actions(hand, player):
+    """Return list of valid actions for the player in the current hand.
 
-        # Update deck
-        hand.player_hands['_deck'] = _cards_to_csv(deck)
+    Returns list of dicts: [{'action': 'fold'}, {'action': 'call', 'amount': 20}, ...]
+    """
+    with _live_lock:
+        state, _ = _live(hand.pk)
+        return state.valid_actions(state.index_of_user(player.user_id))
 
-        # Reset betting for new round
-        hand.current_bet = 0
-        hand.last_raise = table.big_blind
-        hand.round_bets = {}
 
-        # Set first to act (first active player after dealer)
-        active_players = _players_in_hand(hand, table)
-        acting_players = [p for p in active_players if p.status not in ('all_in',)]
+def process_action(hand_id, player_id, action, amount=0):
+    """Validate and apply a player action to the live hand.
 
-        if not acting_players:
-            # All remaining players are all-in, deal remaining community
-            hand.save(update_fields=[
-                'status', 'community_cards', 'current_bet', 'last_raise',
-                'round_bets', 'player_hands',
-            ])
-            return hand, _cards_to_csv(new_cards)
+    Nothing is written until the next street boundary or the end of the hand.
 
-        first_seat = _next_seat(acting_players, hand.dealer_seat)
-        hand.current_seat = first_seat
+    Returns (hand, action_taken, advance_info) where advance_info is:
+    - None if the round continues
+    - 'advance_round' if betting round is complete
+    - 'showdown' if hand should go to showdown
+    - 'winner' if only one player remains
+    """
+    with _live_lock:
+        state, hand = _live(hand_id)
+        index = state.index_of_user(player_id)
+        action_taken, advance_info = state.apply(index, action, amount)
+        if action_taken:
+            _sync_hand(state, hand)
+        return hand, action_taken, advance_info
 
-        hand.save(update_fields=[
-            'status', 'community_cards', 'current_bet', 'last_raise',
-            'round_bets', 'current_seat', 'player_hands',
-        ])
 
-        return hand, _cards_to_csv(new_cards)
+def advance_round(hand_id):
+    """Deal community cards and advance to the next betting round.
+
+    Persists the hand at the street boundary.
+
+    Returns (hand, new_cards_csv) or (hand, None) if going to showdown.
+    """
+    with _live_lock:
+        state, hand = _live(hand_id)
+        street = state.street
+        new_cards = state.advance()
+        if state.street != street:
+            _persist(state, hand)
+        if new_cards is None:
+            return hand, None
+        return hand, decode_cards(new_cards)
 
 
 def resolve_hand(hand_id):
@@ -479,104 +483,81 @@ def resolve_hand(hand_id):
 
     results_list: [{'user_id': int, 'winnings': int, 'hand_name': str, 'cards': str}]
     """
-    with transaction.atomic():
-        hand = PokerHand.objects.select_for_update().get(pk=hand_id)
-        table = hand.table
-
-        active_players = _players_in_hand(hand, table)
+    with _live_lock:
+        state, hand = _live(hand_id)
+        in_hand = state.in_hand()
 
         # If only one player left, they win without showdown
-        if len(active_players) == 1:
-            winner = active_players[0]
-            winner.chips += hand.pot
-            winner.save(update_fields=['chips'])
-            hand.winner_ids = [winner.user_id]
-            hand.status = 'completed'
-            hand.save(update_fields=['winner_ids', 'status'])
-            return hand, [{'user_id': winner.user_id, 'winnings': hand.pot, 'hand_name': '', 'cards': ''}]
-
-        # Evaluate each player's hand
-        community = _parse_cards(hand.community_cards)
-
-        # If community cards aren't complete, deal remaining
-        deck = _parse_cards(hand.player_hands.get('_deck', ''))
-        while len(community) < 5:
-            community.append(deck.pop())
-        hand.community_cards = _cards_to_csv(community)
-
-        player_scores = []
-        for p in active_players:
-            hole_csv = hand.player_hands.get(str(p.user_id), '')
-            hole_cards = _parse_cards(hole_csv)
-            if len(hole_cards) != 2 or len(community) != 5:
-                continue
-            score = evaluator.evaluate(hole_cards, community)
-            hand_class = evaluator.get_rank_class(score)
-            hand_name = evaluator.class_to_string(hand_class)
-            player_scores.append({
-                'player': p,
-                'score': score,
-                'hand_name': hand_name,
-                'cards': hole_csv,
-            })
-
-        # Sort by score (lower = better in treys)
-        player_scores.sort(key=lambda x: x['score'])
-
-        # Handle side pots
-        results = _distribute_pot(hand, active_players, player_scores)
+        if len(in_hand) == 1:
+            winner = in_hand[0]
+            state.stacks[winner] += state.pot
+            results = [{
+                'user_id': state.user_ids[winner], 'winnings': state.pot,
+                'hand_name': '', 'cards': '',
+            }]
+        else:
+            # If community cards aren't complete, deal remaining
+            state.complete_board()
+            board = bytes(state.board)
+
+            player_scores = []
+            for i in in_hand:
+                hole = state.hole_cards(i)
+                score = evaluator.evaluate_codes(hole + board)
+                player_scores.append({
+                    'index': i,
+                    'score': score,
+                    'hand_name': evaluator.describe(score),
+                    'cards': decode_cards(hole),
+                })
 
-        hand.winner_ids = [r['user_id'] for r in results if r['winnings'] > 0]
-        hand.status = 'completed'
-        hand.player_hands['_deck'] = _cards_to_csv(deck)
-        hand.save(update_fields=['winner_ids', 'status', 'community_cards', 'player_hands'])
+            results = _distribute_pot(state, hand, player_scores)
 
+        state.street = COMPLETED
+        hand.winner_ids = [r['user_id'] for r in results if r['winnings'] > 0]
+        hand.action_deadline = None
+        _persist(state, hand)
+        _live_hands.pop(hand_id, None)
         return hand, results
 
 
-def _distribute_pot(hand, active_players, player_scores):
-    """Distribute pot including side pots. Returns results list."""
+def _distribute_pot(state, hand, player_scores):
+    """Build the main and side pots, award them and record the layout on
+    ``hand.side_pots``. Returns results list, biggest winners first."""
     if not player_scores:
         return []
 
-    # Simple pot distribution (handles side pots via all-in amounts)
-    # For now, use a simplified approach: best hand wins the pot
-    # TODO: proper side pot calculation for complex all-in scenarios
-
-    total_pot = hand.pot
-    results = []
-
-    # Find the best score
-    best_score = player_scores[0]['score']
-    winners = [ps for ps in player_scores if ps['score'] == best_score]
-
-    # Split pot among winners
-    share = total_pot // len(winners)
-    remainder = total_pot % len(winners)
-
-    for i, w in enumerate(winners):
-        winnings = share + (1 if i == 0 else 0) * remainder
-        w['player'].chips += winnings
-        w['player'].save(update_fields=['chips'])
-        results.append({
-            'user_id': w['player'].user_id,
-            'winnings': winnings,
-            'hand_name': w['hand_name'],
-            'cards': w['cards'],
-        })
-
-    # Add non-winners to results with 0 winnings
-    winner_ids = {w['player'].user_id for w in winners}
-    for ps in player_scores:
-        if ps['player'].user_id not in winner_ids:
-            results.append({
-                'user_id': ps['player'].user_id,
-                'winnings': 0,
-                'hand_name': ps['hand_name'],
-                'cards': ps['cards'],
-            })
-
-    return results
+    contenders = [ps['index'] for ps in player_scores]
+    if sum(state.committed) == state.pot:
+        pots = build_pots(state.committed, contenders)
+    else:
+        # Contributions no longer add up (rows edited by hand): fall back to
+        # a single pot every remaining player can win.
+        logger.warning(
+            'Poker hand %d: contributions %d != pot %d, using a single pot',
+            state.hand_id, sum(state.committed), state.pot,
+        )
+        pots = [(state.pot, contenders)]
+
+    scores = {ps['index']: ps['score'] for ps in player_scores}
+    winnings = award_pots(pots, scores, state.seats, state.dealer_seat)
+    for i, amount in winnings.items():
+        state.stacks[i] += amount
+
+    hand.side_pots = [
+        {'amount': amount, 'eligible': [state.user_ids[i] for i in eligible]}
+        for amount, eligible in pots
+    ]
+    player_scores.sort(key=lambda ps: (-winnings[ps['index']], ps['score']))
+    return [
+        {
+            'user_id': state.user_ids[ps['index']],
+            'winnings': winnings[ps['index']],
+            'hand_name': ps['hand_name'],
+            'cards': ps['cards'],
+        }
+        for ps in player_scores
+    ]
 
 
 def check_table_over(table_id):
@@ -617,6 +598,9 @@ def calculate_payouts(table_id):
 
     Returns list of (user, amount) tuples.
     """
+    # Bring the database up to date with a hand played in this process.
+    flush_table(table_id)
+
     table = PokerTable.objects.get(pk=table_id)
     players = list(PokerPlayer.objects.filter(table=table).exclude(status='invited'))
 
@@ -626,7 +610,6 @@ def calculate_payouts(table_id):
     ).exclude(status='completed').order_by('-hand_number').first()
 
     if current_hand and current_hand.pot > 0:
-        from django.db.models import Sum
         contributions = (
             PokerAction.objects.filter(hand=current_hand)
             .values('player__user_id')
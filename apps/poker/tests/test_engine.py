@@ -0,0 +1,85 @@
+from django.test import SimpleTestCase
+
+from apps.poker.engine import (
+    ALL_IN,
+    FLOP,
+    FOLDED,
+    SHOWDOWN,
+    HandState,
+    decode_cards,
+    encode_cards,
+)
+
+
+def _state(stacks=(1000, 1000, 1000)):
+    players = [
+        (seat, 100 + seat, 200 + seat, f'p{seat}', stack)
+        for seat, stack in enumerate(stacks)
+    ]
+    state = HandState(1, 0, 20, players, range(52))
+    state.post_blind(1, 10)
+    state.post_blind(2, 20)
+    state.current_bet = 20
+    state.current = 0
+    return state
+
+
+class HandStateTest(SimpleTestCase):
+    def test_card_round_trip(self):
+        self.assertEqual(decode_cards(encode_cards('As,Td,2c')), 'As,Td,2c')
+
+    def test_blinds_are_not_actions(self):
+        state = _state()
+        self.assertEqual(state.pot, 30)
+        self.assertEqual(bytes(state.acted), bytes(3))
+        self.assertEqual(state.round_bets()['_acted'], [])
+
+    def test_preflop_round_completes_after_big_blind_checks(self):
+        state = _state()
+        self.assertEqual(state.apply(0, 'call'), ('call', None))
+        self.assertEqual(state.apply(1, 'call'), ('call', None))
+        self.assertEqual(state.apply(2, 'check'), ('check', 'advance_round'))
+        self.assertEqual(state.pot, 60)
+
+    def test_out_of_turn_and_invalid_actions_are_rejected(self):
+        state = _state()
+        self.assertEqual(state.apply(1, 'fold'), (None, None))
+        self.assertEqual(state.apply(0, 'check'), (None, None))
+        self.assertEqual(state.log[-1][1], 6)  # only the blinds so far
+
+    def test_raise_reopens_action(self):
+        state = _state()
+        state.apply(0, 'raise', 60)
+        self.assertEqual((state.current_bet, state.last_raise), (60, 40))
+        state.apply(1, 'call')
+        _, info = state.apply(2, 'call')
+        self.assertEqual(info, 'advance_round')
+        self.assertEqual(list(state.committed), [60, 60, 60])
+
+    def test_folds_down_to_winner(self):
+        state = _state()
+        state.apply(0, 'fold')
+        self.assertEqual(state.apply(1, 'fold'), ('fold', 'winner'))
+        self.assertEqual(state.status[0], FOLDED)
+
+    def test_short_all_in_is_called_around(self):
+        state = _state(stacks=(30, 1000, 1000))
+        state.apply(0, 'all_in')
+        self.assertEqual(state.status[0], ALL_IN)
+        state.apply(1, 'call')
+        _, info = state.apply(2, 'call')
+        self.assertEqual(info, 'advance_round')
+
+    def test_advance_deals_from_deck_pointer(self):
+        state = _state()
+        self.assertEqual(list(state.hole_cards(1)), [2, 3])
+        cards = state.advance()
+        self.assertEqual(list(cards), [6, 7, 8])
+        self.assertEqual(list(state.board), [6, 7, 8])
+        self.assertEqual(state.deck_pos, 9)
+        self.assertEqual(state.street, FLOP)
+        self.assertEqual(state.current, 1)  # first seat after the dealer
+        self.assertEqual(list(state.bets), [0, 0, 0])
+        state.street = 3
+        self.assertIsNone(state.advance())
+        self.assertEqual(state.street, SHOWDOWN)
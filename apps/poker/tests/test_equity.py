@@ -0,0 +1,67 @@
+import random
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.poker.engine import encode_cards
+from apps.poker.equity import canonical_key, compute_equities, equities
+
+
+def _holes(*hands):
+    return [tuple(encode_cards(h)) for h in hands]
+
+
+class EquityTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_river_is_decided(self):
+        holes = _holes('As,Ah', 'Ks,Kh')
+        board = encode_cards('2c,7d,9s,Jc,3h')
+        self.assertEqual(compute_equities(holes, board), [1.0, 0.0])
+
+    def test_board_plays_splits_the_pot(self):
+        holes = _holes('2s,3h', '4d,5c', '6h,7d')
+        board = encode_cards('Ts,Js,Qs,Ks,As')
+        self.assertEqual(compute_equities(holes, board), [1 / 3] * 3)
+
+    def test_turn_enumerates_every_river(self):
+        holes = _holes('As,Ah', 'Ks,Kh')
+        board = encode_cards('2c,7d,9s,Jc')
+        aces, kings = compute_equities(holes, board)
+        # 44 unseen cards, two of them kings.
+        self.assertAlmostEqual(kings, 2 / 44)
+        self.assertAlmostEqual(aces, 42 / 44)
+
+    def test_dead_cards_are_not_dealt(self):
+        holes = _holes('As,Ah', 'Ks,Kh')
+        board = encode_cards('2c,7d,9s,Jc')
+        _, kings = compute_equities(holes, board, dead=encode_cards('Kd'))
+        self.assertAlmostEqual(kings, 1 / 43)
+
+    def test_preflop_is_sampled(self):
+        holes = _holes('As,Ah', 'Ks,Kh')
+        aces, kings = compute_equities(holes, trials=4000, rng=random.Random(5))
+        self.assertAlmostEqual(aces, 0.82, delta=0.03)
+        self.assertAlmostEqual(aces + kings, 1.0)
+
+    def test_multiway_shares_add_up(self):
+        holes = _holes('As,Kd', '9h,9c', '7s,8s', 'Qd,Jd')
+        board = encode_cards('9s,6s,2d')
+        shares = compute_equities(holes, board, trials=500, rng=random.Random(1))
+        self.assertAlmostEqual(sum(shares), 1.0)
+
+    def test_canonical_key_ignores_suit_labels_and_order(self):
+        key = canonical_key(_holes('Ah,Kh', 'Qd,Qc'), encode_cards('2h,7s,9d'))
+        self.assertEqual(key, canonical_key(_holes('Ks,As', 'Qh,Qd'), encode_cards('9h,2s,7c')))
+        self.assertNotEqual(key, canonical_key(_holes('Ah,Kd', 'Qd,Qc'), encode_cards('2h,7s,9d')))
+        # Player order is part of the situation.
+        self.assertNotEqual(key, canonical_key(_holes('Qd,Qc', 'Ah,Kh'), encode_cards('2h,7s,9d')))
+
+    def test_isomorphic_situations_share_a_cache_entry(self):
+        with mock.patch('apps.poker.equity.compute_equities', return_value=[0.6, 0.4]) as compute:
+            first = equities(_holes('Ah,Kh', 'Qd,Qc'), encode_cards('2h,7s,9d'))
+            second = equities(_holes('As,Ks', 'Qh,Qd'), encode_cards('2s,7c,9h'))
+        self.assertEqual(first, second)
+        self.assertEqual(compute.call_count, 1)
@@ -0,0 +1,60 @@
+import random
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+from treys import Card, Evaluator
+
+from apps.poker.engine import TREYS_CARDS, encode_cards
+from apps.poker.handeval import HandEvaluator, build_tables, write_tables
+
+
+class HandEvaluatorTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = Path(cls.tmpdir.name) / 'handranks.bin'
+        write_tables(cls.path, build_tables())
+        cls.reference = Evaluator()
+        cls.evaluator = HandEvaluator(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+    def test_matches_treys_on_random_hands(self):
+        rng = random.Random(7)
+        for size in (5, 6, 7):
+            for _ in range(3000):
+                codes = rng.sample(range(52), size)
+                cards = [TREYS_CARDS[c] for c in codes]
+                expected = self.reference.evaluate(cards[:2], cards[2:])
+                self.assertEqual(self.evaluator.evaluate(cards[:2], cards[2:]), expected)
+                self.assertEqual(self.evaluator.evaluate_codes(codes), expected)
+
+    def test_flush_beats_the_straight_in_the_same_cards(self):
+        codes = encode_cards('9h,Th,Jh,Qh,2h,8s,7d')
+        self.assertEqual(self.evaluator.describe(self.evaluator.evaluate_codes(codes)), 'Flush')
+
+    def test_straight_flush_and_wheel(self):
+        hand = [Card.new('5h'), Card.new('Ah')]
+        board = [Card.new(c) for c in ('2h', '3h', '4h', 'Kd', 'Kc')]
+        score = self.evaluator.evaluate(hand, board)
+        self.assertEqual(score, self.reference.evaluate(hand, board))
+        self.assertEqual(self.evaluator.describe(score), 'Straight Flush')
+
+    def test_missing_table_falls_back_to_treys(self):
+        fallback = HandEvaluator(Path(self.tmpdir.name) / 'missing.bin')
+        codes = encode_cards('As,Ad,Ah,Kc,Kd,2s,3s')
+        with self.assertLogs('apps.poker.handeval', 'WARNING'):
+            self.assertIsNone(fallback.tables)
+        self.assertEqual(fallback.evaluate_codes(codes), self.evaluator.evaluate_codes(codes))
+        self.assertEqual(fallback.describe(fallback.evaluate_codes(codes)), 'Full House')
+
+    def test_rejects_a_foreign_file(self):
+        bogus = Path(self.tmpdir.name) / 'bogus.bin'
+        bogus.write_bytes(b'not a table')
+        with self.assertLogs('apps.poker.handeval', 'WARNING'):
+            self.assertIsNone(HandEvaluator(bogus).tables)
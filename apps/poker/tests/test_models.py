@@ -2,7 +2,8 @@ from django.contrib.auth.models import User
 from django.db import IntegrityError
 from django.test import TestCase
 
-from apps.poker.models import PokerPlayer, PokerTable
+from apps.poker.engine import encode_cards
+from apps.poker.models import PokerHand, PokerPlayer, PokerTable
 
 
 class PokerTableModelTest(TestCase):
@@ -36,3 +37,18 @@ class PokerPlayerModelTest(TestCase):
         PokerPlayer.objects.create(table=self.table, user=self.user1, seat=0, chips=1000)
         with self.assertRaises(IntegrityError):
             PokerPlayer.objects.create(table=self.table, user=self.user1, seat=1, chips=1000)
+
+
+class PokerHandModelTest(TestCase):
+    def test_hole_cards_come_from_the_deck(self):
+        user = User.objects.create_user('alice', password='pass')
+        table = PokerTable.objects.create(creator=user, stake=100)
+        hand = PokerHand.objects.create(
+            table=table, hand_number=1, dealer_seat=0,
+            deck=bytes(encode_cards('As,Kd,2c,3c,Th,Jh,Qh')), deck_pos=7,
+            dealt_user_ids=[user.pk + 1, user.pk],
+        )
+        hand.refresh_from_db()
+        self.assertEqual(hand.hole_cards(user.pk), '2c,3c')
+        self.assertEqual(hand.hole_cards(user.pk + 1), 'As,Kd')
+        self.assertEqual(hand.hole_cards(user.pk + 2), '')
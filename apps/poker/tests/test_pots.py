@@ -0,0 +1,100 @@
+import random
+
+from django.test import SimpleTestCase
+
+from apps.poker.pots import award_pots, build_pots
+
+
+def _random_showdown(rng):
+    n = rng.randint(2, 9)
+    folded = set(rng.sample(range(n), rng.randint(0, n - 2)))
+    committed = [rng.randint(0, 500) for _ in range(n)]
+    contenders = [i for i in range(n) if i not in folded]
+    # Few distinct scores so ties and split pots come up often.
+    scores = {i: rng.randint(1, 4) for i in contenders}
+    seats = sorted(rng.sample(range(1, 10), n))
+    return committed, contenders, scores, seats, rng.choice(seats)
+
+
+class BuildPotsTest(SimpleTestCase):
+    def test_single_pot_when_everyone_matches(self):
+        self.assertEqual(build_pots([100, 100, 100], [0, 1, 2]), [(300, [0, 1, 2])])
+
+    def test_short_all_in_creates_side_pot(self):
+        pots = build_pots([50, 200, 200], [0, 1, 2])
+        self.assertEqual(pots, [(150, [0, 1, 2]), (300, [1, 2])])
+
+    def test_layers_for_each_all_in_level(self):
+        pots = build_pots([30, 80, 200, 200], [0, 1, 2, 3])
+        self.assertEqual(pots, [
+            (120, [0, 1, 2, 3]),
+            (150, [1, 2, 3]),
+            (240, [2, 3]),
+        ])
+
+    def test_folded_chips_stay_in_the_pots(self):
+        # Player 1 folded after putting in 120; only 0 and 2 contest.
+        pots = build_pots([50, 120, 300], [0, 2])
+        self.assertEqual(pots, [(150, [0, 2]), (320, [2])])
+
+    def test_folded_chips_above_every_contender_go_to_top_pot(self):
+        pots = build_pots([40, 40, 100], [0, 1])
+        self.assertEqual(pots, [(180, [0, 1])])
+
+
+class AwardPotsTest(SimpleTestCase):
+    def test_short_stack_only_wins_main_pot(self):
+        pots = build_pots([50, 200, 200], [0, 1, 2])
+        winnings = award_pots(pots, {0: 1, 1: 5, 2: 9}, [0, 1, 2], 0)
+        self.assertEqual(winnings, {0: 150, 1: 300, 2: 0})
+
+    def test_split_pot(self):
+        winnings = award_pots([(300, [0, 1, 2])], {0: 3, 1: 3, 2: 7}, [0, 1, 2], 2)
+        self.assertEqual(winnings, {0: 150, 1: 150, 2: 0})
+
+    def test_odd_chip_goes_left_of_dealer(self):
+        pots = [(101, [0, 1, 2])]
+        scores = {0: 1, 1: 1, 2: 1}
+        self.assertEqual(award_pots(pots, scores, [2, 5, 7], 5), {0: 34, 1: 33, 2: 34})
+        self.assertEqual(award_pots(pots, scores, [2, 5, 7], 7), {0: 34, 1: 34, 2: 33})
+        self.assertEqual(award_pots(pots, scores, [2, 5, 7], 2), {0: 33, 1: 34, 2: 34})
+
+
+class PotPropertyTest(SimpleTestCase):
+    """Invariants checked over seeded random showdowns."""
+
+    CASES = 2000
+
+    def test_pots_add_up_and_nest(self):
+        rng = random.Random(1)
+        for _ in range(self.CASES):
+            committed, contenders, _, _, _ = _random_showdown(rng)
+            pots = build_pots(committed, contenders)
+            self.assertEqual(sum(amount for amount, _ in pots), sum(committed))
+            self.assertTrue(all(amount > 0 for amount, _ in pots))
+            for _, eligible in pots:
+                self.assertLessEqual(set(eligible), set(contenders))
+            for (_, outer), (_, inner) in zip(pots, pots[1:]):
+                self.assertLess(set(inner), set(outer))
+
+    def test_no_contender_wins_more_than_it_could_cover(self):
+        rng = random.Random(2)
+        for _ in range(self.CASES):
+            committed, contenders, scores, seats, dealer = _random_showdown(rng)
+            winnings = award_pots(build_pots(committed, contenders), scores, seats, dealer)
+            self.assertEqual(sum(winnings.values()), sum(committed))
+            for i in contenders:
+                cap = sum(min(c, committed[i]) for c in committed)
+                if committed[i] == max(committed[j] for j in contenders):
+                    cap = sum(committed)
+                self.assertLessEqual(winnings[i], cap)
+
+    def test_split_shares_differ_by_at_most_one_chip(self):
+        rng = random.Random(3)
+        for _ in range(self.CASES):
+            committed, contenders, _, seats, dealer = _random_showdown(rng)
+            committed = [max(c, 1) for c in committed]
+            scores = dict.fromkeys(contenders, 1)
+            winnings = award_pots([(sum(committed), contenders)], scores, seats, dealer)
+            self.assertLessEqual(max(winnings.values()) - min(winnings.values()), 1)
+            self.assertEqual(sum(winnings.values()), sum(committed))
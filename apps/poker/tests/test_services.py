@@ -1,15 +1,20 @@
 from django.contrib.auth.models import User
 from django.test import TestCase
 
-from apps.poker.models import PokerHand, PokerPlayer, PokerTable
+from apps.poker.engine import decode_cards
+from apps.poker.models import PokerAction, PokerHand, PokerPlayer, PokerTable
 from apps.poker.services import (
     advance_round,
     calculate_payouts,
     check_table_over,
+    discard_live_hand,
+    flush_table,
     get_valid_actions,
+    live_players,
     process_action,
     process_rebuy,
     resolve_hand,
+    runout_cards,
     start_hand,
 )
 
@@ -53,6 +58,38 @@ class StartHandTest(TestCase):
         hand2, _ = start_hand(self.table.pk)
         self.assertEqual(hand2.hand_number, 2)
 
+    def test_start_hand_writes_final_preflop_position(self):
+        hand, _ = start_hand(self.table.pk)
+        stored = PokerHand.objects.get(pk=hand.pk)
+        self.assertEqual(stored.pot, 30)
+        self.assertEqual(stored.current_seat, hand.current_seat)
+        self.assertEqual(stored.deck_pos, 6)
+        self.assertEqual(stored.round_bets['_acted'], [])
+        blinds = PokerAction.objects.filter(hand=hand).order_by('pk')
+        self.assertEqual([(a.action, a.amount) for a in blinds], [('post_blind', 10), ('post_blind', 20)])
+        chips = sorted(PokerPlayer.objects.filter(table=self.table).values_list('chips', flat=True))
+        self.assertEqual(chips, [980, 990, 1000])
+
+    def test_query_count_does_not_grow_with_seats(self):
+        for seats in range(2, 9):
+            with self.subTest(seats=seats):
+                table = PokerTable.objects.create(
+                    creator=self.users[0], stake=100, starting_chips=1000,
+                    small_blind=10, big_blind=20, status='active',
+                )
+                for seat in range(seats):
+                    user = User.objects.create_user(f'seats{seats}_{seat}', password='pass')
+                    PokerPlayer.objects.create(
+                        table=table, user=user, seat=seat, chips=1000, status='folded',
+                    )
+                # Lock table, load seats, update table, insert hand, update
+                # players, insert blinds, plus the savepoint pair.
+                with self.assertNumQueries(8):
+                    hand, card_map = start_hand(table.pk)
+                self.assertEqual(len(card_map), seats)
+                statuses = set(table.players.values_list('status', flat=True))
+                self.assertEqual(statuses, {'active'})
+
 
 class ProcessActionTest(TestCase):
     def setUp(self):
@@ -82,6 +119,11 @@ class ProcessActionTest(TestCase):
             self.hand.pk, current_player.user_id, 'fold'
         )
         self.assertEqual(action, 'fold')
+        self.assertEqual(live_players(hand.pk)[current_player.user_id][1], 'folded')
+        # Written back at the next street boundary (or flush), not per action.
+        current_player.refresh_from_db()
+        self.assertEqual(current_player.status, 'active')
+        flush_table(self.table.pk)
         current_player.refresh_from_db()
         self.assertEqual(current_player.status, 'folded')
 
@@ -169,14 +211,15 @@ class ProcessActionExtendedTest(TestCase):
             self.hand.pk, current_player.user_id, 'raise', 60
         )
         self.assertEqual(action, 'raise')
+        flush_table(self.table.pk)
         current_player.refresh_from_db()
         self.assertLess(current_player.chips, 1000)
 
     def test_check_when_no_bet(self):
         """After advancing to flop with bets settled, check should work."""
         # Everyone calls preflop to get to flop
+        hand = self.hand
         for _ in range(3):
-            hand = PokerHand.objects.get(pk=self.hand.pk)
             current_player = PokerPlayer.objects.get(
                 table=self.table, seat=hand.current_seat,
             )
@@ -202,10 +245,12 @@ class ProcessActionExtendedTest(TestCase):
         current_player = PokerPlayer.objects.get(table=self.table, seat=self.hand.current_seat)
         current_player.chips = 15
         current_player.save(update_fields=['chips'])
+        discard_live_hand(self.hand.pk)
         hand, action, info = process_action(
             self.hand.pk, current_player.user_id, 'all_in', 15,
         )
         self.assertEqual(action, 'all_in')
+        flush_table(self.table.pk)
         current_player.refresh_from_db()
         self.assertEqual(current_player.chips, 0)
         self.assertEqual(current_player.status, 'all_in')
@@ -295,6 +340,7 @@ class ResolveHandTest(TestCase):
         for p in players[1:]:
             p.status = 'folded'
             p.save()
+        discard_live_hand(hand.pk)
 
         hand, results = resolve_hand(hand.pk)
         self.assertEqual(hand.status, 'completed')
@@ -313,6 +359,105 @@ class ResolveHandTest(TestCase):
         total_winnings = sum(r['winnings'] for r in results)
         self.assertEqual(total_winnings, hand.pot)
 
+    def test_resolve_with_side_pot(self):
+        PokerPlayer.objects.filter(table=self.table, seat=0).update(chips=100)
+        hand, _ = start_hand(self.table.pk)
+        process_action(hand.pk, self.users[0].pk, 'raise', 100)
+        process_action(hand.pk, self.users[1].pk, 'raise', 1000)
+        _, _, advance_info = process_action(hand.pk, self.users[2].pk, 'all_in')
+        self.assertEqual(advance_info, 'showdown')
+
+        hand, results = resolve_hand(hand.pk)
+        self.assertEqual(hand.pot, 2100)
+        self.assertEqual(hand.side_pots, [
+            {'amount': 300, 'eligible': [u.pk for u in self.users]},
+            {'amount': 1800, 'eligible': [self.users[1].pk, self.users[2].pk]},
+        ])
+        winnings = {r['user_id']: r['winnings'] for r in results}
+        self.assertEqual(sum(winnings.values()), 2100)
+        self.assertLessEqual(winnings[self.users[0].pk], 300)
+        chips = PokerPlayer.objects.filter(table=self.table).values_list('user_id', 'chips')
+        self.assertEqual(dict(chips), winnings)
+
+
+class LiveHandTest(TestCase):
+    """Actions are applied in memory and written back at street boundaries."""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'live{i}', password='pass') for i in range(3)]
+        self.table = PokerTable.objects.create(
+            creator=self.users[0], stake=100, starting_chips=1000,
+            small_blind=10, big_blind=20, status='active',
+        )
+        for i, u in enumerate(self.users):
+            PokerPlayer.objects.create(
+                table=self.table, user=u, seat=i, chips=1000, status='active',
+            )
+        self.hand, _ = start_hand(self.table.pk)
+
+    def _act(self, hand, action, amount=0):
+        player = PokerPlayer.objects.get(table=self.table, seat=hand.current_seat)
+        return process_action(hand.pk, player.user_id, action, amount)
+
+    def test_actions_do_not_query(self):
+        player = PokerPlayer.objects.get(table=self.table, seat=self.hand.current_seat)
+        with self.assertNumQueries(0):
+            _, action, _ = process_action(self.hand.pk, player.user_id, 'call')
+        self.assertEqual(action, 'call')
+
+    def test_street_boundary_persists_state_and_log(self):
+        hand, _, _ = self._act(self.hand, 'call')
+        hand, _, _ = self._act(hand, 'call')
+        hand, _, info = self._act(hand, 'check')
+        self.assertEqual(info, 'advance_round')
+        self.assertEqual(PokerAction.objects.filter(hand=hand).count(), 2)
+
+        hand, cards = advance_round(hand.pk)
+        self.assertEqual(len(cards.split(',')), 3)
+        stored = PokerHand.objects.get(pk=hand.pk)
+        self.assertEqual(stored.status, 'flop')
+        self.assertEqual(stored.pot, 60)
+        self.assertEqual(stored.community_cards, cards)
+        self.assertEqual(PokerAction.objects.filter(hand=hand).count(), 5)
+        chips = sorted(PokerPlayer.objects.filter(table=self.table).values_list('chips', flat=True))
+        self.assertEqual(chips, [980, 980, 980])
+
+    def test_recovery_resumes_from_last_boundary(self):
+        hand, _, _ = self._act(self.hand, 'call')
+        hand, _, _ = self._act(hand, 'call')
+        hand, _, _ = self._act(hand, 'check')
+        hand, flop = advance_round(hand.pk)
+        flop_seat = hand.current_seat
+        hand, _, _ = self._act(hand, 'bet', 40)
+
+        # Simulate a restart: the flop bet was never written.
+        discard_live_hand(hand.pk)
+        recovered = PokerHand.objects.get(pk=hand.pk)
+        self.assertEqual(recovered.current_seat, flop_seat)
+        hand, _, _ = self._act(recovered, 'check')
+        hand, _, _ = self._act(hand, 'check')
+        hand, _, info = self._act(hand, 'check')
+        self.assertEqual(info, 'advance_round')
+        hand, turn = advance_round(hand.pk)
+        self.assertEqual(hand.community_cards, f'{flop},{turn}')
+
+        hand, results = resolve_hand(hand.pk)
+        self.assertEqual(sum(r['winnings'] for r in results), 60)
+        chips = PokerPlayer.objects.filter(table=self.table).values_list('chips', flat=True)
+        self.assertEqual(sum(chips), 3000)
+
+    def test_runout_cards_skip_folded_players(self):
+        folder = PokerPlayer.objects.get(table=self.table, seat=self.hand.current_seat)
+        hand, _, _ = self._act(self.hand, 'fold')
+        usernames, holes, board = runout_cards(hand.pk)
+        self.assertEqual(len(usernames), 2)
+        self.assertNotIn(folder.user.username, usernames)
+        stored = PokerHand.objects.get(pk=hand.pk)
+        for username, hole in zip(usernames, holes):
+            user = User.objects.get(username=username)
+            self.assertEqual(decode_cards(hole), stored.hole_cards(user.pk))
+        self.assertEqual(board, ())
+
 
 class CalculatePayoutsTest(TestCase):
     def test_proportional_payout(self):
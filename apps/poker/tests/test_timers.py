@@ -0,0 +1,123 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.poker.models import PokerHand, PokerPlayer, PokerTable
+from apps.poker.services import (
+    claim_action_deadline,
+    discard_live_hand,
+    pending_action_deadlines,
+    process_action,
+    resolve_hand,
+    set_action_deadline,
+    start_hand,
+)
+from apps.poker.timers import COMPACT_SLACK, ActionScheduler
+
+
+class ActionSchedulerTest(SimpleTestCase):
+    def setUp(self):
+        self.fired = []
+        self.scheduler = ActionScheduler(fire=self._fire)
+        self.now = timezone.now()
+
+    async def _fire(self, table_id, hand_id, user_id, deadline):
+        self.fired.append((table_id, hand_id, user_id))
+
+    def test_due_returns_expired_entries_in_deadline_order(self):
+        self.scheduler.schedule(1, 10, 100, self.now + timedelta(seconds=2))
+        self.scheduler.schedule(2, 20, 200, self.now + timedelta(seconds=1))
+        self.scheduler.schedule(3, 30, 300, self.now + timedelta(seconds=60))
+        due = self.scheduler.due(self.now + timedelta(seconds=5))
+        self.assertEqual([entry[3] for entry in due], [20, 10])
+        self.assertEqual(len(self.scheduler), 1)
+
+    def test_rescheduling_replaces_the_earlier_deadline(self):
+        self.scheduler.schedule(1, 10, 100, self.now + timedelta(seconds=1))
+        self.scheduler.schedule(1, 10, 101, self.now + timedelta(seconds=3))
+        self.assertEqual(self.scheduler.due(self.now + timedelta(seconds=2)), [])
+        due = self.scheduler.due(self.now + timedelta(seconds=4))
+        self.assertEqual([entry[4] for entry in due], [101])
+
+    def test_cancelled_hand_never_fires(self):
+        self.scheduler.schedule(1, 10, 100, self.now)
+        self.scheduler.cancel(10)
+        self.assertEqual(self.scheduler.due(self.now + timedelta(seconds=1)), [])
+
+    def test_cancelled_entries_are_compacted_out_of_the_heap(self):
+        for hand_id in range(1000):
+            self.scheduler.schedule(1, hand_id, 100, self.now + timedelta(seconds=hand_id))
+            self.scheduler.cancel(hand_id)
+        self.scheduler.schedule(1, 5000, 100, self.now)
+        self.assertLessEqual(len(self.scheduler._heap), 2 + COMPACT_SLACK)
+        self.assertEqual([entry[3] for entry in self.scheduler.due(self.now)], [5000])
+
+    def test_worker_fires_entries_as_they_expire(self):
+        async def run():
+            self.scheduler._reload = _no_reload
+            self.scheduler.ensure_running()
+            now = timezone.now()
+            self.scheduler.schedule(1, 10, 100, now + timedelta(seconds=0.05))
+            self.scheduler.schedule(2, 20, 200, now + timedelta(seconds=10))
+            # An earlier deadline wakes the sleeping worker.
+            self.scheduler.schedule(3, 30, 300, now)
+            await asyncio.sleep(0.2)
+            self.scheduler._task.cancel()
+
+        async def _no_reload():
+            pass
+
+        async_to_sync(run)()
+        self.assertEqual(self.fired, [(3, 30, 300), (1, 10, 100)])
+
+
+class ActionDeadlineTest(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'timer{i}', password='pass') for i in range(3)]
+        self.table = PokerTable.objects.create(
+            creator=self.users[0], stake=100, starting_chips=1000,
+            small_blind=10, big_blind=20, status='active',
+        )
+        for i, u in enumerate(self.users):
+            PokerPlayer.objects.create(
+                table=self.table, user=u, seat=i, chips=1000, status='active',
+            )
+        self.hand, _ = start_hand(self.table.pk)
+        self.deadline = timezone.now() + timedelta(seconds=30)
+
+    def test_deadline_is_written_through(self):
+        set_action_deadline(self.hand.pk, self.deadline)
+        self.assertEqual(PokerHand.objects.get(pk=self.hand.pk).action_deadline, self.deadline)
+        self.assertEqual(
+            pending_action_deadlines(), [(self.hand.pk, self.table.pk, self.deadline)],
+        )
+
+    def test_deadline_survives_restart(self):
+        set_action_deadline(self.hand.pk, self.deadline)
+        discard_live_hand(self.hand.pk)
+        self.assertEqual(len(pending_action_deadlines()), 1)
+
+    def test_only_one_claim_succeeds(self):
+        set_action_deadline(self.hand.pk, self.deadline)
+        self.assertTrue(claim_action_deadline(self.hand.pk, self.deadline))
+        self.assertFalse(claim_action_deadline(self.hand.pk, self.deadline))
+        self.assertEqual(pending_action_deadlines(), [])
+
+    def test_superseded_deadline_cannot_be_claimed(self):
+        set_action_deadline(self.hand.pk, self.deadline)
+        set_action_deadline(self.hand.pk, self.deadline + timedelta(seconds=30))
+        self.assertFalse(claim_action_deadline(self.hand.pk, self.deadline))
+
+    def test_resolve_clears_deadline(self):
+        set_action_deadline(self.hand.pk, self.deadline)
+        hand = self.hand
+        for _ in range(2):
+            player = PokerPlayer.objects.get(table=self.table, seat=hand.current_seat)
+            hand, _, _ = process_action(hand.pk, player.user_id, 'fold')
+        resolve_hand(hand.pk)
+        self.assertIsNone(PokerHand.objects.get(pk=hand.pk).action_deadline)
+        self.assertEqual(pending_action_deadlines(), [])
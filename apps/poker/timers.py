@@ -0,0 +1,134 @@
+"""Action deadlines for every poker table, fired from one asyncio task.
+
+When a player is prompted to act, the consumer records the deadline on
+``PokerHand.action_deadline`` and hands it to the process-wide
+``action_scheduler``. The scheduler keeps one heap of deadlines for all
+tables and sleeps until the earliest, so thousands of tables cost one task
+and no per-consumer timers. An expired deadline is announced to the table's
+channel group as an ``action_deadline`` event; the consumer that wins
+``claim_action_deadline`` folds the player (or re-prompts whoever is due,
+if the hand moved on).
+
+Deadlines do not depend on which sockets are open: a consumer that
+disconnects no longer takes the table's timer with it. On start the
+scheduler reloads every pending deadline from the database, so timers also
+survive a restart. Events fired while nobody is connected stay claimable,
+and the first consumer to reconnect picks them up.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from .services import pending_action_deadlines
+
+logger = logging.getLogger(__name__)
+
+# Dead heap entries tolerated on top of one per live entry before compacting.
+COMPACT_SLACK = 64
+
+
+async def announce_deadline(table_id, hand_id, user_id, deadline):
+    """Tell the table's consumers that ``deadline`` has passed."""
+    await get_channel_layer().group_send(f'poker_{table_id}', {
+        'type': 'action_deadline',
+        'hand_id': hand_id,
+        'user_id': user_id,
+        'deadline': deadline.isoformat(),
+    })
+
+
+class ActionScheduler:
+    """Heap of ``(deadline, hand)`` entries drained by a single task.
+
+    Only the latest deadline per hand is live; entries replaced by a later
+    ``schedule`` or removed by ``cancel`` are skipped when they surface.
+    Once dead entries outnumber the live ones the heap is rebuilt from the
+    live entries, so busy tables do not grow it without bound.
+    """
+
+    def __init__(self, fire=announce_deadline):
+        self._fire = fire
+        self._heap = []
+        self._live = {}  # hand_id -> heap entry
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._live)
+
+    def ensure_running(self):
+        """Start the worker on the running event loop if it is not running."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    def schedule(self, table_id, hand_id, user_id, deadline):
+        """Fire for ``hand_id`` at ``deadline``, replacing any earlier entry.
+
+        ``user_id`` is the player expected to act, or ``None`` if unknown
+        (deadlines reloaded after a restart).
+        """
+        entry = (deadline, next(self._seq), table_id, hand_id, user_id)
+        self._live[hand_id] = entry
+        heapq.heappush(self._heap, entry)
+        self._compact()
+        if self._wakeup is not None and self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, hand_id):
+        """Drop the deadline for ``hand_id``: its player acted or the hand ended."""
+        if self._live.pop(hand_id, None) is not None:
+            self._compact()
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._live) + COMPACT_SLACK:
+            self._heap = list(self._live.values())
+            heapq.heapify(self._heap)
+
+    def due(self, now):
+        """Pop and return the live entries with a deadline at or before ``now``."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._live.get(entry[3]) is entry:
+                del self._live[entry[3]]
+                expired.append(entry)
+        return expired
+
+    async def _reload(self):
+        pending = await database_sync_to_async(pending_action_deadlines)()
+        for hand_id, table_id, deadline in pending:
+            if hand_id not in self._live:
+                self.schedule(table_id, hand_id, None, deadline)
+        if pending:
+            logger.info('Poker action deadlines reloaded: %d', len(pending))
+
+    async def _run(self):
+        await self._reload()
+        while True:
+            for deadline, _, table_id, hand_id, user_id in self.due(timezone.now()):
+                try:
+                    await self._fire(table_id, hand_id, user_id, deadline)
+                except Exception:
+                    logger.exception('Poker action deadline failed: hand=%d', hand_id)
+
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max((self._heap[0][0] - timezone.now()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+action_scheduler = ActionScheduler()
@@ -9,7 +9,8 @@ from django.shortcuts import get_object_or_404, redirect, render
 
 from apps.accounts.decorators import rate_limit
 from apps.economy.services import InsufficientFunds, poker_buy_in, poker_payout
-from apps.notifications.services import send_notification
+from apps.notifications.activity import invalidate_activity
+from apps.notifications.services import send_notifications_bulk
 
 from .models import PokerPlayer, PokerTable
 
@@ -141,10 +142,12 @@ def create_table(request):
         status='active',
         coins_invested=stake,
     )
+    invalidate_activity(request.user.pk)
 
     # Handle invited players (private tables)
     if not is_public and invited_usernames:
         next_seat = 1
+        invites = []
         for username in invited_usernames:
             username = username.strip()
             if not username or username == request.user.username:
@@ -167,14 +170,14 @@ def create_table(request):
             )
             next_seat += 1
 
-            send_notification(
+            invites.append((
                 invited_user,
-                'game_invite',
                 'Poker Invite!',
                 f'{request.user.profile.get_display_name()} invited you to a poker table '
                 f'for {stake} LC buy-in!',
-                link=f'/poker/play/{table.pk}/',
-            )
+            ))
+
+        send_notifications_bulk(invites, 'game_invite', link=f'/poker/play/{table.pk}/')
 
     return redirect('poker_play', table_id=table.pk)
 
@@ -200,6 +203,7 @@ def join_table(request, table_id):
             existing.status = 'active'
             existing.coins_invested = table.stake
             existing.save(update_fields=['chips', 'status', 'coins_invested'])
+            invalidate_activity(request.user.pk)
             _broadcast_to_table(table.pk, {
                 'type': 'player_joined',
                 'username': request.user.username,
@@ -246,6 +250,7 @@ def join_table(request, table_id):
         status='active',
         coins_invested=table.stake,
     )
+    invalidate_activity(request.user.pk)
 
     _broadcast_to_table(table.pk, {
         'type': 'player_joined',
@@ -299,6 +304,7 @@ def leave_table(request, table_id):
                 poker_payout([(p.user, p.coins_invested)], note=f'Poker table cancelled - Table #{table.pk}')
         table.status = 'cancelled'
         table.save(update_fields=['status'])
+        invalidate_activity(*table.players.values_list('user_id', flat=True))
         _broadcast_to_table(table.pk, {
             'type': 'table_cancelled',
         })
@@ -309,6 +315,7 @@ def leave_table(request, table_id):
             poker_payout([(player.user, player.coins_invested)], note=f'Left poker table #{table.pk}')
         left_seat = player.seat
         player.delete()
+        invalidate_activity(request.user.pk)
         _broadcast_to_table(table.pk, {
             'type': 'player_left',
             'username': request.user.username,
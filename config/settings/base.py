@@ -66,6 +66,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'apps.notifications.context_processors.unread_notification_count',
+                'apps.economy.context_processors.nav_balance',
             ],
         },
     },
@@ -142,6 +143,9 @@ NAME_CHANGE_COOLDOWN_SECONDS = 86400  # 24 hours
 MAX_GAME_STAKE = 10000
 NOTIFICATION_MAX_DISPLAY = 50
 LEADERBOARD_SIZE = 50
+BALANCE_CACHE_TIMEOUT = 600  # Write-through; the timeout only bounds staleness
+# Built by `manage.py build_hand_table`; poker falls back to treys without it
+POKER_HAND_TABLE = Path(os.environ.get('POKER_HAND_TABLE', BASE_DIR / 'var' / 'handranks.bin'))
 
 # Baseline browser hardening (safe defaults for all environments)
 SECURE_REFERRER_POLICY = 'same-origin'
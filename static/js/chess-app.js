@@ -240,10 +240,10 @@ function chessApp() {
             this.opponentInitial = oppInfo.initial || (oppUser ? oppUser.charAt(0).toUpperCase() : '?');
 
             // Set final clock values
-            var whiteTime = parseInt(el.dataset.whiteTime) || 0;
-            var blackTime = parseInt(el.dataset.blackTime) || 0;
-            this.myTime = this.mySide === 'white' ? whiteTime : blackTime;
-            this.opponentTime = this.mySide === 'white' ? blackTime : whiteTime;
+            this.applyClocks({
+                white_ms: parseInt(el.dataset.whiteMs) || 0,
+                black_ms: parseInt(el.dataset.blackMs) || 0,
+            });
 
             // Load board and moves
             this.chess.load(fen);
@@ -425,8 +425,7 @@ function chessApp() {
                 this.chess.load(data.fen);
                 this.fen = data.fen;
                 this.currentTurn = this.chess.turn();
-                this.myTime = this.mySide === 'white' ? data.white_time : data.black_time;
-                this.opponentTime = this.mySide === 'white' ? data.black_time : data.white_time;
+                this.applyClocks(data);
                 var myUser = this.mySide === 'white' ? data.white_player : data.black_player;
                 var oppUser = this.mySide === 'white' ? data.black_player : data.white_player;
                 this.myName = myUser;
@@ -461,8 +460,7 @@ function chessApp() {
                     this.myInitial = myInfo.initial || (myUser ? myUser.charAt(0).toUpperCase() : '?');
                     this.opponentAvatar = oppInfo.avatar || '';
                     this.opponentInitial = oppInfo.initial || (oppUser ? oppUser.charAt(0).toUpperCase() : '?');
-                    this.myTime = this.mySide === 'white' ? data.white_time : data.black_time;
-                    this.opponentTime = this.mySide === 'white' ? data.black_time : data.white_time;
+                    this.applyClocks(data);
                     if (data.moves_uci) {
                         this.rebuildMoveList(data.moves_uci);
                         var parts = data.moves_uci.trim().split(' ');
@@ -510,8 +508,19 @@ function chessApp() {
             }
         },
 
+        applyClocks(data) {
+            // Server clocks are authoritative and sent in milliseconds
+            var whiteTime = data.white_ms / 1000;
+            var blackTime = data.black_ms / 1000;
+            this.myTime = this.mySide === 'white' ? whiteTime : blackTime;
+            this.opponentTime = this.mySide === 'white' ? blackTime : whiteTime;
+        },
+
         applyOpponentMove(data) {
+            this.applyClocks(data);
             if (!this.isSpectator && data.player === this.myUsername) return;
+            // Let the server measure our round trip for lag compensation
+            if (!this.isSpectator) this.ws.send(JSON.stringify({ action: 'move_ack' }));
             var from = data.move.slice(0, 2);
             var to = data.move.slice(2, 4);
             var promotion = data.move.length === 5 ? data.move[4] : undefined;
@@ -530,15 +539,6 @@ function chessApp() {
                     this.sanMoves.push(result.san);
                     this.buildMovePairs(false);
                     this.newMovesWhileReviewing++;
-                    // Update times
-                    if (data.white_time !== null) {
-                        if (this.mySide === 'white') this.myTime = data.white_time;
-                        else this.opponentTime = data.white_time;
-                    }
-                    if (data.black_time !== null) {
-                        if (this.mySide === 'black') this.myTime = data.black_time;
-                        else this.opponentTime = data.black_time;
-                    }
                     this.checkGameEnd();
                 }
                 return;
@@ -558,15 +558,6 @@ function chessApp() {
                     if (!this.isViewingHistory) {
                         this.renderBoard();
                     }
-                    // Update times
-                    if (data.white_time !== null) {
-                        if (this.mySide === 'white') this.myTime = data.white_time;
-                        else this.opponentTime = data.white_time;
-                    }
-                    if (data.black_time !== null) {
-                        if (this.mySide === 'black') this.myTime = data.black_time;
-                        else this.opponentTime = data.black_time;
-                    }
                     this.checkGameEnd();
 
                     // Execute premove if queued
@@ -627,25 +618,30 @@ function chessApp() {
         // Timer
         startTimer() {
             this.stopTimer();
+            // Count down locally between server updates; the server flags
+            // the game itself when a clock runs out.
+            var last = performance.now();
             this.timerInterval = setInterval(() => {
+                var now = performance.now();
+                var elapsed = (now - last) / 1000;
+                last = now;
                 if (!this.gameActive || !this.mySide) return;
                 if (this.isMyTurn) {
-                    this.myTime = Math.max(0, this.myTime - 1);
-                    if (this.myTime === 0) {
-                        this.stopTimer();
-                        this.ws.send(JSON.stringify({ action: 'timeout', side: this.mySide }));
-                    }
+                    this.myTime = Math.max(0, this.myTime - elapsed);
                 } else {
-                    this.opponentTime = Math.max(0, this.opponentTime - 1);
+                    this.opponentTime = Math.max(0, this.opponentTime - elapsed);
                 }
-            }, 1000);
+            }, 100);
         },
         stopTimer() {
             if (this.timerInterval) { clearInterval(this.timerInterval); this.timerInterval = null; }
         },
         formatTime(secs) {
-            var m = Math.floor(secs / 60).toString().padStart(2, '0');
-            var s = (secs % 60).toString().padStart(2, '0');
+            // Tenths in the last ten seconds, whole seconds otherwise
+            if (secs < 10) return '00:0' + (Math.floor(secs * 10) / 10).toFixed(1);
+            var whole = Math.floor(secs);
+            var m = Math.floor(whole / 60).toString().padStart(2, '0');
+            var s = (whole % 60).toString().padStart(2, '0');
             return m + ':' + s;
         },
 
@@ -854,12 +850,7 @@ function chessApp() {
             this.drawOfferReceived = false;
 
             var uci = from + to + (promotion || '');
-            this.ws.send(JSON.stringify({
-                action: 'move',
-                move: uci,
-                white_time: this.mySide === 'white' ? this.myTime : this.opponentTime,
-                black_time: this.mySide === 'black' ? this.myTime : this.opponentTime,
-            }));
+            this.ws.send(JSON.stringify({ action: 'move', move: uci }));
 
             this.checkGameEnd();
             return true;
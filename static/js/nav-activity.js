@@ -14,3 +14,8 @@ function updateBellActivity(el) {
         mobileLink.classList.toggle('text-slate', !active);
     }
 }
+
+document.addEventListener('DOMContentLoaded', function () {
+    var badge = document.getElementById('notif-badge-display');
+    if (badge) updateBellActivity(badge);
+});
@@ -50,34 +50,22 @@
                 onAllRead();
             } else if (data.type === 'notification_deleted') {
                 onNotificationDeleted(data.id);
+            } else if (data.type === 'badge_state') {
+                onBadgeState(data);
             }
         };
 
         ws.onclose = function () {
             ws = null;
-            // Refresh badge via the initial-load HTMX element as a fallback
+            // The server pushes badge_state on every change while connected;
+            // fall back to fetching it over HTTP while we reconnect.
             var badge = document.getElementById('notif-badge-display');
-            if (badge && window.htmx) htmx.trigger(badge, 'load');
+            if (badge && window.htmx) htmx.trigger(badge, 'badge-refresh');
             setTimeout(connect, reconnectDelay);
             reconnectDelay = Math.min(reconnectDelay * 2, maxReconnectDelay);
         };
     }
 
-    function updateBadge(delta) {
-        // Update all badge elements showing unread count
-        var badges = document.querySelectorAll('.notif-badge-count');
-        badges.forEach(function (el) {
-            var current = parseInt(el.textContent, 10) || 0;
-            var next = Math.max(0, current + delta);
-            el.textContent = next || '';
-            // Toggle visibility of the badge wrapper
-            var wrapper = el.closest('.notif-badge-wrapper');
-            if (wrapper) {
-                wrapper.style.display = next > 0 ? '' : 'none';
-            }
-        });
-    }
-
     function setBadge(count) {
         var badges = document.querySelectorAll('.notif-badge-count');
         badges.forEach(function (el) {
@@ -85,11 +73,17 @@
             var wrapper = el.closest('.notif-badge-wrapper');
             if (wrapper) {
                 wrapper.style.display = count > 0 ? '' : 'none';
+                if (wrapper.hasAttribute('aria-label')) {
+                    wrapper.setAttribute('aria-label', count + ' unread');
+                }
             }
         });
     }
 
+    var pulseUntil = 0;
+
     function pulseBell() {
+        pulseUntil = Date.now() + 2000;
         var btn = document.getElementById('notif-bell-btn');
         if (btn) {
             btn.classList.add('text-gold', 'animate-pulse');
@@ -109,8 +103,20 @@
         }
     }
 
+    function onBadgeState(state) {
+        setBadge(state.unread_count);
+        var badge = document.getElementById('notif-badge-display');
+        if (badge) {
+            var sig = badge.querySelector('[data-game-activity]');
+            if (sig) sig.dataset.gameActivity = state.has_game_activity ? 'true' : 'false';
+            // Let a running new-notification pulse finish first
+            setTimeout(function () {
+                updateBellActivity(badge);
+            }, Math.max(0, pulseUntil - Date.now()));
+        }
+    }
+
     function onNewNotification(notif) {
-        updateBadge(1);
         pulseBell();
 
         // Prepend to dropdown if it's open
@@ -158,7 +164,6 @@
     }
 
     function onNotificationRead(id) {
-        updateBadge(-1);
         var row = document.querySelector('[data-notif-id="' + CSS.escape(String(id)) + '"]');
         if (row) {
             row.classList.remove('border-l-gold', 'border-l-3');
@@ -180,11 +185,7 @@
 
     function onNotificationDeleted(id) {
         var row = document.querySelector('[data-notif-id="' + CSS.escape(String(id)) + '"]');
-        if (row) {
-            var wasUnread = row.classList.contains('border-l-gold');
-            row.remove();
-            if (wasUnread) updateBadge(-1);
-        }
+        if (row) row.remove();
     }
 
     // Start WebSocket connection
@@ -147,6 +147,9 @@ function pokerApp() {
                 case 'pot_update':
                     this.pot = data.pot;
                     break;
+                case 'equity_update':
+                    this.handleEquityUpdate(data);
+                    break;
                 case 'player_connected':
                     this.setPlayerOnline(data.username, true);
                     this.addLog(data.username + ' connected');
@@ -218,6 +221,7 @@ function pokerApp() {
                         hasCards: false,
                         roundBet: 0,
                         potContrib: 0,
+                        equity: null,
                     });
                 } else {
                     this.seats.push({
@@ -225,7 +229,7 @@ function pokerApp() {
                         status: '', is_online: false, avatar_url: '',
                         coins_invested: 0,
                         lastAction: '', isSmallBlind: false, isBigBlind: false,
-                        hasCards: false, roundBet: 0, potContrib: 0,
+                        hasCards: false, roundBet: 0, potContrib: 0, equity: null,
                     });
                 }
             }
@@ -277,6 +281,7 @@ function pokerApp() {
                         seat.hasCards = p.status !== 'eliminated' && p.status !== 'spectating' && p.status !== 'left';
                         seat.roundBet = 0;
                         seat.potContrib = 0;
+                        seat.equity = null;
                     }
                 }
             }
@@ -432,6 +437,13 @@ function pokerApp() {
             this.addLog('Community: ' + this.communityCards.map(c => this.formatCard(c)).join(' '));
         },
 
+        handleEquityUpdate(data) {
+            for (const e of data.equities || []) {
+                const seat = this.seats.find(s => s.username === e.username);
+                if (seat) seat.equity = e.equity;
+            }
+        },
+
         handleShowdown(data) {
             this.showdownResults = data.results || [];
             this.showShowdown = true;